@@ -0,0 +1,99 @@
+# dashboard/exports.py
+"""
+US-12: Exportação dos itens vendidos em CSV, gerada em streaming.
+
+As linhas saem do banco em blocos (`.iterator(chunk_size=...)`) e são
+escritas na resposta conforme chegam, então a memória fica constante
+não importa o tamanho do período, e o cabeçalho chega ao navegador
+antes de a consulta terminar.
+
+Sob ASGI (necessário para o SSE dos pedidos, US-7) o Django consome um
+iterador síncrono inteiro (`sync_to_async(list)`) antes de enviar, o que
+guardaria o CSV todo na memória; ali a view entrega `async_chunks`, que
+busca um bloco por vez numa thread.
+"""
+import csv
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+from .rollups import paid_items
+
+CHUNK_SIZE = 2000
+
+COLUMNS = [
+    ('pedido_id', 'pedido'),
+    ('pedido__criado_em', 'criado_em'),
+    ('pedido__usuario__username', 'usuario'),
+    ('pedido__status', 'status'),
+    ('pedido__tipo_entrega', 'tipo_entrega'),
+    ('pedido__valor_frete', 'valor_frete'),
+    ('pedido__valor_total', 'valor_total_pedido'),
+    ('produto_id', 'produto_id'),
+    ('produto__nome', 'produto'),
+    ('produto__categoria__nome', 'categoria'),
+    ('quantidade', 'quantidade'),
+    ('valor_unitario', 'valor_unitario'),
+    ('valor_item', 'valor_item'),
+]
+
+
+class _Buffer:
+    # O csv.writer escreve aqui; o texto acumulado é devolvido em blocos
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def take(self):
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+def sales_rows(start=None, end=None):
+    """Tuplas com os itens de pedidos pagos no período, em ordem de criação."""
+    return paid_items(start, end).annotate(
+        valor_item=ExpressionWrapper(F('quantidade') * F('valor_unitario'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by('pedido__criado_em', 'pedido_id', 'id').values_list(
+        *[field for field, _ in COLUMNS]
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream_csv(rows):
+    """Gera o CSV (texto) em blocos de até CHUNK_SIZE linhas."""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header in COLUMNS])
+    yield buffer.take()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CHUNK_SIZE:
+            yield buffer.take()
+            pending = 0
+    if pending:
+        yield buffer.take()
+
+
+def gzip_stream(chunks):
+    """Comprime em gzip um gerador de textos, bloco a bloco."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def async_chunks(chunks):
+    """Iterador assíncrono sobre um gerador síncrono (que consulta o banco), um bloco por vez."""
+    chunks = iter(chunks)
+    # Sempre na mesma thread: o cursor do `.iterator()` é da conexão dela
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
@@ -0,0 +1,17 @@
+from django import forms
+
+
+class StockForm(forms.Form):
+    # US-11: Uma linha do editor de estoque. `anterior` é o estoque que a
+    # página mostrou: só grava se o banco ainda tiver esse valor.
+    id = forms.IntegerField(min_value=1, widget=forms.HiddenInput)
+    nome = forms.CharField(required=False, widget=forms.HiddenInput)  # só para reexibir
+    anterior = forms.IntegerField(min_value=0, widget=forms.HiddenInput)
+    quantidade_estoque = forms.IntegerField(min_value=0, widget=forms.NumberInput(attrs={'min': 0, 'style': 'width: 7em'}))
+
+
+StockFormSet = forms.formset_factory(StockForm, extra=0)
+
+
+class StockImportForm(forms.Form):
+    arquivo = forms.FileField(label='Arquivo CSV')
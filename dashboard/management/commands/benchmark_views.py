@@ -0,0 +1,215 @@
+import datetime
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store.models import Product, Review
+from users.models import CustomUser
+
+
+class _Rollback(Exception):
+    pass
+
+
+def percentiles(samples):
+    """p50/p95/p99 (ms) de uma lista de durações em segundos."""
+    ms = sorted(sample * 1000 for sample in samples)
+    if len(ms) == 1:
+        return {'p50_ms': ms[0], 'p95_ms': ms[0], 'p99_ms': ms[0]}
+    cuts = statistics.quantiles(ms, n=100, method='inclusive')
+    return {'p50_ms': cuts[49], 'p95_ms': cuts[94], 'p99_ms': cuts[98]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, AttributeError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede as principais páginas (vitrine, produto, carrinho, checkout, relatório '
+        'de vendas e meus pedidos) pelo cliente de testes do Django, registrando '
+        'latência p50/p95/p99 e número de consultas SQL num relatório JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=50, help='Requisições medidas por página.')
+        parser.add_argument('--aquecimento', type=int, default=3, help='Requisições descartadas antes de medir.')
+        parser.add_argument('--usuario', help='Cliente usado nas páginas logadas (padrão: o com mais pedidos).')
+        parser.add_argument('--admin', help='Usuário staff para o relatório de vendas (padrão: o primeiro).')
+        parser.add_argument('--cep', default='01310-100', help='CEP usado no checkout.')
+        parser.add_argument('--saida', help='Arquivo JSON do relatório.')
+        parser.add_argument('--comparar', help='Relatório JSON anterior para comparar.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes precisa ser pelo menos 1.')
+        self.rng = random.Random(options['seed'])
+        customer = self._user(options['usuario'], staff=False)
+        admin = self._user(options['admin'], staff=True)
+        product_ids = list(Product.objects.filter(quantidade_estoque__gt=100).order_by('?')
+                           .values_list('id', flat=True)[:500])
+        if not product_ids:
+            raise CommandError('Nenhum produto com estoque: gere dados com `generate_sample_data`.')
+
+        self.customer = customer
+        self.client = self._client(customer)
+        admin_client = self._client(admin) if admin else None
+
+        today = timezone.localdate()
+        last_month = f'?date_from={today - datetime.timedelta(days=30)}&date_to={today}'
+        searches = ['choco', 'morango', 'limão', 'queijo']
+        # (nome, url, cliente, dados do POST)
+        scenarios = [
+            ('product_list_view', lambda: reverse('store:product_list'), lambda: self.client, None),
+            ('product_list_view (busca)',
+             lambda: reverse('store:product_list') + '?q=' + self.rng.choice(searches), lambda: self.client, None),
+            ('product_detail_view',
+             lambda: reverse('store:product_detail', args=[self.rng.choice(product_ids)]), lambda: self.client, None),
+            ('cart_detail_view', lambda: reverse('orders:cart_detail'), lambda: self._cart_client(product_ids), None),
+            ('checkout_view (GET)', lambda: reverse('orders:checkout') + f'?cep={options["cep"]}',
+             lambda: self._cart_client(product_ids), None),
+            # Checkout completo: o pedido e a baixa de estoque são desfeitos a cada medição
+            ('checkout_view (POST)', lambda: reverse('orders:checkout'),
+             lambda: self._cart_client(product_ids), {'cep': options['cep']}),
+            ('order_list_view', lambda: reverse('orders:order_list'), lambda: self.client, None),
+        ]
+        if admin:
+            scenarios.append((
+                'sales_report_view', lambda: reverse('dashboard:sales_report') + last_month,
+                lambda: admin_client, None,
+            ))
+        else:
+            self.stderr.write('Nenhum usuário staff: sales_report_view ficou de fora.')
+
+        results = {}
+        for name, url, client, data in scenarios:
+            results[name] = self._measure(url, client, data, options['repeticoes'], options['aquecimento'])
+            self._print(name, results[name])
+
+        report = {
+            'gerado_em': timezone.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'ambiente': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'banco': connection.vendor,
+            },
+            'dados': {
+                'produtos': Product.objects.count(),
+                'pedidos': Order.objects.count(),
+                'itens_de_pedido': OrderItem.objects.count(),
+                'avaliacoes': Review.objects.count(),
+                'usuarios': CustomUser.objects.count(),
+            },
+            'repeticoes': options['repeticoes'],
+            'views': results,
+        }
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {options["saida"]}.'))
+        if options['comparar']:
+            self._compare(options['comparar'], results)
+
+    def _user(self, username, staff):
+        users = CustomUser.objects.filter(is_active=True)
+        if username:
+            try:
+                return users.get(username=username)
+            except CustomUser.DoesNotExist:
+                raise CommandError(f'Usuário {username} não existe.')
+        if staff:
+            return users.filter(is_staff=True).order_by('id').first()
+        # O cliente com mais pedidos deixa "Meus pedidos" no pior caso
+        top = Order.objects.values('usuario_id').exclude(usuario=None) \
+            .annotate(total=Count('id')).order_by('-total').first()
+        user = users.filter(pk=top['usuario_id']).first() if top else users.order_by('id').first()
+        if user is None:
+            raise CommandError('Nenhum usuário: gere dados com `generate_sample_data`.')
+        return user
+
+    def _client(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def _cart_client(self, product_ids):
+        # Carrinho novo a cada medição, montado pelo próprio fluxo do site
+        client = self._client(self.customer)
+        for product_id in self.rng.sample(product_ids, min(3, len(product_ids))):
+            for _ in range(2):
+                client.get(reverse('orders:add_to_cart', args=[product_id]))
+        return client
+
+    def _request(self, client, path, data):
+        with CaptureQueriesContext(connection) as captured:
+            began = time.perf_counter()
+            response = client.get(path) if data is None else client.post(path, data)
+            elapsed = time.perf_counter() - began
+        return response, elapsed, len(captured)
+
+    def _measure(self, url, client, data, repetitions, warmup):
+        durations, queries, statuses = [], [], set()
+        for i in range(warmup + repetitions):
+            request_client, path = client(), url()
+            if data is None:
+                response, elapsed, count = self._request(request_client, path, data)
+            else:
+                try:
+                    with transaction.atomic():
+                        response, elapsed, count = self._request(request_client, path, data)
+                        raise _Rollback  # Não deixa pedidos nem baixa de estoque do benchmark
+                except _Rollback:
+                    pass
+            if i >= warmup:
+                durations.append(elapsed)
+                queries.append(count)
+                statuses.add(response.status_code)
+        return {
+            **{key: round(value, 2) for key, value in percentiles(durations).items()},
+            'media_ms': round(statistics.fmean(durations) * 1000, 2),
+            'consultas': {'min': min(queries), 'max': max(queries), 'mediana': statistics.median(queries)},
+            'status': sorted(statuses),
+        }
+
+    def _print(self, name, result):
+        self.stdout.write(
+            f"{name:<28} p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+            f"p99 {result['p99_ms']:>8.1f} ms  consultas {result['consultas']['min']}-{result['consultas']['max']}"
+        )
+
+    def _compare(self, path, results):
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)
+        self.stdout.write(f'\nComparado com {path} (commit {previous.get("commit")}):')
+        for name, result in results.items():
+            before = previous.get('views', {}).get(name)
+            if not before:
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+            self.stdout.write(
+                f"{name:<28} p95 {before['p95_ms']:>8.1f} -> {result['p95_ms']:>8.1f} ms ({change:+.0%})  "
+                f"consultas {before['consultas']['max']} -> {result['consultas']['max']}"
+            )
@@ -0,0 +1,214 @@
+import contextlib
+import datetime
+import decimal
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard import rollups
+from orders.models import Order, OrderItem
+from store import ratings, recommendations, search
+from store.models import Category, Favorite, Product, Review
+from users.models import CustomUser
+
+DOCES = ['Chocolate', 'Morango', 'Baunilha', 'Limão', 'Doce de Leite', 'Red Velvet', 'Coco',
+         'Maracujá', 'Brigadeiro', 'Paçoca', 'Café', 'Nozes', 'Frutas Vermelhas', 'Pistache']
+SALGADOS = ['Calabresa', 'Queijo', 'Frango com Catupiry', 'Milho', 'Bacon', 'Espinafre']
+ESTILOS = ['', 'Gourmet', 'Recheado', 'Mini', 'Vegano', 'Diet', 'com Cobertura']
+COMENTARIOS = ['Delicioso!', 'Chegou bem embalado.', 'Muito doce para mim.', 'Compraria de novo.', '']
+
+
+def cpf(base):
+    """CPF válido (com dígitos verificadores) a partir de uma base de 9 dígitos."""
+    digits = [int(d) for d in f'{base:09d}']
+    for size in (9, 10):
+        remainder = sum(d * w for d, w in zip(digits, range(size + 1, 1, -1))) * 10 % 11
+        digits.append(0 if remainder == 10 else remainder)
+    s = ''.join(map(str, digits))
+    return f'{s[:3]}.{s[3:6]}.{s[6:9]}-{s[9:]}'
+
+
+@contextlib.contextmanager
+def manual_dates(*models):
+    """Desliga o auto_now_add de `criado_em` para gravar datas espalhadas no passado."""
+    fields = [model._meta.get_field('criado_em') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera uma base sintética grande (clientes, categorias, produtos, pedidos, '
+        'avaliações e favoritos) com bulk_create em lotes, para medir desempenho.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=10_000)
+        parser.add_argument('--produtos', type=int, default=100_000)
+        parser.add_argument('--pedidos', type=int, default=1_000_000)
+        parser.add_argument('--itens-por-pedido', type=int, default=3, help='Média de itens por pedido.')
+        parser.add_argument('--avaliacoes', type=int, default=200_000)
+        parser.add_argument('--favoritos', type=int, default=100_000)
+        parser.add_argument('--dias', type=int, default=365, help='Pedidos espalhados pelos últimos N dias.')
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument('--prefixo', default='sint', help='Prefixo dos nomes de usuário gerados.')
+        parser.add_argument('--imagem', default='cupcakes/calabresa.jpg',
+                            help='Foto usada nos produtos (caminho dentro de MEDIA_ROOT).')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['lote']
+        self.now = timezone.now()
+        self.days = options['dias']
+
+        categories = self._step('categorias', self._categories)
+        users = self._step('usuários', self._users, options['usuarios'], options['prefixo'])
+        products = self._step('produtos', self._products, options['produtos'], categories, options['imagem'])
+
+        # Popularidade desigual: poucos produtos concentram a maior parte das vendas
+        self.product_ids = product_ids = [product_id for product_id, _ in products]
+        if not users or not product_ids:
+            raise CommandError('Informe pelo menos um usuário e um produto.')
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(product_ids) + 1)))
+        self.pick_products = lambda k: self.rng.choices(product_ids, cum_weights=cum_weights, k=k)
+
+        self._step('pedidos', self._orders, options['pedidos'], options['itens_por_pedido'], users, dict(products))
+        self._step('avaliações', self._reviews, options['avaliacoes'], users)
+        self._step('favoritos', self._favorites, options['favoritos'], users)
+
+        # bulk_create não dispara sinais: recalcula os dados derivados
+        self._step('índice de busca', search.rebuild_index)
+        self._step('médias das avaliações', ratings.reconcile_ratings)
+        yesterday = timezone.localdate() - rollups.ONE_DAY
+        self._step('resumos de vendas', rollups.backfill, yesterday - datetime.timedelta(days=self.days), yesterday)
+        self._step('recomendações', recommendations.rebuild)
+
+    def _step(self, label, function, *args):
+        began = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - began
+        count = len(result) if isinstance(result, (list, dict)) else result
+        rate = f' ({count / elapsed:,.0f}/s)' if isinstance(count, int) and elapsed else ''
+        self.stdout.write(f'{label}: {count} em {elapsed:.1f}s{rate}')
+        return result
+
+    def _random_date(self):
+        return self.now - datetime.timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def _categories(self):
+        existing = {category.nome: category.id for category in Category.objects.all()}
+        missing = [Category(nome=nome) for nome, _ in Category.TIPO_CHOICES if nome not in existing]
+        for category in Category.objects.bulk_create(missing):
+            existing[category.nome] = category.id
+        return existing
+
+    def _users(self, total, prefix):
+        # Uma senha só (hash calculado uma vez): 'senha123'
+        password = make_password('senha123')
+        taken = set(CustomUser.objects.values_list('cpf', flat=True).iterator())
+        start = CustomUser.objects.filter(username__startswith=prefix).count()
+        bases = (base for base in itertools.count(100_000_000 + start * 7, 7) if cpf(base) not in taken)
+        ids = []
+        for offset in range(0, total, self.batch_size):
+            batch = [
+                CustomUser(
+                    username=f'{prefix}{start + n}', email=f'{prefix}{start + n}@exemplo.com',
+                    password=password, cpf=cpf(next(bases)), first_name=f'Cliente {start + n}',
+                    receber_promocoes=self.rng.random() < 0.7,
+                )
+                for n in range(offset, min(total, offset + self.batch_size))
+            ]
+            ids.extend(user.id for user in CustomUser.objects.bulk_create(batch))
+        return ids
+
+    def _products(self, total, categories, image):
+        created = []
+        for offset in range(0, total, self.batch_size):
+            batch = []
+            for n in range(offset, min(total, offset + self.batch_size)):
+                salgado = self.rng.random() < 0.25
+                sabor = self.rng.choice(SALGADOS if salgado else DOCES)
+                estilo = self.rng.choice(ESTILOS)
+                tipo = 'salgado' if salgado else 'diet' if estilo == 'Diet' else 'doce'
+                batch.append(Product(
+                    nome=' '.join(filter(None, ['Cupcake de', sabor, estilo, f'#{n + 1}'])),
+                    sabor=sabor.lower(),
+                    valor=decimal.Decimal(self.rng.randrange(500, 2500)) / 100,
+                    quantidade_estoque=self.rng.randrange(500, 5000),
+                    categoria_id=categories[tipo],
+                    imagem=image,
+                ))
+            created.extend((product.id, product.valor) for product in Product.objects.bulk_create(batch))
+        return created
+
+    def _orders(self, total, items_per_order, users, prices):
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        items_created = 0
+        with manual_dates(Order):
+            for offset in range(0, total, self.batch_size):
+                baskets = []
+                orders = []
+                for _ in range(min(self.batch_size, total - offset)):
+                    basket = {
+                        product_id: self.rng.randint(1, 3)
+                        for product_id in self.pick_products(self.rng.randint(1, 2 * items_per_order - 1))
+                    }
+                    subtotal = sum(prices[product_id] * quantity for product_id, quantity in basket.items())
+                    frete = decimal.Decimal('0.00') if subtotal >= 100 else decimal.Decimal('10.00')
+                    baskets.append(basket)
+                    orders.append(Order(
+                        usuario_id=self.rng.choice(users),
+                        valor_total=subtotal + frete,
+                        valor_frete=frete,
+                        status=self.rng.choice(statuses),
+                        pagamento_confirmado=self.rng.random() < 0.95,
+                        criado_em=self._random_date(),
+                    ))
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders)
+                    items = [
+                        OrderItem(pedido_id=order.id, produto_id=product_id,
+                                  quantidade=quantity, valor_unitario=prices[product_id])
+                        for order, basket in zip(orders, baskets)
+                        for product_id, quantity in basket.items()
+                    ]
+                    OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+                items_created += len(items)
+        self.stdout.write(f'  {items_created} itens de pedido')
+        return total
+
+    def _pairs(self, total, users):
+        # Pares (usuário, produto) distintos
+        total = min(total, len(users) * len(self.product_ids))
+        pairs = set()
+        while len(pairs) < total:
+            pairs.update(zip(self.rng.choices(users, k=total - len(pairs)), self.pick_products(total - len(pairs))))
+        return list(pairs)
+
+    def _reviews(self, total, users):
+        with manual_dates(Review):
+            Review.objects.bulk_create((
+                Review(usuario_id=user_id, produto_id=product_id,
+                       estrelas=self.rng.choices(range(1, 6), weights=[1, 1, 3, 6, 9])[0],
+                       comentario=self.rng.choice(COMENTARIOS), criado_em=self._random_date())
+                for user_id, product_id in self._pairs(total, users)
+            ), batch_size=self.batch_size, ignore_conflicts=True)
+        return total
+
+    def _favorites(self, total, users):
+        Favorite.objects.bulk_create(
+            (Favorite(usuario_id=user_id, produto_id=product_id) for user_id, product_id in self._pairs(total, users)),
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        return total
@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard import rollups
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Data inválida: {value} (use AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Consolida as vendas diárias (US-12). Sem opções, processa os dias fechados '
+        'que ainda faltam; com --desde/--ate, refaz o período informado em lotes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_date, help='Primeiro dia a refazer (AAAA-MM-DD).')
+        parser.add_argument('--ate', type=_date, help='Último dia a refazer (padrão: ontem).')
+        parser.add_argument('--refazer', type=int, default=1,
+                            help='Dias já consolidados a refazer no modo incremental.')
+        parser.add_argument('--lote', type=int, default=31, help='Dias por transação.')
+
+    def handle(self, *args, **options):
+        if options['desde']:
+            end = options['ate'] or timezone.localdate() - rollups.ONE_DAY
+            days = rollups.backfill(options['desde'], end, options['lote'])
+        else:
+            days = rollups.refresh_pending(options['refazer'], options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{days} dias consolidados.'))
@@ -1,3 +1,30 @@
 from django.db import models
+from store.models import Product, Category
 
-# Create your models here.
+# US-12: Tabelas de resumo diário para os relatórios de vendas.
+# São preenchidas por `manage.py refresh_sales_rollups` (dashboard/rollups.py)
+# a partir dos pedidos pagos; o relatório só lê os pedidos crus do dia atual.
+
+class DailySales(models.Model):
+    # Um registro por dia já consolidado (inclusive dias sem vendas)
+    data = models.DateField(unique=True)
+    pedidos = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'{self.data}: {self.pedidos} pedidos, R$ {self.receita}'
+
+class DailyProductSales(models.Model):
+    data = models.DateField()
+    produto = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
+    categoria = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    unidades = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['data', 'produto'], name='dailyprod_data_produto_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.data}: {self.unidades}x produto {self.produto_id}'
@@ -0,0 +1,158 @@
+# dashboard/replica.py
+"""
+Leituras dos relatórios num banco só de leitura (réplica).
+
+O dashboard soma pedidos e itens (US-12); no mesmo banco do checkout, um
+relatório grande disputa com os clientes. Com a réplica configurada, as
+views marcadas com `@reads_from_replica` leem dela, e tudo o que grava
+(pedidos, estoque, sessões) continua no banco principal.
+
+Configuração (settings):
+
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Local: o mesmo arquivo aberto só para leitura (ou uma cópia)
+        'NAME': f'file:{BASE_DIR / "db.sqlite3"}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['dashboard.replica.ReplicaRouter']
+    DASHBOARD_READ_DATABASE = 'replica'
+
+"Ler o que eu gravei": com `DASHBOARD_READ_PIN_SECONDS = N` e o
+middleware 'dashboard.replica.ReplicaPinMiddleware' (depois do
+SessionMiddleware), quem gravou algo fica N segundos lendo do principal,
+para não ver uma réplica atrasada sem a própria alteração.
+"""
+import contextlib
+import contextvars
+import functools
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_SESSION_KEY = 'replica_pin_ate'
+
+# Apps lidas sempre do principal: a sessão recém-gravada (login) pode
+# ainda não ter chegado na réplica.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+class _State:
+    def __init__(self, pinned=False):
+        self.replica = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('dashboard_replica', default=None)
+
+
+def read_alias():
+    """Alias da réplica, ou None se não houver réplica configurada."""
+    alias = getattr(settings, 'DASHBOARD_READ_DATABASE', None)
+    return alias if alias and alias != DEFAULT_DB_ALIAS else None
+
+
+@contextlib.contextmanager
+def reading_from_replica(pinned=False):
+    """As leituras do bloco vão para a réplica (se houver e não estiver fixado no principal)."""
+    state = _state.get()
+    token = None
+    if state is None:
+        state = _State(pinned)
+        token = _state.set(state)
+    previous, state.replica = state.replica, True
+    try:
+        yield state
+    finally:
+        state.replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def reads_from_replica(view):
+    """Decorador das views só de leitura do dashboard (inclusive respostas em streaming)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reading_from_replica() as state:
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            # O corpo é gerado depois que a view (e o middleware) retornam
+            stream = _astream_from_replica if response.is_async else _stream_from_replica
+            response.streaming_content = stream(response.streaming_content, state.pinned)
+        return response
+    return wrapper
+
+
+def _stream_from_replica(chunks, pinned):
+    with reading_from_replica(pinned):
+        yield from chunks
+
+
+async def _astream_from_replica(chunks, pinned):
+    # Marca a réplica em volta de cada bloco: o `sync_to_async` que busca o
+    # bloco copia o contexto (com a marca) para a thread que consulta o banco
+    chunks = aiter(chunks)
+    while True:
+        with reading_from_replica(pinned):
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        alias = read_alias()
+        if alias and state is not None and state.replica and not state.pinned \
+                and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        # Sempre o principal, mesmo para objetos lidos da réplica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e principal têm os mesmos dados
+        databases = {DEFAULT_DB_ALIAS, read_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # A réplica recebe o esquema do principal, nunca migrações próprias
+        if db == read_alias():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Depois de gravar, a sessão lê do principal por DASHBOARD_READ_PIN_SECONDS."""
+
+    def __init__(self, get_response):
+        self.pin_seconds = getattr(settings, 'DASHBOARD_READ_PIN_SECONDS', 0)
+        if not read_alias() or not self.pin_seconds:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.session.get(PIN_SESSION_KEY, 0) > time.time()
+        state = _State(pinned=pinned)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            request.session[PIN_SESSION_KEY] = time.time() + self.pin_seconds
+        return response
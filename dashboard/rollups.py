@@ -0,0 +1,199 @@
+# dashboard/rollups.py
+"""
+US-12: Consolidação diária das vendas para os relatórios.
+
+Cada dia fechado vira uma linha em `DailySales` (pedidos e receita) e
+uma linha por produto/categoria em `DailyProductSales` (unidades e
+receita). Os relatórios leem essas tabelas para os dias consolidados e só
+consultam os pedidos crus dos dias sem resumo (normalmente só o dia atual;
+também os buracos deixados por um `backfill` parcial), o que mantém o
+relatório abaixo de 5 s (RNF#1) mesmo com milhões de itens.
+"""
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store.models import Product
+from .models import DailySales, DailyProductSales
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def day_start(day):
+    """Meia-noite (no fuso do site) do dia `day`."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def paid_orders(start=None, end=None):
+    """Pedidos pagos entre os dias `start` e `end` (inclusive, qualquer um pode ser None)."""
+    orders = Order.objects.filter(pagamento_confirmado=True)
+    if start is not None:
+        orders = orders.filter(criado_em__gte=day_start(start))
+    if end is not None:
+        orders = orders.filter(criado_em__lt=day_start(end + ONE_DAY))
+    return orders
+
+
+def paid_items(start=None, end=None):
+    # Subconsulta em vez de JOIN: o banco parte do índice parcial de pedidos
+    # pagos (order_pago_criado_idx) e só então busca os itens de cada pedido.
+    return OrderItem.objects.filter(pedido__in=paid_orders(start, end).values('id'))
+
+
+def rolled_up_until():
+    """Último dia consolidado, ou None se nada foi consolidado ainda."""
+    return DailySales.objects.aggregate(ultimo=Max('data'))['ultimo']
+
+
+def unrolled_ranges(date_from=None, date_to=None):
+    """
+    Intervalos [(início, fim)] de dias entre `date_from` e `date_to` que
+    não têm resumo (None = sem limite). Todo dia consolidado tem uma linha
+    em `DailySales`, então os buracos são os dias sem linha: antes do
+    primeiro resumo, entre resumos (backfill parcial) e depois do último.
+    """
+    days = DailySales.objects.order_by('data')
+    if date_from is not None:
+        days = days.filter(data__gte=date_from)
+    if date_to is not None:
+        days = days.filter(data__lte=date_to)
+
+    ranges = []
+    next_day = date_from  # primeiro dia ainda não coberto (None = desde sempre)
+    for day in days.values_list('data', flat=True).iterator():
+        if next_day is None or next_day < day:
+            ranges.append((next_day, day - ONE_DAY))
+        next_day = day + ONE_DAY
+    if next_day is None or date_to is None or next_day <= date_to:
+        ranges.append((next_day, date_to))
+    return ranges
+
+
+def refresh_days(start, end, batch_size=1000):
+    """Recalcula (de forma idempotente) os resumos dos dias `start`..`end`."""
+    daily = {
+        row['dia']: row
+        for row in paid_orders(start, end)
+        .annotate(dia=TruncDate('criado_em'))
+        .values('dia')
+        .annotate(pedidos=Count('id'), receita=Sum('valor_total'))
+        .order_by()
+    }
+    products = paid_items(start, end) \
+        .annotate(dia=TruncDate('pedido__criado_em')) \
+        .values('dia', 'produto_id', 'produto__categoria_id') \
+        .annotate(
+            unidades=Sum('quantidade'),
+            receita=Sum(F('quantidade') * F('valor_unitario'), output_field=DecimalField()),
+        ).order_by()
+
+    days = [start + ONE_DAY * i for i in range((end - start).days + 1)]
+    with transaction.atomic():
+        DailySales.objects.filter(data__range=(start, end)).delete()
+        DailyProductSales.objects.filter(data__range=(start, end)).delete()
+        DailySales.objects.bulk_create([
+            DailySales(
+                data=day,
+                pedidos=daily.get(day, {}).get('pedidos', 0),
+                receita=daily.get(day, {}).get('receita') or 0,
+            )
+            for day in days
+        ], batch_size=batch_size)
+        DailyProductSales.objects.bulk_create((
+            DailyProductSales(
+                data=row['dia'],
+                produto_id=row['produto_id'],
+                categoria_id=row['produto__categoria_id'],
+                unidades=row['unidades'],
+                receita=row['receita'],
+            )
+            for row in products.iterator(chunk_size=batch_size)
+        ), batch_size=batch_size)
+    return len(days)
+
+
+def backfill(start, end, batch_days=31):
+    """Consolida `start`..`end` em blocos de `batch_days` dias (uma transação por bloco)."""
+    total = 0
+    while start <= end:
+        batch_end = min(end, start + ONE_DAY * (batch_days - 1))
+        total += refresh_days(start, batch_end)
+        start = batch_end + ONE_DAY
+    return total
+
+
+def refresh_pending(redo_days=1, batch_days=31):
+    """
+    Consolida os dias fechados que ainda faltam (até ontem). Os últimos
+    `redo_days` dias já consolidados são refeitos para pegar pagamentos
+    confirmados depois da consolidação.
+    """
+    yesterday = timezone.localdate() - ONE_DAY
+    last = rolled_up_until()
+    if last is None:
+        first_order = Order.objects.filter(pagamento_confirmado=True).order_by('criado_em').first()
+        if first_order is None:
+            return 0
+        start = timezone.localdate(first_order.criado_em)
+    else:
+        start = last + ONE_DAY - ONE_DAY * redo_days
+    if start > yesterday:
+        return 0
+    return backfill(start, yesterday, batch_days)
+
+
+def sales_summary(date_from=None, date_to=None, top=10):
+    """
+    Total vendido e os `top` produtos mais vendidos entre `date_from` e
+    `date_to` (datas, inclusive). Dias consolidados vêm dos resumos; os
+    demais (normalmente só hoje) vêm dos pedidos.
+    """
+    rolled = DailySales.objects.all()
+    rolled_units = DailyProductSales.objects.all()
+    if date_from is not None:
+        rolled = rolled.filter(data__gte=date_from)
+        rolled_units = rolled_units.filter(data__gte=date_from)
+    if date_to is not None:
+        rolled = rolled.filter(data__lte=date_to)
+        rolled_units = rolled_units.filter(data__lte=date_to)
+    total = rolled.aggregate(total=Sum('receita'))['total'] or 0
+
+    # Dias sem resumo (hoje, ou buracos de um backfill parcial) vêm dos
+    # pedidos; uma busca por faixa no índice para cada intervalo
+    raw_units = Counter()
+    for start, end in unrolled_ranges(date_from, date_to):
+        total += paid_orders(start, end).aggregate(total=Sum('valor_total'))['total'] or 0
+        raw_units.update(dict(
+            paid_items(start, end).values('produto_id')
+            .annotate(total=Sum('quantidade')).order_by()
+            .values_list('produto_id', 'total')
+        ))
+
+    # Mais vendidos: o top dos resumos mais os produtos vendidos na parte
+    # não consolidada bastam para achar o top real.
+    units = Counter()
+    by_product = rolled_units.values('produto_id').annotate(total=Sum('unidades')).order_by()
+    for product_id, count in by_product.order_by('-total').values_list('produto_id', 'total')[:top]:
+        units[product_id] += count
+    if raw_units:
+        for product_id, count in by_product.filter(produto_id__in=raw_units).exclude(
+            produto_id__in=list(units)
+        ).values_list('produto_id', 'total'):
+            units[product_id] += count
+        units.update(raw_units)
+
+    best = units.most_common(top)
+    names = Product.objects.only('nome').in_bulk([product_id for product_id, _ in best if product_id])
+    produtos_mais_vendidos = [
+        {
+            'produto__nome': names[product_id].nome if product_id in names else None,
+            'total_unidades': count,
+        }
+        for product_id, count in best
+    ]
+    return total, produtos_mais_vendidos
@@ -0,0 +1,214 @@
+# dashboard/stock.py
+"""
+US-11: Alteração de estoque em lote (editor da lista de estoque e
+importação de CSV).
+
+Todas as linhas são validadas antes de gravar qualquer coisa; se alguma
+tiver erro, nada é aplicado. As alterações válidas vão para o banco numa
+única transação: a importação com `bulk_update` (algumas consultas por
+lote, em vez de um `save()` por produto); o editor da lista, com um
+UPDATE condicional por lote, só grava onde o estoque ainda é o que a
+página mostrou (`apply_edits`). Produtos com estoque fracionado têm as
+partições redistribuídas (store/inventory.py).
+
+Formato do CSV (UTF-8 ou Windows-1252, separado por vírgula ou ponto e
+vírgula), outras colunas (ex.: nome) são ignoradas:
+
+    id,nome,quantidade_estoque
+    12,Cupcake de Chocolate,150
+"""
+import codecs
+import csv
+import itertools
+import time
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+
+from store import inventory
+from store.models import Product
+
+ID_COLUMN = 'id'
+QUANTITY_COLUMN = 'quantidade_estoque'
+
+# Produtos por consulta/UPDATE (abaixo do limite de parâmetros do SQLite)
+BATCH_SIZE = 500
+
+RowError = namedtuple('RowError', 'linha mensagem')
+
+
+def current_stock(product_ids):
+    """{id: (estoque atual, partições)} dos produtos que existem, em lotes."""
+    product_ids = list(product_ids)
+    current = {}
+    for offset in range(0, len(product_ids), BATCH_SIZE):
+        current.update(
+            (pk, (estoque, particoes)) for pk, estoque, particoes in Product.objects.filter(
+                pk__in=product_ids[offset:offset + BATCH_SIZE],
+            ).values_list('pk', 'quantidade_estoque', 'estoque_particoes')
+        )
+    return current
+
+
+class StockChanges:
+    """Resultado da validação: {produto_id: quantidade} e os erros por linha."""
+
+    def __init__(self):
+        self.quantities = {}
+        self.errors = []
+        self.current = {}
+        self._lines = {}
+
+    def add(self, line, product_id, quantity):
+        if product_id in self.quantities:
+            self.errors.append(RowError(line, f'Produto {product_id} repetido (já aparece na linha {self._lines[product_id]}).'))
+            return
+        self.quantities[product_id] = quantity
+        self._lines[product_id] = line
+
+    def check_products(self):
+        """Confere contra o banco se todos os produtos existem."""
+        self.current = current_stock(self.quantities)
+        for product_id, line in self._lines.items():
+            if product_id not in self.current:
+                self.errors.append(RowError(line, f'Produto {product_id} não existe.'))
+        self.errors.sort()
+
+
+# `conflitos`: StockConflict dos produtos que o editor não alterou (apply_edits)
+StockResult = namedtuple('StockResult', 'alterados inalterados segundos conflitos', defaults=((),))
+StockConflict = namedtuple('StockConflict', 'produto_id nome esperado atual')
+
+
+def _int(value):
+    value = (value or '').strip()
+    return int(value) if value.lstrip('-').isdigit() else None
+
+
+def _rows(lines):
+    # Separador pela linha de cabeçalho: planilhas em português usam ';'
+    lines = iter(lines)
+    header = next(lines, '')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    return csv.DictReader(itertools.chain([header], lines), delimiter=delimiter)
+
+
+def _parse(uploaded, encoding, errors='strict'):
+    changes = StockChanges()
+    reader = _rows(codecs.iterdecode(uploaded, encoding, errors))
+    columns = {(name or '').strip().lower() for name in reader.fieldnames or []}
+    missing = [column for column in (ID_COLUMN, QUANTITY_COLUMN) if column not in columns]
+    if missing:
+        changes.errors.append(RowError(1, f'Cabeçalho sem a(s) coluna(s): {", ".join(missing)}.'))
+        return changes
+
+    for row in reader:
+        row = {(key or '').strip().lower(): value for key, value in row.items()}
+        line = reader.line_num
+        if not any((value or '').strip() for value in row.values() if isinstance(value, str)):
+            continue  # linha em branco
+        product_id = _int(row.get(ID_COLUMN))
+        quantity = _int(row.get(QUANTITY_COLUMN))
+        if product_id is None or product_id <= 0:
+            changes.errors.append(RowError(line, f'Id de produto inválido: "{row.get(ID_COLUMN) or ""}".'))
+        elif quantity is None or quantity < 0:
+            changes.errors.append(RowError(line, f'Quantidade inválida: "{row.get(QUANTITY_COLUMN) or ""}".'))
+        else:
+            changes.add(line, product_id, quantity)
+    return changes
+
+
+def parse_csv(uploaded):
+    """
+    Lê o CSV enviado linha a linha (sem carregar o arquivo inteiro) e
+    retorna um `StockChanges` já conferido contra o banco.
+    """
+    try:
+        try:
+            changes = _parse(uploaded, 'utf-8-sig')
+        except UnicodeDecodeError:
+            # Excel no Windows salva CSV em Windows-1252
+            uploaded.seek(0)
+            changes = _parse(uploaded, 'cp1252', 'replace')
+    except csv.Error as e:
+        changes = StockChanges()
+        changes.errors.append(RowError(0, f'CSV inválido: {e}'))
+    # Confere os produtos mesmo com outros erros, para mostrar todos de uma vez
+    changes.check_products()
+    return changes
+
+
+def apply_stock(quantities, current=None):
+    """
+    Grava {produto_id: quantidade} numa transação, só para os produtos cuja
+    quantidade mudou. `current` é {id: (estoque atual, partições)}
+    (consultado se não for informado). Retorna um `StockResult`.
+    """
+    began = time.perf_counter()
+    if current is None:
+        current = current_stock(quantities)
+
+    now = timezone.now()
+    products = [
+        Product(pk=product_id, quantidade_estoque=quantity, estoque_particoes=current[product_id][1],
+                atualizado_em=now)
+        for product_id, quantity in quantities.items()
+        if product_id in current and current[product_id][0] != quantity
+    ]
+    with transaction.atomic():
+        Product.objects.bulk_update(products, ['quantidade_estoque', 'atualizado_em'], batch_size=BATCH_SIZE)
+        # bulk_update não dispara sinais: redistribui o estoque fracionado aqui
+        for product in products:
+            if product.estoque_particoes:
+                inventory.distribute_stock(product)
+    return StockResult(len(products), len(quantities) - len(products), time.perf_counter() - began)
+
+
+def apply_edits(edits):
+    """
+    Grava as alterações do editor de estoque, {produto_id: (quantidade
+    vista, nova quantidade)}, só onde o estoque ainda é o que o
+    administrador viu: uma venda feita enquanto a página estava aberta não
+    é desfeita. Um UPDATE condicional por lote (`Case`/`When` por id); as
+    linhas que não casaram voltam em `conflitos` com o estoque atual.
+    """
+    began = time.perf_counter()
+    changed = {pk: values for pk, values in edits.items() if values[0] != values[1]}
+    pending = list(changed.items())
+    now = timezone.now()
+    updated = 0
+    with transaction.atomic():
+        for offset in range(0, len(pending), BATCH_SIZE):
+            batch = pending[offset:offset + BATCH_SIZE]
+            seen = Q()
+            for product_id, (anterior, _) in batch:
+                seen |= Q(pk=product_id, estoque_atual=anterior)
+            updated += inventory.with_stock(Product.objects).filter(seen).update(
+                quantidade_estoque=Case(
+                    *[When(pk=product_id, then=Value(quantity)) for product_id, (_, quantity) in batch],
+                    output_field=PositiveIntegerField(),
+                ),
+                atualizado_em=now,
+            )
+        # UPDATE direto não dispara sinais: redistribui o estoque fracionado aqui
+        if updated:
+            for product in Product.objects.filter(pk__in=changed, atualizado_em=now, estoque_particoes__gt=0) \
+                    .only('id', 'quantidade_estoque', 'estoque_particoes'):
+                inventory.distribute_stock(product)
+
+    stale = []
+    if updated < len(changed):
+        # Relê só as linhas que o UPDATE não atingiu (as atingidas ficaram com `now`)
+        rows = {pk: (nome, estoque) for pk, nome, estoque in inventory.with_stock(Product.objects)
+                .filter(pk__in=changed).exclude(atualizado_em=now).values_list('pk', 'nome', 'estoque_atual')}
+        if updated + len(rows) < len(changed):
+            # Algum produto foi removido: não volta em nenhuma das consultas
+            remaining = set(Product.objects.filter(pk__in=changed).values_list('pk', flat=True))
+            rows.update((pk, (None, None)) for pk in changed if pk not in remaining)
+        for product_id, (anterior, _) in pending:
+            if product_id in rows:
+                nome, atual = rows[product_id]  # None: produto removido
+                stale.append(StockConflict(product_id, nome, anterior, atual))
+    return StockResult(updated, len(edits) - len(changed), time.perf_counter() - began, stale)
@@ -1,3 +1,344 @@
-from django.test import TestCase
+import csv
+import datetime
+import decimal
+import gzip
+import io
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store import inventory
+from store.models import Product, StockShard
+from store.profiling import full_scans, profile_queries
+from users.models import CustomUser
+from . import exports, rollups
+from .models import DailySales
+from .replica import ReplicaPinMiddleware, ReplicaRouter, reading_from_replica, reads_from_replica
+
+# Tabelas que crescem com o uso da loja: nenhuma consulta das páginas pode
+# percorrê-las inteiras. Categorias, faixas de frete e resumos por dia
+# (DailySales) são pequenas e ficam de fora.
+HOT_TABLES = {
+    'store_product', 'store_review', 'store_favorite', 'store_recommendation',
+    'orders_order', 'orders_orderitem', 'users_customuser', 'dashboard_dailyproductsales',
+}
+
+
+@skipUnless(connection.vendor == 'sqlite', 'planos lidos do EXPLAIN QUERY PLAN do SQLite')
+@override_settings(DASHBOARD_READ_DATABASE=None)  # mesmo esquema; tudo no banco de teste principal
+class QueryPlanTests(TestCase):
+    """Os índices das consultas quentes continuam sendo usados (sem varredura completa)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_sample_data', usuarios=50, produtos=400, pedidos=1500, avaliacoes=800,
+            favoritos=300, dias=60, prefixo='plano', stdout=io.StringIO(),
+        )
+        cls.customer = Order.objects.filter(usuario__isnull=False).latest('id').usuario
+        cls.admin = CustomUser.objects.create_user('gerente', password=None, cpf='0', is_staff=True)
+        cls.product = Product.objects.filter(quantidade_estoque__gt=0, reviews__isnull=False).first()
+
+    def assertNoFullScans(self, url, user=None, streaming=False):
+        if user is not None:
+            self.client.force_login(user)
+        with profile_queries() as profile:
+            response = self.client.get(url)
+            if streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        scans = full_scans(profile, HOT_TABLES)
+        if scans:
+            self.fail(f'{url}: varredura completa\n' + '\n'.join(
+                f'  {line}\n    {sql[:300]}' for sql, line in scans
+            ))
+
+    def test_storefront(self):
+        product_list = reverse('store:product_list')
+        self.assertNoFullScans(product_list)
+        self.assertNoFullScans(f'{product_list}?categoria={self.product.categoria_id}')
+        self.assertNoFullScans(f'{product_list}?q=chocolate')
+        self.assertNoFullScans(reverse('store:product_detail', args=[self.product.pk]))
+        self.assertNoFullScans(reverse('store:product_reviews', args=[self.product.pk]))
+        self.assertNoFullScans(reverse('store:product_reviews_json', args=[self.product.pk]))
+        self.assertNoFullScans(reverse('store:favorite_list'), self.customer)
+        catalog_api = reverse('store:catalog_api')
+        self.assertNoFullScans(f'{catalog_api}?categoria={self.product.categoria_id}&por_pagina=100')
+        self.assertNoFullScans(f'{catalog_api}?q=chocolate')
+        self.assertNoFullScans(reverse('store:catalog_product_api', args=[self.product.pk]))
+
+    def test_customer_pages(self):
+        self.client.force_login(self.customer)
+        self.client.get(reverse('orders:add_to_cart', args=[self.product.pk]))
+        self.assertNoFullScans(reverse('orders:cart_detail'))
+        self.assertNoFullScans(reverse('orders:checkout'))
+        self.assertNoFullScans(reverse('orders:order_list'))
+        order = Order.objects.filter(usuario=self.customer).latest('id')
+        self.assertNoFullScans(reverse('orders:order_detail', args=[order.pk]))
+
+    def test_dashboard(self):
+        today = timezone.localdate()
+        last_month = f'date_from={today - datetime.timedelta(days=30)}&date_to={today}'
+        self.assertNoFullScans(reverse('dashboard:index'), self.admin)
+        self.assertNoFullScans(reverse('dashboard:sales_report'))
+        self.assertNoFullScans(reverse('dashboard:manage_stock'))
+        self.assertNoFullScans(f"{reverse('dashboard:sales_report')}?{last_month}")
+        self.assertNoFullScans(f"{reverse('dashboard:sales_export')}?{last_month}", streaming=True)
+
+
+class StockEditingTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create_user('gerente', password=None, cpf='0', is_staff=True))
+        self.products = Product.objects.bulk_create([
+            Product(nome=f'Cupcake {n}', sabor='baunilha', valor=5, quantidade_estoque=10, imagem='cupcakes/x.jpg')
+            for n in range(3)
+        ])
+
+    def upload(self, content):
+        arquivo = SimpleUploadedFile('estoque.csv', content.encode('utf-8'), content_type='text/csv')
+        return self.client.post(reverse('dashboard:import_stock'), {'arquivo': arquivo})
+
+    def stock(self):
+        return list(Product.objects.order_by('id').values_list('quantidade_estoque', flat=True))
+
+    def test_import_with_errors_changes_nothing(self):
+        a, b, _ = self.products
+        response = self.upload(f'id,nome,quantidade_estoque\n{a.pk},A,50\n{b.pk},B,-1\n999,X,5\n{a.pk},A,7\n')
+        self.assertEqual(response.context['total_erros'], 3)
+        self.assertEqual([erro.linha for erro in response.context['erros']], [3, 4, 5])
+        self.assertEqual(self.stock(), [10, 10, 10])
+
+    def test_import_semicolon_and_sharded_stock(self):
+        a, b, c = self.products
+        Product.objects.filter(pk=b.pk).update(estoque_particoes=2)
+        response = self.upload(f'id;quantidade_estoque\r\n{a.pk};10\r\n{b.pk};41\r\n\r\n{c.pk};0\r\n')
+        result = response.context['resultado']
+        self.assertEqual((result.alterados, result.inalterados), (2, 1))
+        self.assertEqual(self.stock(), [10, 41, 0])
+        shards = StockShard.objects.filter(produto=b).order_by('particao').values_list('quantidade', flat=True)
+        self.assertEqual(list(shards), [21, 20])
+
+    def formset_data(self, changes):
+        # Os dados que a página do editor enviaria, com as quantidades de `changes`
+        formset = self.client.get(reverse('dashboard:manage_stock')).context['formset']
+        data = {f'form-{key}': value for key, value in formset.management_form.initial.items()}
+        for i, form in enumerate(formset):
+            for field in ('id', 'nome', 'anterior', 'quantidade_estoque'):
+                data[f'form-{i}-{field}'] = form.initial[field]
+            data[f'form-{i}-quantidade_estoque'] = changes.get(i, form.initial['quantidade_estoque'])
+        return data
+
+    def test_formset_saves_only_changed_rows(self):
+        data = self.formset_data({1: 25})
+        with self.assertNumQueries(6):  # sessão, usuário, UPDATE condicional e estoque fracionado (com savepoint)
+            response = self.client.post(reverse('dashboard:manage_stock'), data)
+        self.assertRedirects(response, reverse('dashboard:manage_stock'))
+        self.assertEqual(self.stock(), [10, 25, 10])
+
+    def test_formset_writes_all_rows_in_one_update(self):
+        a, b, c = self.products
+        data = self.formset_data({0: 1, 1: 2, 2: 3})
+        Product.objects.filter(pk=b.pk).update(quantidade_estoque=8)  # venda com a página aberta
+        Product.objects.filter(pk=c.pk).delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('dashboard:manage_stock'), data, follow=True)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "store_product"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.stock(), [1, 8])
+        [success, *conflicts] = [str(message) for message in response.context['messages']]
+        self.assertIn('1 produto(s)', success)
+        self.assertEqual(len(conflicts), 2)
+        self.assertIn('mudou de 10 para 8', conflicts[0])
+        self.assertIn(f'Produto {c.pk} não existe mais', conflicts[1])
+
+    def test_formset_keeps_sales_made_while_editing(self):
+        a, b, c = self.products
+        data = self.formset_data({2: 30})
+        # Vendas e um produto novo no início da lista depois da página aberta
+        Product.objects.filter(pk__in=[a.pk, c.pk]).update(quantidade_estoque=7)
+        Product.objects.create(nome='Cupcake 0 novo', sabor='limão', valor=5, quantidade_estoque=3)
+        response = self.client.post(reverse('dashboard:manage_stock'), data, follow=True)
+        self.assertEqual(self.stock(), [7, 10, 7, 3])
+        [success, conflict] = [str(message) for message in response.context['messages']]
+        self.assertIn('0 produto(s)', success)
+        self.assertIn('mudou de 10 para 7', conflict)
+
+    def test_formset_shows_and_guards_the_sharded_stock(self):
+        b = self.products[1]
+        Product.objects.filter(pk=b.pk).update(estoque_particoes=2)
+        inventory.distribute_stock(Product.objects.get(pk=b.pk))
+        inventory.decrement(b.pk, 2, 1)  # venda pelo caminho rápido: o total gravado fica em 10
+
+        data = self.formset_data({1: 40})
+        self.assertEqual(data['form-1-anterior'], 9)
+        self.client.post(reverse('dashboard:manage_stock'), data)
+        self.assertEqual(self.stock(), [10, 40, 10])
+        shards = StockShard.objects.filter(produto=b).order_by('particao').values_list('quantidade', flat=True)
+        self.assertEqual(list(shards), [20, 20])
+
+
+class SalesRollupTests(TestCase):
+    """O relatório dá o mesmo resultado com ou sem os resumos diários."""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        products = Product.objects.bulk_create([
+            Product(nome=f'Cupcake {n}', sabor='baunilha', valor=5, imagem='cupcakes/x.jpg') for n in range(3)
+        ])
+        # Um pedido pago por dia nos últimos 10 dias (e hoje), mais um não pago
+        for days_ago in range(11):
+            order = Order.objects.create(valor_total=10 + days_ago, pagamento_confirmado=days_ago != 4)
+            Order.objects.filter(pk=order.pk).update(
+                criado_em=rollups.day_start(self.today - datetime.timedelta(days=days_ago)) + datetime.timedelta(hours=12),
+            )
+            OrderItem.objects.create(pedido=order, produto=products[days_ago % 3], quantidade=days_ago + 1, valor_unitario=1)
+
+    def raw_summary(self, date_from, date_to):
+        orders = rollups.paid_orders(date_from, date_to)
+        units = {}
+        for item in OrderItem.objects.filter(pedido__in=orders):
+            units[item.produto.nome] = units.get(item.produto.nome, 0) + item.quantidade
+        return sum(order.valor_total for order in orders), units
+
+    def assertMatchesRaw(self):
+        day = lambda n: self.today - datetime.timedelta(days=n)
+        for date_from, date_to in [(None, None), (day(9), day(2)), (day(6), None), (None, day(5)), (day(3), day(3))]:
+            total, best = rollups.sales_summary(date_from, date_to)
+            expected_total, expected_units = self.raw_summary(date_from, date_to)
+            self.assertEqual(total, expected_total, (date_from, date_to))
+            self.assertEqual({row['produto__nome']: row['total_unidades'] for row in best}, expected_units)
+
+    def test_full_rollups(self):
+        self.assertMatchesRaw()  # nada consolidado: tudo dos pedidos
+        rollups.refresh_pending()
+        self.assertEqual(DailySales.objects.count(), 10)
+        self.assertMatchesRaw()
+
+    def test_gaps_in_coverage(self):
+        # backfill --desde parcial: buracos antes, no meio e depois dos resumos
+        rollups.backfill(self.today - datetime.timedelta(days=8), self.today - datetime.timedelta(days=7))
+        rollups.backfill(self.today - datetime.timedelta(days=4), self.today - datetime.timedelta(days=3))
+        self.assertEqual(
+            rollups.unrolled_ranges(None, None),
+            [(None, self.today - datetime.timedelta(days=9)),
+             (self.today - datetime.timedelta(days=6), self.today - datetime.timedelta(days=5)),
+             (self.today - datetime.timedelta(days=2), None)],
+        )
+        self.assertMatchesRaw()
+
+
+class SalesExportTests(TestCase):
+    """US-12: CSV dos itens vendidos, em streaming (WSGI e ASGI)."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('gerente', password=None, cpf='0', is_staff=True)
+        self.client.force_login(self.admin)
+        self.today = timezone.localdate()
+        self.product = Product.objects.create(nome='Cupcake de Limão', sabor='limão', valor=5, imagem='cupcakes/x.jpg')
+        # Pedidos pagos há 0, 1 e 2 dias, mais um não pago (fica de fora)
+        for days_ago, pago in ((2, True), (1, True), (0, True), (0, False)):
+            order = Order.objects.create(valor_total=10, pagamento_confirmado=pago)
+            Order.objects.filter(pk=order.pk).update(
+                criado_em=rollups.day_start(self.today - datetime.timedelta(days=days_ago)) + datetime.timedelta(hours=12),
+            )
+            OrderItem.objects.create(pedido=order, produto=self.product, quantidade=days_ago + 1, valor_unitario=2)
+
+    def export(self, **params):
+        response = self.client.get(reverse('dashboard:sales_export'), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def rows(self, body):
+        return list(csv.reader(io.StringIO(body.decode('utf-8'))))
+
+    def test_rows(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('vendas_inicio_hoje.csv"', response['Content-Disposition'])
+        header, *rows = self.rows(body)
+        self.assertEqual(header, [name for _, name in exports.COLUMNS])
+        # Em ordem de criação, só pedidos pagos: quantidade e valor do item
+        self.assertEqual([(row[8], int(row[10]), decimal.Decimal(row[12])) for row in rows], [
+            ('Cupcake de Limão', 3, 6), ('Cupcake de Limão', 2, 4), ('Cupcake de Limão', 1, 2),
+        ])
+
+    def test_date_filters(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        for params, quantities in [
+            ({'date_from': yesterday.isoformat()}, ['2', '1']),
+            ({'date_to': yesterday.isoformat()}, ['3', '2']),
+            ({'date_from': yesterday.isoformat(), 'date_to': yesterday.isoformat()}, ['2']),
+        ]:
+            _, body = self.export(**params)
+            self.assertEqual([row[10] for row in self.rows(body)[1:]], quantities, params)
+
+    def test_gzip(self):
+        _, plain = self.export()
+        response, body = self.export(gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz"', response['Content-Disposition'])
+        self.assertEqual(body[:2], b'\x1f\x8b')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    async def test_streams_block_by_block_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        with mock.patch.object(exports, 'CHUNK_SIZE', 1):
+            response = await self.async_client.get(reverse('dashboard:sales_export'))
+            # Iterador assíncrono: o Django envia cada bloco sem juntar o arquivo antes
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 4)  # cabeçalho e uma linha por bloco
+        self.assertEqual([row[10] for row in self.rows(b''.join(chunks))[1:]], ['3', '2', '1'])
+
+
+@override_settings(DASHBOARD_READ_DATABASE='replica', DASHBOARD_READ_PIN_SECONDS=30)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_only_marked_reads_use_the_replica(self):
+        self.assertIsNone(self.router.db_for_read(Order))
+        with reading_from_replica():
+            self.assertEqual(self.router.db_for_read(Order), 'replica')
+            self.assertIsNone(self.router.db_for_read(Session))
+            self.assertEqual(self.router.db_for_write(Order), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'orders'))
+
+    def test_reads_own_writes_after_writing(self):
+        session = {}
+        reads = []
+
+        def view(request):
+            if request.method == 'POST':
+                self.router.db_for_write(Product)
+            with reading_from_replica():
+                reads.append(self.router.db_for_read(Order))
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        for method in ('get', 'post', 'get'):
+            request = getattr(RequestFactory(), method)('/dashboard/')
+            request.session = session
+            middleware(request)
+        self.assertEqual(reads, ['replica', 'replica', None])
+
+    async def test_async_stream_reads_from_the_replica(self):
+        def chunks():
+            for _ in range(2):
+                yield self.router.db_for_read(Order) or 'default'
+
+        @reads_from_replica
+        def view(request):
+            return StreamingHttpResponse(exports.async_chunks(chunks()))
+
+        response = view(RequestFactory().get('/dashboard/'))
+        self.assertEqual([chunk async for chunk in response.streaming_content], [b'replica', b'replica'])
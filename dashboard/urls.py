@@ -11,7 +11,9 @@ urlpatterns = [
     # US-11: Gerenciar estoque de cupcakes
     path('estoque/', views.manage_stock_view, name='manage_stock'),
     path('estoque/editar/<int:pk>/', views.update_stock_view, name='update_stock'),
+    path('estoque/importar/', views.import_stock_view, name='import_stock'),
 
     # US-12: Gerar relatórios de vendas
     path('relatorios/vendas/', views.sales_report_view, name='sales_report'),
+    path('relatorios/vendas/exportar/', views.sales_export_view, name='sales_export'),
 ]
\ No newline at end of file
@@ -1,11 +1,28 @@
 # dashboard/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
-from django.db.models import Sum, Count
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from store import inventory
 from store.models import Product
-from orders.models import Order, OrderItem
+from orders.models import Order
 from django.utils import timezone
-from datetime import timedelta
+from .rollups import sales_summary
+from .exports import async_chunks, sales_rows, stream_csv, gzip_stream
+from .forms import StockFormSet, StockImportForm
+from .replica import reads_from_replica
+from .stock import apply_edits, apply_stock, parse_csv
+from store.pagination import paginate_keyset, cursor_querystring
+from django.conf import settings
+import datetime
+import time
+
+# US-11: Produtos por página no editor de estoque
+STOCK_PER_PAGE = getattr(settings, 'DASHBOARD_STOCK_PER_PAGE', 50)
+
+# Erros da importação de CSV mostrados na página (o total aparece sempre)
+MAX_IMPORT_ERRORS_SHOWN = 200
 
 # --- Decorator de Segurança ---
 # Garante que apenas administradores (staff) acessem o dashboard
@@ -15,6 +32,7 @@ def is_admin(user):
 # --- Views do Dashboard ---
 
 @user_passes_test(is_admin)
+@reads_from_replica # Consultas pesadas vão para a réplica (dashboard/replica.py)
 def dashboard_index_view(request):
     """
     Página inicial do dashboard com links para as seções.
@@ -35,18 +53,80 @@ def dashboard_index_view(request):
 def manage_stock_view(request):
     """
     Controla US-11: Listar produtos para gerenciar estoque.
+    Lista paginada por nome e editável como planilha: as quantidades
+    alteradas da página são gravadas de uma vez (dashboard/stock.py).
     """
-    products = Product.objects.all().order_by('nome')
-    context = {'products': products}
+    if request.method == 'POST':
+        formset = StockFormSet(request.POST)
+        if formset.is_valid():
+            # Cada linha leva o estoque que a página mostrou: vendas feitas
+            # enquanto a página estava aberta não são desfeitas
+            result = apply_edits({
+                form.cleaned_data['id']: (form.cleaned_data['anterior'], form.cleaned_data['quantidade_estoque'])
+                for form in formset
+            })
+            messages.success(request, f'{result.alterados} produto(s) atualizado(s) em {result.segundos * 1000:.0f} ms.')
+            for conflict in result.conflitos:
+                if conflict.atual is None:
+                    messages.error(request, f'Produto {conflict.produto_id} não existe mais.')
+                else:
+                    messages.error(
+                        request,
+                        f'"{conflict.nome}" não foi alterado: o estoque mudou de {conflict.esperado} '
+                        f'para {conflict.atual} enquanto a página estava aberta.',
+                    )
+            return redirect(request.get_full_path())
+
+    # Estoque real (soma das partições nos produtos fracionados)
+    page = paginate_keyset(
+        inventory.with_stock(Product.objects).values('id', 'nome', 'estoque_atual'),
+        ordering=('nome', 'id'),
+        cursor=request.GET.get('cursor'),
+        page_size=STOCK_PER_PAGE,
+    )
+    if request.method != 'POST':
+        formset = StockFormSet(initial=[
+            {'id': row['id'], 'nome': row['nome'], 'quantidade_estoque': row['estoque_atual'], 'anterior': row['estoque_atual']}
+            for row in page
+        ])
+
+    context = {
+        'formset': formset,
+        'next_querystring': page.next_cursor and cursor_querystring(request, page.next_cursor),
+        'previous_querystring': page.previous_cursor and cursor_querystring(request, page.previous_cursor),
+    }
     return render(request, 'dashboard/manage_stock.html', context)
 
+@user_passes_test(is_admin)
+def import_stock_view(request):
+    """
+    Controla US-11: Atualiza o estoque de vários produtos a partir de um CSV.
+    Nada é gravado se alguma linha tiver erro.
+    """
+    form = StockImportForm(request.POST or None, request.FILES or None)
+    context = {'form': form}
+    if request.method == 'POST' and form.is_valid():
+        began = time.perf_counter()
+        changes = parse_csv(form.cleaned_data['arquivo'])
+        context['validacao_segundos'] = time.perf_counter() - began
+        context['linhas'] = len(changes.quantities)
+        if changes.errors:
+            context['erros'] = changes.errors[:MAX_IMPORT_ERRORS_SHOWN]
+            context['total_erros'] = len(changes.errors)
+        else:
+            context['resultado'] = apply_stock(changes.quantities, changes.current)
+    return render(request, 'dashboard/import_stock.html', context)
+
 @user_passes_test(is_admin)
 def update_stock_view(request, pk):
     """
     Controla US-11: Editar (cadastrar/remover seriam similares)
     Esta view atualiza a quantidade de estoque de um produto.
     """
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(inventory.with_stock(Product.objects), pk=pk)
+    # Produto fracionado: o total gravado só é ressincronizado quando uma
+    # partição zera, então a tela mostra (e compara com) a soma das partições
+    product.quantidade_estoque = product._estoque_salvo = product.estoque_atual
     
     if request.method == 'POST':
         try:
@@ -56,7 +136,8 @@ def update_stock_view(request, pk):
                 raise ValueError()
 
             product.quantidade_estoque = nova_quantidade
-            product.save()
+            # Grava só o estoque para não sobrescrever os agregados de avaliações
+            product.save(update_fields=['quantidade_estoque', 'atualizado_em'])
             
             # US-11 (CA#1): "Ao atingir estoque zero, o produto é ocultado da vitrine."
             # Isso já é tratado automaticamente pelo `Product.em_estoque`
@@ -74,7 +155,14 @@ def update_stock_view(request, pk):
 
 # --- US-12: Relatórios de Vendas ---
 
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
 @user_passes_test(is_admin)
+@reads_from_replica # Consultas pesadas vão para a réplica (dashboard/replica.py)
 def sales_report_view(request):
     """
     Controla US-12: Gerar relatórios de vendas.
@@ -82,38 +170,44 @@ def sales_report_view(request):
     # Filtros (US-12)
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
-    
-    # Filtra pedidos confirmados
-    orders = Order.objects.filter(pagamento_confirmado=True)
-
-    if date_from:
-        orders = orders.filter(criado_em__gte=date_from)
-    if date_to:
-        # Adiciona 1 dia ao 'date_to' para incluir o dia inteiro
-        date_to_inclusive = timezone.datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-        orders = orders.filter(criado_em__lt=date_to_inclusive)
-
-    # US-12 (CA#1): Total vendido (valor)
-    total_vendido = orders.aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-    
-    # US-12 (CA#1): Produtos mais vendidos
-    # (Filtra por 'order__in=orders' para usar os filtros de data)
-    produtos_mais_vendidos = OrderItem.objects.filter(pedido__in=orders) \
-        .values('produto__nome') \
-        .annotate(total_unidades=Sum('quantidade')) \
-        .order_by('-total_unidades')[:10] # Top 10
+
+    # US-12 (CA#1): Total vendido (valor) e produtos mais vendidos (Top 10).
+    # US-12 (RNF#1): Relatórios gerados em até 5 segundos.
+    # Os dias fechados vêm dos resumos diários (dashboard/rollups.py);
+    # só o que ainda não foi consolidado é lido dos pedidos.
+    total_vendido, produtos_mais_vendidos = sales_summary(
+        _parse_date(date_from), _parse_date(date_to), top=10,
+    )
 
     # US-12 (CA#2): Filtro por categorias (seria similar aos filtros de data)
     
     context = {
-        'orders': orders,
         'total_vendido': total_vendido,
         'produtos_mais_vendidos': produtos_mais_vendidos,
         'date_from': date_from,
         'date_to': date_to,
     }
-    
-    # US-12 (RNF#1): Relatórios gerados em até 5 segundos.
-    # (Se ficar lento, esta consulta precisaria ser otimizada ou cacheada)
-    
-    return render(request, 'dashboard/sales_report.html', context)
\ No newline at end of file
+    return render(request, 'dashboard/sales_report.html', context)
+
+@user_passes_test(is_admin)
+@reads_from_replica # Consultas pesadas vão para a réplica (dashboard/replica.py)
+def sales_export_view(request):
+    """
+    Controla US-12: Exporta os itens vendidos no período em CSV (streaming).
+    Com ?gzip=1 o arquivo vem compactado (.csv.gz).
+    """
+    date_from = _parse_date(request.GET.get('date_from'))
+    date_to = _parse_date(request.GET.get('date_to'))
+
+    chunks = stream_csv(sales_rows(date_from, date_to))
+    filename = f"vendas_{date_from or 'inicio'}_{date_to or 'hoje'}.csv"
+    content_type = 'text/csv; charset=utf-8'
+    if request.GET.get('gzip'):
+        chunks, content_type = gzip_stream(chunks), 'application/gzip'
+        filename += '.gz'
+    if isinstance(request, ASGIRequest):
+        # Sob ASGI um gerador síncrono seria lido inteiro antes de enviar
+        chunks = async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,3 +1,15 @@
 from django.contrib import admin
+from .models import Campaign, CampaignVariant
 
-# Register your models here.
+# US-14: Campanhas de promoção (o envio é feito pelo comando `send_campaign`)
+class CampaignVariantInline(admin.StackedInline):
+    model = CampaignVariant
+    extra = 1
+
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'status', 'enviados', 'falhas', 'criado_em', 'concluido_em']
+    list_filter = ['status']
+    readonly_fields = ['status', 'iniciado_em', 'concluido_em', 'ultimo_usuario_id', 'enviados', 'falhas', 'nao_confirmados']
+    inlines = [CampaignVariantInline]
+
+admin.site.register(Campaign, CampaignAdmin)
@@ -0,0 +1,173 @@
+# marketing/campaigns.py
+"""
+US-14: Envio das campanhas de promoção por e-mail.
+
+Os clientes que aceitam promoções são lidos em ordem de id com
+`.iterator()` (só id, e-mail e nome), sem carregar a base inteira. Cada
+variante da campanha é renderizada pelo motor de templates uma única vez;
+por cliente só trocamos os marcadores `[[nome]]` e `[[descadastrar_url]]`.
+
+As mensagens saem em lotes por uma única conexão SMTP, com limite de
+mensagens por segundo. Antes de cada lote o progresso é gravado na
+campanha (`ultimo_usuario_id`): se o processo cair, a retomada começa no
+lote seguinte e ninguém recebe o e-mail duas vezes. O lote que estava no
+meio do envio fica contado em `nao_confirmados`.
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db.models import F
+from django.template import Context, Template
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import Campaign
+
+BATCH_SIZE = getattr(settings, 'MARKETING_BATCH_SIZE', 100)
+
+# Mensagens por segundo (0 = sem limite)
+RATE_LIMIT = getattr(settings, 'MARKETING_RATE_LIMIT', 20)
+
+# Endereço do site usado nos links dos e-mails
+SITE_URL = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+
+RenderedVariant = namedtuple('RenderedVariant', 'assunto corpo_texto corpo_html')
+
+
+class CampaignBusy(Exception):
+    """A campanha já está sendo enviada (ou já terminou)."""
+
+
+class RunResult(namedtuple('RunResult', 'enviados falhas nao_confirmados segundos')):
+
+    @property
+    def por_segundo(self):
+        return self.enviados / self.segundos if self.segundos else 0.0
+
+
+def recipients(after_id=0):
+    """(id, e-mail, nome) dos clientes que aceitam promoções, em ordem de id."""
+    return get_user_model().objects.filter(
+        receber_promocoes=True, is_active=True, id__gt=after_id,
+    ).exclude(email='').order_by('id').values_list('id', 'email', 'first_name', 'username')
+
+
+def render_variant(campaign, variant):
+    context = Context({'campanha': campaign, 'site_url': SITE_URL})
+    return RenderedVariant(
+        # Assunto numa linha só (cabeçalho do e-mail)
+        ' '.join(Template(variant.assunto).render(context).split()),
+        Template(variant.corpo_texto).render(context),
+        Template(variant.corpo_html).render(context) if variant.corpo_html else '',
+    )
+
+
+def personalize(text, fields):
+    for marker, value in fields.items():
+        text = text.replace(marker, value)
+    return text
+
+
+def build_message(rendered, email, name, connection):
+    unsubscribe_url = SITE_URL + reverse('marketing:subscription_settings')
+    fields = {'[[nome]]': name, '[[descadastrar_url]]': unsubscribe_url}
+    message = mail.EmailMultiAlternatives(
+        subject=personalize(rendered.assunto, fields),
+        body=personalize(rendered.corpo_texto, fields),
+        to=[email],
+        connection=connection,
+        headers={'List-Unsubscribe': f'<{unsubscribe_url}>'},
+    )
+    if rendered.corpo_html:
+        html_fields = {marker: escape(value) for marker, value in fields.items()}
+        message.attach_alternative(personalize(rendered.corpo_html, html_fields), 'text/html')
+    return message
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def claim(campaign, resume=False):
+    """
+    Marca a campanha como 'enviando'. Com `resume=True` aceita também uma
+    campanha que ficou 'enviando' porque o processo anterior caiu.
+    """
+    statuses = ['rascunho', 'pausada'] + (['enviando'] if resume else [])
+    claimed = Campaign.objects.filter(pk=campaign.pk, status__in=statuses).update(status='enviando')
+    if not claimed:
+        raise CampaignBusy(f'Campanha "{campaign}" já está sendo enviada ou foi concluída.')
+    if campaign.iniciado_em is None:
+        Campaign.objects.filter(pk=campaign.pk, iniciado_em=None).update(iniciado_em=timezone.now())
+    campaign.refresh_from_db()
+
+
+def send_campaign(campaign, batch_size=None, rate=None, limit=None, resume=False, connection=None):
+    """
+    Envia (ou retoma) a campanha. `limit` pausa depois de N mensagens.
+    Retorna um `RunResult` com o que foi enviado nesta execução.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    rate = RATE_LIMIT if rate is None else rate
+    claim(campaign, resume)
+
+    variants = [render_variant(campaign, variant) for variant in campaign.variantes.order_by('id')]
+    if not variants:
+        Campaign.objects.filter(pk=campaign.pk).update(status='pausada')
+        raise ValueError(f'Campanha "{campaign}" não tem nenhuma variante.')
+
+    connection = connection or mail.get_connection()
+    rows = recipients(campaign.ultimo_usuario_id).iterator(chunk_size=batch_size)
+    sent = failed = attempted = 0
+    started = time.monotonic()
+    paused = False
+    connection.open()
+    try:
+        for batch in _batches(rows, batch_size):
+            if limit is not None and attempted >= limit:
+                paused = True
+                break
+            messages = [
+                # Divide os clientes entre as variantes pelo id (estável entre retomadas)
+                build_message(variants[user_id % len(variants)], email, first_name or username, connection)
+                for user_id, email, first_name, username in batch
+            ]
+
+            # Checkpoint antes do envio: se cair no meio do lote, ele não é reenviado
+            Campaign.objects.filter(pk=campaign.pk).update(
+                ultimo_usuario_id=batch[-1][0],
+                nao_confirmados=F('nao_confirmados') + len(batch),
+            )
+            delivered = connection.send_messages(messages) or 0
+            Campaign.objects.filter(pk=campaign.pk).update(
+                enviados=F('enviados') + delivered,
+                falhas=F('falhas') + len(batch) - delivered,
+                nao_confirmados=F('nao_confirmados') - len(batch),
+            )
+            sent += delivered
+            failed += len(batch) - delivered
+            attempted += len(batch)
+
+            # Limite de taxa: espera até o horário previsto para o próximo lote
+            if rate:
+                delay = started + attempted / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        connection.close()
+
+    finished = {} if paused else {'concluido_em': timezone.now()}
+    Campaign.objects.filter(pk=campaign.pk).update(status='pausada' if paused else 'concluida', **finished)
+    campaign.refresh_from_db()
+    return RunResult(sent, failed, campaign.nao_confirmados, time.monotonic() - started)
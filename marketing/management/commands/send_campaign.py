@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from marketing import campaigns
+from marketing.models import Campaign
+
+
+class Command(BaseCommand):
+    help = (
+        'Envia (ou retoma) uma campanha de promoção por e-mail (US-14) para os '
+        'clientes que aceitam promoções.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('campanha', type=int, help='Id da campanha.')
+        parser.add_argument('--lote', type=int, default=campaigns.BATCH_SIZE, help='Mensagens por lote.')
+        parser.add_argument('--taxa', type=float, default=campaigns.RATE_LIMIT,
+                            help='Máximo de mensagens por segundo (0 = sem limite).')
+        parser.add_argument('--limite', type=int, help='Pausa a campanha depois de N mensagens.')
+        parser.add_argument('--retomar', action='store_true',
+                            help='Retoma uma campanha que ficou "enviando" após uma falha.')
+
+    def handle(self, *args, **options):
+        try:
+            campaign = Campaign.objects.get(pk=options['campanha'])
+        except Campaign.DoesNotExist:
+            raise CommandError(f'Campanha {options["campanha"]} não existe.')
+
+        try:
+            result = campaigns.send_campaign(
+                campaign,
+                batch_size=options['lote'],
+                rate=options['taxa'],
+                limit=options['limite'],
+                resume=options['retomar'],
+            )
+        except campaigns.CampaignBusy as e:
+            raise CommandError(f'{e} Se o envio anterior caiu, use --retomar.')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.enviados} e-mails enviados em {result.segundos:.1f} s '
+            f'({result.por_segundo:.1f} msg/s), {result.falhas} falhas. '
+            f'Campanha: {campaign.get_status_display()} ({campaign.enviados} enviados no total).'
+        ))
+        if result.nao_confirmados:
+            self.stdout.write(f'{result.nao_confirmados} mensagens de um lote interrompido não foram confirmadas.')
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('rascunho', 'Rascunho'), ('enviando', 'Enviando'), ('pausada', 'Pausada'), ('concluida', 'Concluída')], default='rascunho', max_length=10)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_usuario_id', models.BigIntegerField(default=0, editable=False)),
+                ('enviados', models.PositiveIntegerField(default=0, editable=False)),
+                ('falhas', models.PositiveIntegerField(default=0, editable=False)),
+                ('nao_confirmados', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CampaignVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(default='A', max_length=50)),
+                ('assunto', models.CharField(max_length=200)),
+                ('corpo_texto', models.TextField()),
+                ('corpo_html', models.TextField(blank=True)),
+                ('campanha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variantes', to='marketing.campaign')),
+            ],
+        ),
+    ]
@@ -1,3 +1,42 @@
 from django.db import models
 
-# Create your models here.
+
+# US-14: Campanha de promoção por e-mail
+class Campaign(models.Model):
+    STATUS_CHOICES = [
+        ('rascunho', 'Rascunho'),
+        ('enviando', 'Enviando'),
+        ('pausada', 'Pausada'),
+        ('concluida', 'Concluída'),
+    ]
+
+    nome = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='rascunho')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    # Progresso (marketing/campaigns.py): usuários com id até `ultimo_usuario_id`
+    # já foram processados e não recebem de novo se o envio for retomado.
+    ultimo_usuario_id = models.BigIntegerField(default=0, editable=False)
+    enviados = models.PositiveIntegerField(default=0, editable=False)
+    falhas = models.PositiveIntegerField(default=0, editable=False)
+    # Mensagens de um lote interrompido no meio do envio (entregues ou não)
+    nao_confirmados = models.PositiveIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return self.nome
+
+
+# US-14: Versão do e-mail (assunto/corpo). Com mais de uma, os clientes
+# são divididos entre elas (teste A/B).
+class CampaignVariant(models.Model):
+    campanha = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='variantes')
+    nome = models.CharField(max_length=50, default='A')
+    # Templates do Django; [[nome]] e [[descadastrar_url]] são trocados por cliente
+    assunto = models.CharField(max_length=200)
+    corpo_texto = models.TextField()
+    corpo_html = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.campanha} - {self.nome}'
@@ -1,3 +1,93 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import CustomUser
+from . import campaigns
+from .models import Campaign, CampaignVariant
+
+
+def make_user(n, **fields):
+    return CustomUser.objects.create_user(f'cliente{n}', email=f'cliente{n}@exemplo.com',
+                                          password=None, cpf=f'{n:011d}', **fields)
+
+
+class CrashingBackend(EmailBackend):
+    """Cai no envio do lote de número `crash_on` (contando a partir de 1)."""
+
+    def __init__(self, crash_on, **kwargs):
+        super().__init__(**kwargs)
+        self.crash_on = crash_on
+        self.batches = 0
+
+    def send_messages(self, messages):
+        self.batches += 1
+        if self.batches == self.crash_on:
+            raise ConnectionResetError('conexão SMTP perdida')
+        return super().send_messages(messages)
+
+
+@mock.patch.object(campaigns, 'RATE_LIMIT', 0)
+class SendCampaignTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(n, first_name=f'Nome{n}') for n in range(1, 11)]
+        make_user(98, receber_promocoes=False)
+        make_user(99, is_active=False)
+        self.campaign = Campaign.objects.create(nome='Semana do morango')
+        for name in 'AB':
+            CampaignVariant.objects.create(
+                campanha=self.campaign, nome=name,
+                assunto=f'{{{{ campanha.nome }}}} ({name})',
+                corpo_texto='Olá, [[nome]]! Sair da lista: [[descadastrar_url]]',
+                corpo_html='<p>Olá, [[nome]]!</p>',
+            )
+
+    def test_sends_once_to_each_opted_in_user(self):
+        with mock.patch.object(campaigns, 'render_variant', wraps=campaigns.render_variant) as render:
+            result = campaigns.send_campaign(self.campaign, batch_size=3)
+
+        self.assertEqual(render.call_count, 2)  # uma vez por variante, não por cliente
+        self.assertEqual(result.enviados, 10)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(u.email for u in self.users))
+        self.assertEqual({m.subject for m in mail.outbox}, {'Semana do morango (A)', 'Semana do morango (B)'})
+        message = next(m for m in mail.outbox if m.to == ['cliente1@exemplo.com'])
+        self.assertIn('Olá, Nome1!', message.body)
+        self.assertIn('/marketing/preferencias-email/', message.body)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.enviados), ('concluida', 10))
+
+    def test_resume_after_crash_does_not_send_twice(self):
+        with self.assertRaises(ConnectionResetError):
+            campaigns.send_campaign(self.campaign, batch_size=3, connection=CrashingBackend(crash_on=2))
+
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.enviados, self.campaign.nao_confirmados),
+                         ('enviando', 3, 3))
+        with self.assertRaises(campaigns.CampaignBusy):
+            campaigns.send_campaign(self.campaign, batch_size=3)
+
+        result = campaigns.send_campaign(self.campaign, batch_size=3, resume=True)
+
+        recipients = [m.to[0] for m in mail.outbox]
+        self.assertEqual(len(recipients), len(set(recipients)))
+        self.assertEqual(result.enviados, 4)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.enviados), ('concluida', 7))
+
+    def test_limit_pauses_and_continues(self):
+        campaigns.send_campaign(self.campaign, batch_size=4, limit=4)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.enviados), ('pausada', 4))
+
+        campaigns.send_campaign(self.campaign, batch_size=4)
+        self.assertEqual(len(mail.outbox), 10)
+
+    def test_rate_limit_waits_between_batches(self):
+        with mock.patch.object(campaigns.time, 'sleep') as sleep:
+            campaigns.send_campaign(self.campaign, batch_size=5, rate=5)
+        # 10 mensagens a 5/s: ~1 s depois do primeiro lote e ~2 s depois do segundo
+        self.assertEqual(sleep.call_count, 2)
+        self.assertGreater(sleep.call_args_list[0].args[0], 0.9)
@@ -1,7 +1,7 @@
 # orders/admin.py
 
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, ShippingRate
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -12,6 +12,13 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'usuario', 'status', 'pagamento_confirmado', 'criado_em']
     list_filter = ['status', 'pagamento_confirmado', 'criado_em']
     search_fields = ['usuario__username', 'id']
+    list_select_related = ['usuario'] # Evita uma consulta por linha na listagem
     inlines = [OrderItemInline] # Mostra os itens DENTRO do pedido
 
-admin.site.register(Order, OrderAdmin)
\ No newline at end of file
+admin.site.register(Order, OrderAdmin)
+
+# US-13: Tabela de frete por faixa de CEP
+class ShippingRateAdmin(admin.ModelAdmin):
+    list_display = ['cep_inicial', 'cep_final', 'valor', 'valor_caixa_extra', 'prazo_dias']
+
+admin.site.register(ShippingRate, ShippingRateAdmin)
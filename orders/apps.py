@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        # Conecta os sinais: recarga da tabela de frete (US-13), publicação
+        # das mudanças de status dos pedidos (SSE, US-7) e junção/cópia do
+        # carrinho no login/logout (US-4)
+        from . import signals  # noqa: F401
+        # Verificação do cache compartilhado dos carrinhos (check --deploy)
+        from . import checks  # noqa: F401
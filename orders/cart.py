@@ -0,0 +1,108 @@
+# orders/cart.py
+"""
+Precificação do carrinho (US-4, US-5, US-13).
+
+Carrega todos os produtos do carrinho numa única consulta (`in_bulk`)
+e calcula itens, subtotal, pedido mínimo e frete grátis de uma vez.
+O resultado fica guardado no `request`, então carrinho, checkout e
+criação do pedido usam o mesmo retrato dentro da mesma requisição.
+O conteúdo do carrinho fica no cache (orders/cart_store.py).
+"""
+import decimal
+
+from store.models import Product
+from . import cart_store
+
+# US-4 (RN#1): Quantidade máxima por item
+MAX_QUANTITY_PER_ITEM = 50
+
+# US-5 (RN#1): Pedido mínimo de R$ 10,00
+MIN_ORDER_VALUE = decimal.Decimal('10.00')
+
+# US-13 (RN#1): Frete grátis acima de R$ 100,00
+FREE_SHIPPING_THRESHOLD = decimal.Decimal('100.00')
+
+# Frete padrão quando o CEP ainda não foi informado
+DEFAULT_SHIPPING = decimal.Decimal('10.00')
+
+_REQUEST_CACHE_ATTR = '_priced_cart'
+
+
+class CartLine:
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        self.total_item = product.valor * quantity
+
+
+class PricedCart:
+    """Retrato do carrinho com os preços atuais dos produtos."""
+
+    def __init__(self, lines, removed):
+        self.lines = lines
+        self.removed = removed  # produtos que sumiram ou estão sem estoque
+        self.subtotal = sum((line.total_item for line in lines), decimal.Decimal('0.00'))
+        self.min_order_met = self.subtotal >= MIN_ORDER_VALUE
+        self.free_shipping = self.subtotal >= FREE_SHIPPING_THRESHOLD
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def items_count(self):
+        return sum(line.quantity for line in self.lines)
+
+    def shipping(self, base=DEFAULT_SHIPPING):
+        # US-13 (RN#1): Frete grátis acima do valor mínimo
+        return decimal.Decimal('0.00') if self.free_shipping else base
+
+
+def get_cart(request):
+    """Conteúdo bruto do carrinho: {product_id: quantidade}."""
+    return cart_store.load(request)
+
+
+def save_cart(request, cart):
+    cart_store.replace(request, cart)
+    invalidate(request)
+
+
+def invalidate(request):
+    request.__dict__.pop(_REQUEST_CACHE_ATTR, None)
+
+
+def price_cart(request):
+    """
+    Retorna o `PricedCart` da requisição, calculando-o na primeira chamada.
+    Itens de produtos removidos ou sem estoque são tirados do carrinho.
+    """
+    cached = getattr(request, _REQUEST_CACHE_ATTR, None)
+    if cached is not None:
+        return cached
+
+    cart = get_cart(request)
+
+    # Uma única consulta para todos os itens
+    products = Product.objects.in_bulk(list(cart)) if cart else {}
+
+    lines = []
+    removed = []
+    for product_id, quantity in cart.items():
+        product = products.get(product_id)
+        if product is None or not product.em_estoque:
+            removed.append(product)
+            continue
+        lines.append(CartLine(product, quantity))
+
+    if removed:
+        try:
+            save_cart(request, {line.product.id: line.quantity for line in lines})
+        except cart_store.CartBusy:
+            pass  # os itens já ficaram fora de `lines`; saem do cache na próxima vez
+
+    priced = PricedCart(lines, [product for product in removed if product is not None])
+    setattr(request, _REQUEST_CACHE_ATTR, priced)
+    return priced
@@ -0,0 +1,180 @@
+# orders/cart_store.py
+"""
+US-4: Onde o carrinho fica guardado.
+
+O carrinho fica no cache compartilhado, codificado de forma compacta
+("produto:quantidade,produto:quantidade"), numa chave por cliente logado
+ou por visitante. Clicar em "adicionar" não regrava a sessão no banco: o
+visitante só ganha um identificador na sessão no primeiro item.
+
+Alterações passam por uma trava curta no próprio cache (`cache.add`), então
+incrementos simultâneos não se perdem e o limite de 50 unidades por item
+vale mesmo com cliques em paralelo. Se a trava não sair em LOCK_TIMEOUT, a
+alteração falha com `CartBusy` (nunca grava sem a trava).
+
+O banco (`SavedCart`) só guarda uma cópia do carrinho do cliente logado
+quando ele chega ao checkout ou sai do site; se o cache perder a chave
+(expirou ou foi despejado), o carrinho volta dessa cópia. No login, o
+carrinho do visitante é somado ao do cliente.
+
+O cache precisa ser compartilhado entre os processos (Redis ou Memcached
+em CACHES['default']). O `LocMemCache` padrão é um por processo: com mais
+de um worker o carrinho some entre requisições e a trava não protege
+nada. `manage.py check --deploy` avisa disso (orders/checks.py).
+"""
+import contextlib
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Tempo (s) que o carrinho fica no cache sem ser alterado
+CART_TTL = getattr(settings, 'CART_TTL', 60 * 60 * 24 * 30)
+
+# Trava de alteração do carrinho (s)
+LOCK_TIMEOUT = 2
+
+SESSION_TOKEN_KEY = 'cart_token'
+
+
+class CartLimitExceeded(Exception):
+    """O item já está na quantidade máxima permitida."""
+
+
+class CartBusy(Exception):
+    """Outra requisição está alterando o carrinho; nada foi gravado."""
+
+
+def encode(items):
+    """{12: 3, 45: 1} -> '12:3,45:1'"""
+    return ','.join(f'{product_id}:{quantity}' for product_id, quantity in items.items() if quantity > 0)
+
+
+def decode(value):
+    items = {}
+    for part in (value or '').split(','):
+        product_id, _, quantity = part.partition(':')
+        if product_id.isdigit() and quantity.isdigit() and int(quantity) > 0:
+            items[int(product_id)] = int(quantity)
+    return items
+
+
+def _user_key(user_id):
+    return f'orders:cart:u:{user_id}'
+
+
+def _anonymous_key(token):
+    return f'orders:cart:a:{token}'
+
+
+def cart_key(request, create=False):
+    """Chave do carrinho da requisição (None para visitante ainda sem carrinho)."""
+    if request.user.is_authenticated:
+        return _user_key(request.user.pk)
+    token = request.session.get(SESSION_TOKEN_KEY)
+    if token is None and create:
+        token = request.session[SESSION_TOKEN_KEY] = secrets.token_urlsafe(12)
+    return token and _anonymous_key(token)
+
+
+@contextlib.contextmanager
+def _locked(key):
+    lock = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    acquired = cache.add(lock, 1, LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.005)
+        acquired = cache.add(lock, 1, LOCK_TIMEOUT)
+    if not acquired:
+        raise CartBusy(key)
+    try:
+        yield
+    finally:
+        cache.delete(lock)
+
+
+def _read(key, user_id=None):
+    value = cache.get(key)
+    if value is None:
+        # Cache sem o carrinho: volta da cópia no banco (clientes logados).
+        # '' (carrinho vazio) também fica no cache, para não consultar de novo.
+        value = ''
+        if user_id is not None:
+            from .models import SavedCart
+            value = SavedCart.objects.filter(usuario_id=user_id).values_list('itens', flat=True).first() or ''
+        cache.set(key, value, CART_TTL)
+    return decode(value)
+
+
+def _user_id(request):
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def load(request):
+    """Itens do carrinho: {product_id: quantidade}."""
+    key = cart_key(request)
+    return _read(key, _user_id(request)) if key else {}
+
+
+def replace(request, items):
+    key = cart_key(request, create=bool(items))
+    if key:
+        with _locked(key):
+            cache.set(key, encode(items), CART_TTL)
+
+
+def increment(request, product_id, delta=1, maximum=None):
+    """
+    Soma `delta` (pode ser negativo) à quantidade do produto, de forma
+    atômica. Levanta `CartLimitExceeded` se passar de `maximum`.
+    Retorna a nova quantidade (0 = item saiu do carrinho).
+    """
+    key = cart_key(request, create=delta > 0)
+    if not key:
+        return 0
+    with _locked(key):
+        items = _read(key, _user_id(request))
+        quantity = items.get(product_id, 0) + delta
+        if maximum is not None and delta > 0 and quantity > maximum:
+            raise CartLimitExceeded(product_id)
+        if quantity > 0:
+            items[product_id] = quantity
+        else:
+            items.pop(product_id, None)
+        cache.set(key, encode(items), CART_TTL)
+    return max(quantity, 0)
+
+
+def persist(user_id):
+    """Grava a cópia durável do carrinho do cliente (checkout e logout)."""
+    from .models import SavedCart
+    value = cache.get(_user_key(user_id))
+    if value is None:
+        return
+    if value:
+        SavedCart.objects.update_or_create(usuario_id=user_id, defaults={'itens': value})
+    else:
+        SavedCart.objects.filter(usuario_id=user_id).delete()
+
+
+def merge_anonymous_cart(request, user, maximum):
+    """
+    No login: soma o carrinho do visitante ao do cliente (limitado a
+    `maximum` por item). Levanta `CartBusy` sem mexer em nenhum dos dois.
+    """
+    token = request.session.get(SESSION_TOKEN_KEY)
+    if token is None:
+        return
+    key = _user_key(user.pk)
+    with _locked(key):
+        request.session.pop(SESSION_TOKEN_KEY)
+        anonymous_key = _anonymous_key(token)
+        anonymous = _read(anonymous_key)
+        cache.delete(anonymous_key)
+        if not anonymous:
+            return
+        items = _read(key, user.pk)
+        for product_id, quantity in anonymous.items():
+            items[product_id] = min(maximum, items.get(product_id, 0) + quantity)
+        cache.set(key, encode(items), CART_TTL)
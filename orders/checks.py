@@ -0,0 +1,28 @@
+# orders/checks.py
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Caches que não são compartilhados entre processos (ou nem guardam nada)
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    US-4: O carrinho e a trava dele ficam no cache (orders/cart_store.py).
+    Com mais de um processo (workers), o cache precisa ser compartilhado:
+    num cache por processo o carrinho some entre requisições e a trava não
+    protege nada. Roda com `manage.py check --deploy`.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        f'O cache padrão ({backend}) não é compartilhado entre processos; '
+        'os carrinhos e as travas deles ficam presos a cada worker.',
+        hint="Use um cache compartilhado em CACHES['default'] (ex.: Redis ou Memcached).",
+        id='orders.W001',
+    )]
@@ -0,0 +1,77 @@
+# orders/events.py
+"""
+US-7: Publicação das mudanças de status dos pedidos para o navegador (SSE).
+
+O broker padrão é um pub/sub em memória do próprio processo: cada conexão
+SSE aberta é só uma `asyncio.Queue` inscrita no canal do pedido, então
+milhares de conexões paradas custam quase nada. Para vários processos,
+aponte `settings.ORDER_EVENTS_BROKER` para outra classe com a mesma
+interface (`subscribe`, `unsubscribe`, `publish`), ex.: uma que use Redis.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def order_channel(order_id):
+    return f'order:{order_id}'
+
+
+class InProcessBroker:
+    """Pub/sub em memória; `publish` pode ser chamado de qualquer thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # canal -> {(loop, queue)}
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            # A fila pertence ao event loop da conexão; entrega de forma thread-safe
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'ORDER_EVENTS_BROKER', None)
+        _broker = import_string(path)() if path else InProcessBroker()
+    return _broker
+
+
+def order_state(order):
+    """Dados do pedido enviados ao cliente."""
+    return {
+        'id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'pagamento_confirmado': order.pagamento_confirmado,
+    }
+
+
+def publish_order_state(order):
+    get_broker().publish(order_channel(order.id), order_state(order))
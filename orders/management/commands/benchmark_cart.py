@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from orders import cart_store
+from orders.cart import MAX_QUANTITY_PER_ITEM
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão de "adicionar ao carrinho" com o carrinho na sessão '
+        '(lê e regrava a sessão no banco a cada clique) e no cache compacto '
+        '(orders/cart_store.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cliques', type=int, default=5000)
+        parser.add_argument('--produtos', type=int, default=20, help='Produtos diferentes no carrinho.')
+        parser.add_argument('--http', action='store_true',
+                            help='Mede também a URL de adicionar ao carrinho pelo cliente de testes.')
+
+    def handle(self, *args, **options):
+        clicks = options['cliques']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:options['produtos']])
+        if clicks < 1 or not product_ids:
+            raise CommandError('Informe --cliques >= 1 e tenha pelo menos um produto cadastrado.')
+        sequence = [product_ids[n % len(product_ids)] for n in range(clicks)]
+
+        results = {
+            'sessão (banco)': self._session(sequence),
+            'cache compacto': self._cache(sequence),
+        }
+        if options['http']:
+            results['URL add_to_cart'] = self._http(sequence[:min(clicks, 500)])
+
+        baseline = results['sessão (banco)']
+        for label, (count, seconds) in results.items():
+            rate = count / seconds
+            self.stdout.write(
+                f'{label:>16}: {count} cliques em {seconds:.2f}s = {rate:,.0f} cliques/s '
+                f'({rate / (baseline[0] / baseline[1]):.1f}x)'
+            )
+
+    def _session(self, sequence):
+        # O que a view fazia: carregar a sessão, alterar o dict e regravar a linha
+        session = SessionStore()
+        session.create()
+        began = time.perf_counter()
+        for product_id in sequence:
+            store = SessionStore(session.session_key)
+            cart = store.get('cart', {})
+            key = str(product_id)
+            if cart.get(key, 0) < MAX_QUANTITY_PER_ITEM:
+                cart[key] = cart.get(key, 0) + 1
+            store['cart'] = cart
+            store.save()
+        elapsed = time.perf_counter() - began
+        session.delete()
+        return len(sequence), elapsed
+
+    def _cache(self, sequence):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()  # visitante: chave pelo token da sessão
+        request.session = SessionStore()
+        began = time.perf_counter()
+        for product_id in sequence:
+            try:
+                cart_store.increment(request, product_id, 1, maximum=MAX_QUANTITY_PER_ITEM)
+            except cart_store.CartLimitExceeded:
+                pass
+        elapsed = time.perf_counter() - began
+        cache.delete(cart_store.cart_key(request))
+        return len(sequence), elapsed
+
+    def _http(self, sequence):
+        client = Client()
+        urls = [reverse('orders:add_to_cart', args=[product_id]) for product_id in sequence]
+        began = time.perf_counter()
+        for url in urls:
+            client.get(url)
+        return len(urls), time.perf_counter() - began
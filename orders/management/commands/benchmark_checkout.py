@@ -0,0 +1,76 @@
+import decimal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+
+from orders.cart import CartLine, PricedCart
+from orders.models import Order
+from orders.placement import InsufficientStock, place_order
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão do checkout de um mesmo cupcake com estoque numa única '
+        'linha e com estoque fracionado, usando várias threads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=50, help='Pedidos por thread.')
+        parser.add_argument('--particoes', type=int, default=8, help='Partições do modo fracionado.')
+
+    def handle(self, *args, **options):
+        for particoes in (0, options['particoes']):
+            label = 'linha única' if not particoes else f'{particoes} partições'
+            result = self._run(particoes, options['threads'], options['orders'])
+            self.stdout.write(
+                f"{label:>15}: {result['pedidos']} pedidos em {result['segundos']:.2f}s "
+                f"= {result['pedidos'] / result['segundos']:.1f} pedidos/s "
+                f"({result['retentativas']} retentativas por bloqueio)"
+            )
+
+    def _run(self, particoes, threads, orders_per_thread):
+        total = threads * orders_per_thread
+        product = Product.objects.create(
+            nome='[benchmark] cupcake', sabor='benchmark', valor=decimal.Decimal('5.00'),
+            quantidade_estoque=total, estoque_particoes=particoes, imagem='cupcakes/benchmark.jpg',
+        )
+        product.refresh_from_db()
+        counters = {'pedidos': 0, 'retentativas': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(threads + 1)
+
+        def buyer():
+            start.wait()
+            try:
+                for _ in range(orders_per_thread):
+                    while True:
+                        try:
+                            place_order(None, PricedCart([CartLine(product, 1)], []), frete=0)
+                        except OperationalError:
+                            with lock:
+                                counters['retentativas'] += 1
+                            continue
+                        except InsufficientStock:
+                            break
+                        with lock:
+                            counters['pedidos'] += 1
+                        break
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buyer) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        began = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        counters['segundos'] = time.perf_counter() - began
+
+        Order.objects.filter(items__produto=product).delete()
+        product.delete()
+        return counters
@@ -0,0 +1,53 @@
+import decimal
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders import shipping
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de cotação de frete (US-13) numa tabela sintética de faixas de CEP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--faixas', type=int, default=100_000)
+        parser.add_argument('--consultas', type=int, default=200_000)
+
+    def handle(self, *args, **options):
+        total = options['faixas']
+        width = 100_000_000 // total
+        rates = [
+            shipping.Rate(i * width, (i + 1) * width - 1,
+                          decimal.Decimal(5 + i % 20), decimal.Decimal('2.50'), 1 + i % 10)
+            for i in range(total)
+        ]
+        started = time.perf_counter()
+        index = shipping.RateIndex(rates)
+        self.stdout.write(f'Índice com {len(index)} faixas montado em {time.perf_counter() - started:.3f}s')
+
+        rng = random.Random(42)
+        ceps = [rng.randrange(100_000_000) for _ in range(options['consultas'])]
+        units = [rng.randint(1, 60) for _ in ceps]
+
+        started = time.perf_counter()
+        for cep in ceps:
+            index.find(cep)
+        self._report('bisect (sem LRU)', started, len(ceps))
+
+        started = time.perf_counter()
+        for cep, n in zip(ceps, units):
+            index.quote(cep, n)
+        self._report('cotação, CEPs variados', started, len(ceps))
+
+        # Tráfego real se concentra em poucas regiões: o LRU passa a acertar
+        popular = ceps[:500]
+        repeated = [rng.choice(popular) for _ in ceps]
+        started = time.perf_counter()
+        for cep, n in zip(repeated, units):
+            index.quote(cep, n)
+        self._report('cotação, CEPs repetidos', started, len(ceps))
+
+    def _report(self, label, started, count):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:>24}: {elapsed / count * 1e6:.2f} µs por consulta')
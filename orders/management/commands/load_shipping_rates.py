@@ -0,0 +1,49 @@
+import csv
+import decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from orders import shipping
+from orders.models import ShippingRate
+
+
+class Command(BaseCommand):
+    help = (
+        'Substitui a tabela de frete (US-13) pelas faixas de um CSV com as colunas '
+        'cep_inicial,cep_final,valor,valor_caixa_extra,prazo_dias.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rates = []
+        with open(options['arquivo'], newline='', encoding='utf-8') as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    rates.append(shipping.Rate(
+                        shipping.parse_cep(row['cep_inicial']),
+                        shipping.parse_cep(row['cep_final']),
+                        decimal.Decimal(row['valor']),
+                        decimal.Decimal(row.get('valor_caixa_extra') or '0'),
+                        int(row['prazo_dias']),
+                    ))
+                except (KeyError, ValueError, decimal.InvalidOperation) as e:
+                    raise CommandError(f'Linha {line} inválida: {e!r}')
+
+        try:
+            shipping.RateIndex(rates)  # valida sobreposições antes de gravar
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with transaction.atomic():
+            ShippingRate.objects.all().delete()
+            ShippingRate.objects.bulk_create(
+                [ShippingRate(**rate._asdict()) for rate in rates],
+                batch_size=options['batch_size'],
+            )
+        # bulk_create não dispara sinais: avisa os processos manualmente
+        shipping.invalidate_rates()
+        self.stdout.write(self.style.SUCCESS(f'{len(rates)} faixas de frete carregadas.'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cep_inicial', models.PositiveIntegerField()),
+                ('cep_final', models.PositiveIntegerField()),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('valor_caixa_extra', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('prazo_dias', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'ordering': ['cep_inicial'],
+            },
+        ),
+    ]
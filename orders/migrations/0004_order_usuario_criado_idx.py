@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_shipping_rate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['usuario', 'criado_em'], name='order_usuario_criado_idx'),
+        ),
+    ]
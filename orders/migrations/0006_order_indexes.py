@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_savedcart'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['criado_em'], name='order_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('pagamento_confirmado', True)), fields=['criado_em'], name='order_pago_criado_idx'),
+        ),
+    ]
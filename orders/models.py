@@ -31,6 +31,29 @@ class Order(models.Model):
     pagamento_confirmado = models.BooleanField(default=False)
     
     criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # US-7: "Meus pedidos", mais recentes primeiro (paginado)
+            models.Index(fields=['usuario', 'criado_em'], name='order_usuario_criado_idx'),
+            # Dashboard: "pedidos hoje"
+            models.Index(fields=['criado_em'], name='order_criado_idx'),
+            # US-12: Relatório de vendas e resumos diários, só pedidos pagos (parcial)
+            models.Index(fields=['criado_em'], condition=models.Q(pagamento_confirmado=True),
+                         name='order_pago_criado_idx'),
+        ]
+
+    @property
+    def subtotal(self):
+        # Valor dos itens, sem o frete
+        return self.valor_total - self.valor_frete
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado carregado, para publicar só mudanças reais de status (US-7)
+        instance._estado_salvo = (instance.__dict__.get('status'), instance.__dict__.get('pagamento_confirmado'))
+        return instance
     
     def __str__(self):
         return f'Pedido #{self.id} - {self.usuario.username}'
@@ -45,4 +68,32 @@ class OrderItem(models.Model):
     valor_unitario = models.DecimalField(max_digits=6, decimal_places=2)
     
     def __str__(self):
-        return f'{self.quantidade}x {self.produto.nome}'
\ No newline at end of file
+        return f'{self.quantidade}x {self.produto.nome}'
+
+class ShippingRate(models.Model):
+    # US-13: Tabela de frete por faixa de CEP (só dígitos, ex.: 01000000)
+    cep_inicial = models.PositiveIntegerField()
+    cep_final = models.PositiveIntegerField()
+    valor = models.DecimalField(max_digits=6, decimal_places=2)
+    # Acréscimo por caixa extra (carrinhos grandes)
+    valor_caixa_extra = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    prazo_dias = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['cep_inicial']
+
+    def __str__(self):
+        return f'{self.cep_inicial:08d}-{self.cep_final:08d}: R$ {self.valor}'
+
+class SavedCart(models.Model):
+    # US-4: Cópia durável do carrinho do cliente (o carrinho em si fica no cache).
+    # Gravada no checkout e no logout; lida só quando o cache perde o carrinho.
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+    # Formato compacto "produto:quantidade,..." (orders/cart_store.py)
+    itens = models.TextField(blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Carrinho de {self.usuario_id}: {self.itens}'
@@ -0,0 +1,132 @@
+# orders/placement.py
+"""
+US-5 / US-11: Criação do pedido com baixa de estoque atômica.
+
+Tudo roda numa transação: o estoque de todas as linhas é abatido por um
+único UPDATE condicional (só onde há estoque suficiente) e os itens são
+gravados com `bulk_create`. Se alguma linha não tiver estoque, nada é
+gravado e a exceção informa quais linhas faltaram. Depois do commit a
+cesta alimenta as recomendações (store/recommendations.py).
+"""
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+
+from store import inventory, recommendations
+from store.models import Product
+from .models import Order, OrderItem
+
+
+class InsufficientStock(Exception):
+    """Uma ou mais linhas do carrinho não têm estoque suficiente."""
+
+    def __init__(self, shortages):
+        # shortages: lista de (CartLine, quantidade disponível)
+        self.shortages = shortages
+        super().__init__(', '.join(
+            f'{line.product.nome}: pedido {line.quantity}, disponível {available}'
+            for line, available in shortages
+        ))
+
+    def messages(self):
+        for line, available in self.shortages:
+            if available:
+                yield f'Só restam {available} unidades de "{line.product.nome}" (você pediu {line.quantity}).'
+            else:
+                yield f'"{line.product.nome}" esgotou enquanto você finalizava o pedido.'
+
+
+class _Rollback(Exception):
+    pass
+
+
+def decrement_stock(lines):
+    """
+    Abate o estoque de todas as `lines` num único UPDATE que só atinge
+    produtos com estoque suficiente (produtos com estoque fracionado são
+    abatidos nas suas partições). Levanta `InsufficientStock` se alguma
+    linha ficou de fora; nesse caso nenhum estoque é abatido.
+    """
+    sharded = [line for line in lines if line.product.estoque_particoes]
+    requested = {line.product.id: line.quantity for line in lines if not line.product.estoque_particoes}
+
+    try:
+        with transaction.atomic():
+            failed = False
+            if requested:
+                enough = Q()
+                for product_id, quantity in requested.items():
+                    enough |= Q(pk=product_id, quantidade_estoque__gte=quantity)
+
+                # A versão da API (atualizado_em) só muda para quem esgotou
+                now = timezone.now()
+                updated = Product.objects.filter(enough).update(quantidade_estoque=Case(
+                    *[When(pk=product_id, then=F('quantidade_estoque') - quantity)
+                      for product_id, quantity in requested.items()],
+                    default=F('quantidade_estoque'),
+                    output_field=PositiveIntegerField(),
+                ), atualizado_em=Case(
+                    *[When(pk=product_id, quantidade_estoque=quantity, then=Value(now))
+                      for product_id, quantity in requested.items()],
+                    default=F('atualizado_em'),
+                    output_field=DateTimeField(),
+                ))
+                failed = updated != len(requested)
+
+            for line in sharded:
+                if failed:
+                    break
+                failed = not inventory.decrement(line.product.id, line.product.estoque_particoes, line.quantity)
+
+            if failed:
+                # Desfaz as baixas parciais antes de consultar o estoque disponível
+                raise _Rollback
+    except _Rollback:
+        pass
+    else:
+        return
+
+    # Descobre quais linhas faltaram para dar um erro por item
+    available = dict(
+        Product.objects.filter(pk__in=requested).values_list('id', 'quantidade_estoque')
+    )
+    available.update(inventory.shard_totals([line.product.id for line in sharded]))
+    shortages = [
+        (line, available.get(line.product.id, 0))
+        for line in lines
+        if available.get(line.product.id, 0) < line.quantity
+    ]
+    raise InsufficientStock(shortages)
+
+
+def place_order(user, priced, frete, payment_confirmed=True):
+    """
+    Cria o pedido a partir do carrinho precificado (`orders.cart.PricedCart`).
+    Retorna o `Order` criado ou levanta `InsufficientStock`.
+    """
+    with transaction.atomic():
+        # Abate o estoque primeiro: se faltar, nada mais é gravado
+        decrement_stock(priced.lines)
+
+        # US-6 (RN#1): Pedido só é liberado após pagamento.
+        order = Order.objects.create(
+            usuario=user,
+            valor_total=priced.subtotal + frete,
+            valor_frete=frete,
+            status='recebido', # US-7: Status inicial
+            pagamento_confirmado=payment_confirmed,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                pedido=order,
+                produto=line.product,
+                quantidade=line.quantity,
+                valor_unitario=line.product.valor,
+            )
+            for line in priced.lines
+        ])
+        # "Comprados juntos": soma a cesta à matriz depois do commit; uma
+        # falha aí não pode derrubar o pedido já gravado.
+        product_ids = [line.product.id for line in priced.lines]
+        transaction.on_commit(lambda: recommendations.record_order(product_ids), robust=True)
+    return order
@@ -0,0 +1,151 @@
+# orders/shipping.py
+"""
+US-13: Cálculo de frete por faixa de CEP.
+
+As faixas da tabela `ShippingRate` são carregadas numa lista ordenada e
+consultadas com `bisect` (busca binária), sem ir ao banco a cada cotação.
+As cotações ficam num LRU indexado pelo prefixo do CEP (5 dígitos) e pela
+faixa de peso do carrinho (número de caixas).
+
+Quando a tabela muda, os sinais de `ShippingRate` trocam a versão guardada
+no cache compartilhado e cada processo recarrega o índice na próxima
+verificação. Sem nenhuma faixa cadastrada vale a regra padrão antiga
+(CEP começando com 0: R$ 5,00 em 2 dias; demais: R$ 10,00 em 5 dias).
+"""
+import bisect
+import decimal
+import functools
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Cupcakes por caixa: cada caixa extra soma `valor_caixa_extra` ao frete
+CUPCAKES_PER_BOX = getattr(settings, 'SHIPPING_CUPCAKES_PER_BOX', 12)
+
+# Tamanho do LRU de cotações e intervalo (s) para conferir se a tabela mudou
+QUOTE_CACHE_SIZE = getattr(settings, 'SHIPPING_QUOTE_CACHE_SIZE', 4096)
+RELOAD_CHECK_SECONDS = getattr(settings, 'SHIPPING_RELOAD_CHECK_SECONDS', 5)
+
+VERSION_CACHE_KEY = 'orders:shipping_rates_version'
+
+Rate = namedtuple('Rate', 'cep_inicial cep_final valor valor_caixa_extra prazo_dias')
+Quote = namedtuple('Quote', 'valor prazo_dias')
+
+DEFAULT_RATES = [
+    Rate(0, 9999999, decimal.Decimal('5.00'), decimal.Decimal('0.00'), 2),
+    Rate(10000000, 99999999, decimal.Decimal('10.00'), decimal.Decimal('0.00'), 5),
+]
+
+_CEP_RE = re.compile(r'^\d{5}-?\d{3}$')
+
+
+class InvalidCEP(ValueError):
+    pass
+
+
+def parse_cep(cep):
+    """'01310-100' -> 1310100. Levanta `InvalidCEP` se não tiver 8 dígitos."""
+    cep = (cep or '').strip()
+    if not _CEP_RE.match(cep):
+        raise InvalidCEP(cep)
+    return int(cep.replace('-', ''))
+
+
+def box_count(units):
+    # Faixa de peso do carrinho: quantas caixas os cupcakes ocupam
+    return max(1, -(-units // CUPCAKES_PER_BOX))
+
+
+class RateIndex:
+    """Faixas de CEP ordenadas, sem sobreposição, com busca binária."""
+
+    def __init__(self, rates):
+        rates = sorted(rates)
+        for previous, current in zip(rates, rates[1:]):
+            if current.cep_inicial <= previous.cep_final:
+                raise ValueError(f'Faixas de CEP sobrepostas: {previous} e {current}')
+        self._rates = rates
+        self._starts = [rate.cep_inicial for rate in rates]
+
+        # Prefixos (5 dígitos) cortados por alguma faixa: nesses a cotação
+        # depende do CEP inteiro e não pode ser memorizada pelo prefixo.
+        self._split_prefixes = set()
+        for rate in rates:
+            if rate.cep_inicial % 1000:
+                self._split_prefixes.add(rate.cep_inicial // 1000)
+            if rate.cep_final % 1000 != 999:
+                self._split_prefixes.add(rate.cep_final // 1000)
+
+        self._cached_quote = functools.lru_cache(maxsize=QUOTE_CACHE_SIZE)(self._quote)
+
+    def __len__(self):
+        return len(self._rates)
+
+    def find(self, cep):
+        i = bisect.bisect_right(self._starts, cep) - 1
+        if i >= 0 and cep <= self._rates[i].cep_final:
+            return self._rates[i]
+        return None
+
+    def _quote(self, cep, boxes):
+        rate = self.find(cep)
+        if rate is None:
+            return None
+        return Quote(rate.valor + rate.valor_caixa_extra * (boxes - 1), rate.prazo_dias)
+
+    def quote(self, cep, units=1):
+        """Cotação para o CEP (inteiro) e a quantidade de cupcakes, ou None se não atende."""
+        boxes = box_count(units)
+        prefix = cep // 1000
+        if prefix in self._split_prefixes:
+            return self._cached_quote(cep, boxes)
+        # Todo o prefixo cai na mesma faixa: memoriza pelo primeiro CEP dele
+        return self._cached_quote(prefix * 1000, boxes)
+
+
+def load_rates():
+    from .models import ShippingRate
+    rates = [
+        Rate(*row) for row in ShippingRate.objects.order_by('cep_inicial').values_list(
+            'cep_inicial', 'cep_final', 'valor', 'valor_caixa_extra', 'prazo_dias'
+        )
+    ]
+    return RateIndex(rates or DEFAULT_RATES)
+
+
+_lock = threading.Lock()
+_state = {'index': None, 'version': None, 'checked_at': 0.0}
+
+
+def get_index():
+    """Índice atual, recarregado se a versão no cache compartilhado mudou."""
+    now = time.monotonic()
+    if _state['index'] is not None and now - _state['checked_at'] < RELOAD_CHECK_SECONDS:
+        return _state['index']
+
+    with _lock:
+        version = cache.get(VERSION_CACHE_KEY)
+        if _state['index'] is None or version != _state['version']:
+            _state['index'] = load_rates()
+            _state['version'] = version
+        _state['checked_at'] = now
+        return _state['index']
+
+
+def invalidate_rates():
+    """Avisa todos os processos que a tabela de frete mudou."""
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    _state['checked_at'] = 0.0
+
+
+def quote(cep, units=1):
+    """
+    Cotação de frete para um CEP em texto ('01310-100'). Levanta `InvalidCEP`
+    para CEP mal formatado e retorna None se nenhuma faixa atende o CEP.
+    """
+    return get_index().quote(parse_cep(cep), units)
@@ -0,0 +1,48 @@
+# orders/signals.py
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import cart_store, events, shipping
+from .cart import MAX_QUANTITY_PER_ITEM
+from .models import Order, ShippingRate
+
+
+@receiver(post_save, sender=ShippingRate)
+@receiver(post_delete, sender=ShippingRate)
+def reload_shipping_rates(sender, **kwargs):
+    # US-13: Tabela de frete mudou; todos os processos recarregam o índice
+    shipping.invalidate_rates()
+
+
+@receiver(post_save, sender=Order)
+def publish_order_status(sender, instance, created, update_fields=None, **kwargs):
+    # US-7: Avisa os clientes conectados (SSE) quando status/pagamento mudam.
+    # Atualizações via QuerySet.update() não disparam sinais e não são publicadas.
+    if created:
+        return
+    if update_fields is not None and not {'status', 'pagamento_confirmado'}.intersection(update_fields):
+        return
+    estado = (instance.status, instance.pagamento_confirmado)
+    if estado == getattr(instance, '_estado_salvo', None):
+        return
+    instance._estado_salvo = estado
+    transaction.on_commit(lambda: events.publish_order_state(instance))
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    # US-4: O que o visitante colocou no carrinho continua lá depois do login
+    if request is not None and hasattr(request, 'session'):
+        try:
+            cart_store.merge_anonymous_cart(request, user, MAX_QUANTITY_PER_ITEM)
+        except cart_store.CartBusy:
+            pass  # o carrinho do cliente está sendo alterado; o login não pode falhar por isso
+
+
+@receiver(user_logged_out)
+def persist_cart_on_logout(sender, request, user, **kwargs):
+    # US-4: Guarda no banco o carrinho de quem saiu (o cache pode expirar antes da volta)
+    if user is not None:
+        cart_store.persist(user.pk)
@@ -1,3 +1,390 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import decimal
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, OperationalError
+from django.core.checks import Tags, run_checks
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from store import inventory
+from store.models import Product
+from users.models import CustomUser
+from .cart import DEFAULT_SHIPPING, MAX_QUANTITY_PER_ITEM, CartLine, PricedCart, price_cart
+from .models import Order, OrderItem, SavedCart, ShippingRate
+from . import cart_store, checks, events, shipping
+from .placement import InsufficientStock, place_order
+
+
+def make_product(estoque, valor='5.00', nome='Cupcake', particoes=0):
+    product = Product.objects.create(nome=nome, sabor='baunilha', valor=decimal.Decimal(valor),
+                                     quantidade_estoque=estoque, estoque_particoes=particoes,
+                                     imagem='cupcakes/x.jpg')
+    product.refresh_from_db()
+    return product
+
+
+def make_cart(*lines):
+    return PricedCart([CartLine(product, quantity) for product, quantity in lines], [])
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('cliente', password='x', cpf='000.000.000-00')
+
+    def test_creates_items_and_decrements_stock(self):
+        a, b = make_product(10), make_product(3, nome='Outro')
+        order = place_order(self.user, make_cart((a, 4), (b, 3)), frete=0)
+
+        self.assertEqual(order.items.count(), 2)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.quantidade_estoque, b.quantidade_estoque), (6, 0))
+
+    def test_short_line_rolls_back_everything(self):
+        a, b = make_product(5), make_product(2, nome='Outro')
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            place_order(self.user, make_cart((a, 4), (b, 3)), frete=0)
+
+        [(line, available)] = ctx.exception.shortages
+        self.assertEqual((line.product, available), (b, 2))
+        a.refresh_from_db()
+        self.assertEqual(a.quantidade_estoque, 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_sharded_sale_does_not_write_the_product_row(self):
+        product = make_product(100, particoes=4)
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                place_order(self.user, make_cart((product, 2)), frete=0)
+            updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "store_product"')]
+            self.assertEqual(updates, [])
+
+        # O total gravado fica para trás; o estoque mostrado vem das partições
+        product.refresh_from_db()
+        self.assertEqual(product.quantidade_estoque, 100)
+        self.assertEqual(inventory.with_stock(Product.objects).get(pk=product.pk).estoque_atual, 94)
+        self.assertEqual(sum(product.stock_shards.values_list('quantidade', flat=True)), 94)
+
+    def test_sharded_stock_spans_partitions_and_syncs_total(self):
+        product = make_product(10, particoes=4)  # partições de 3, 3, 2, 2
+        place_order(self.user, make_cart((product, 7)), frete=0)
+
+        product.refresh_from_db()
+        self.assertEqual(product.quantidade_estoque, 3)
+        self.assertEqual(sum(product.stock_shards.values_list('quantidade', flat=True)), 3)
+
+        with self.assertRaises(InsufficientStock):
+            place_order(self.user, make_cart((product, 4)), frete=0)
+        self.assertEqual(sum(product.stock_shards.values_list('quantidade', flat=True)), 3)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Vários clientes comprando o mesmo cupcake ao mesmo tempo."""
+
+    threads = 12
+    attempts_per_thread = 5
+    stock = 20
+    particoes = 0
+
+    def setUp(self):
+        # O commit de verdade dispararia o pool de processos das variantes
+        # de imagem (store/images.py) para uma foto que não existe
+        patcher = mock.patch('store.images.schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stock_never_goes_negative(self):
+        user = CustomUser.objects.create_user('cliente', password='x', cpf='000.000.000-00')
+        product = make_product(self.stock, particoes=self.particoes)
+        sold = []
+        start = threading.Barrier(self.threads)
+
+        def buyer():
+            start.wait()
+            try:
+                for _ in range(self.attempts_per_thread):
+                    for _retry in range(50):
+                        try:
+                            place_order(user, make_cart((product, 1)), frete=0)
+                            sold.append(1)
+                        except InsufficientStock:
+                            pass
+                        except OperationalError:
+                            # SQLite: banco travado por outra escrita, tenta de novo
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buyer) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        product.refresh_from_db()
+        self.assertGreaterEqual(product.quantidade_estoque, 0)
+        self.assertEqual(len(sold), self.stock - product.quantidade_estoque)
+        self.assertEqual(OrderItem.objects.filter(produto=product).count(), len(sold))
+
+
+class ConcurrentShardedCheckoutTests(ConcurrentCheckoutTests):
+    particoes = 4
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = make_product(100)
+        self.user = CustomUser.objects.create_user('cliente', password=None, cpf='000.000.000-00')
+
+    def add(self, times):
+        for _ in range(times):
+            self.client.get(reverse('orders:add_to_cart', args=[self.product.pk]))
+
+    def test_limit_per_item(self):
+        self.add(MAX_QUANTITY_PER_ITEM)
+        response = self.client.get(reverse('orders:add_to_cart', args=[self.product.pk]), follow=True)
+        self.assertIn('Quantidade máxima', [str(m) for m in response.context['messages']][-1])
+        self.assertEqual(response.context['cart_items'][0].quantity, MAX_QUANTITY_PER_ITEM)
+
+    def test_busy_cart_is_not_changed(self):
+        self.client.force_login(self.user)
+        self.add(3)
+        key = cart_store._user_key(self.user.pk)
+        cache.add(f'{key}:lock', 1, 60)  # outra requisição segurando a trava
+        with mock.patch.object(cart_store, 'LOCK_TIMEOUT', 0.05):
+            response = self.client.get(reverse('orders:add_to_cart', args=[self.product.pk]), follow=True)
+        self.assertIn('outra aba', [str(m) for m in response.context['messages']][-1])
+        self.assertEqual(cache.get(key), f'{self.product.pk}:3')
+
+    def test_deploy_check_warns_about_per_process_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([warning.id for warning in checks.check_shared_cache(None)], ['orders.W001'])
+            self.assertIn('orders.W001', [
+                message.id for message in run_checks(tags=[Tags.caches], include_deployment_checks=True)
+            ])
+        with override_settings(CACHES=redis):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+    def test_anonymous_cart_is_merged_on_login(self):
+        self.add(2)
+        cache.set(cart_store._user_key(self.user.pk), f'{self.product.pk}:49')
+        self.client.force_login(self.user)
+        self.assertEqual(cache.get(cart_store._user_key(self.user.pk)), f'{self.product.pk}:50')
+
+        # Cache perdido: o carrinho volta da cópia gravada no checkout
+        self.client.get(reverse('orders:checkout'))
+        cache.clear()
+        self.assertEqual(SavedCart.objects.get(usuario=self.user).itens, f'{self.product.pk}:50')
+        response = self.client.get(reverse('orders:cart_detail'))
+        self.assertEqual(response.context['cart_items'][0].quantity, 50)
+
+
+class PriceCartTests(TestCase):
+    """US-4/US-5: Preços do carrinho numa consulta, itens indisponíveis e as regras de valor."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('cliente', password=None, cpf='000.000.000-00')
+
+    def price(self, items):
+        cache.set(cart_store._user_key(self.user.pk), cart_store.encode(items))
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return request, price_cart(request)
+
+    def test_all_items_in_one_query(self):
+        products = [make_product(10, nome=f'Cupcake {n}') for n in range(5)]
+        with self.assertNumQueries(1):
+            request, priced = self.price({product.pk: 2 for product in products})
+        self.assertEqual(priced.subtotal, decimal.Decimal('50.00'))
+        self.assertEqual(priced.items_count, 10)
+        with self.assertNumQueries(0):
+            self.assertIs(price_cart(request), priced)  # uma vez por requisição
+
+    def test_drops_vanished_and_out_of_stock_items(self):
+        kept, sold_out, gone = make_product(10), make_product(0, nome='Esgotado'), make_product(10, nome='Removido')
+        gone_id = gone.pk
+        gone.delete()
+        _, priced = self.price({kept.pk: 3, sold_out.pk: 1, gone_id: 2})
+        self.assertEqual([(line.product, line.quantity) for line in priced], [(kept, 3)])
+        self.assertEqual(priced.removed, [sold_out])  # avisado ao cliente
+        self.assertEqual(cache.get(cart_store._user_key(self.user.pk)), f'{kept.pk}:3')
+
+    def test_minimum_order(self):
+        product = make_product(10, valor='4.99')
+        _, priced = self.price({product.pk: 2})
+        self.assertFalse(priced.min_order_met)
+        cache.clear()
+        _, priced = self.price({product.pk: 3})
+        self.assertTrue(priced.min_order_met)
+
+        # O checkout manda de volta ao carrinho abaixo do mínimo
+        self.client.force_login(self.user)
+        cache.set(cart_store._user_key(self.user.pk), f'{product.pk}:2')
+        response = self.client.get(reverse('orders:checkout'), follow=True)
+        self.assertRedirects(response, reverse('orders:cart_detail'))
+        self.assertIn('valor mínimo', str(list(response.context['messages'])[-1]))
+
+    def test_free_shipping_threshold(self):
+        product = make_product(100, valor='9.99')
+        _, priced = self.price({product.pk: 10})  # R$ 99,90
+        self.assertFalse(priced.free_shipping)
+        self.assertEqual(priced.shipping(), DEFAULT_SHIPPING)
+        self.assertEqual(priced.shipping(decimal.Decimal('7.00')), decimal.Decimal('7.00'))
+        _, priced = self.price({product.pk: 11})  # R$ 109,89
+        self.assertTrue(priced.free_shipping)
+        self.assertEqual(priced.shipping(decimal.Decimal('7.00')), decimal.Decimal('0.00'))
+
+
+class ShippingTests(TestCase):
+    """US-13: Faixas de CEP, cache de cotações e a tabela padrão."""
+
+    def setUp(self):
+        cache.clear()
+        shipping.invalidate_rates()
+
+    def rate(self, inicio, fim, valor, caixa='0.00', prazo=3):
+        return shipping.Rate(inicio, fim, decimal.Decimal(valor), decimal.Decimal(caixa), prazo)
+
+    def test_bisect_finds_the_range(self):
+        index = shipping.RateIndex([
+            self.rate(20000000, 28999999, '12.00'), self.rate(1000000, 5999999, '7.00'),
+        ])
+        for cep, valor in [(999999, None), (1000000, '7.00'), (5999999, '7.00'), (6000000, None),
+                           (20000000, '12.00'), (28999999, '12.00'), (99999999, None)]:
+            rate = index.find(cep)
+            self.assertEqual(rate and str(rate.valor), valor, cep)
+
+    def test_rejects_overlapping_ranges(self):
+        with self.assertRaises(ValueError):
+            shipping.RateIndex([self.rate(1000000, 5999999, '7.00'), self.rate(5999999, 8999999, '9.00')])
+
+    def test_quotes_are_cached_by_cep_prefix_and_boxes(self):
+        # 01310-500 em diante é outra faixa: o prefixo 01310 é cortado
+        index = shipping.RateIndex([
+            self.rate(1000000, 1310499, '7.00', caixa='2.00'), self.rate(1310500, 5999999, '9.00'),
+        ])
+        self.assertEqual(index.quote(1200001), (decimal.Decimal('7.00'), 3))
+        self.assertEqual(index.quote(1200999), (decimal.Decimal('7.00'), 3))
+        self.assertEqual(index._cached_quote.cache_info().hits, 1)  # mesmo prefixo, mesma chave
+
+        # Prefixo cortado: a chave é o CEP inteiro
+        self.assertEqual(index.quote(1310100).valor, decimal.Decimal('7.00'))
+        self.assertEqual(index.quote(1310600).valor, decimal.Decimal('9.00'))
+        self.assertEqual(index._cached_quote.cache_info().hits, 1)
+
+        # 13 cupcakes: duas caixas
+        self.assertEqual(index.quote(1200001, units=13).valor, decimal.Decimal('9.00'))
+
+    def test_reloads_when_the_version_changes(self):
+        self.assertEqual(shipping.quote('01310-100').valor, decimal.Decimal('5.00'))
+        ShippingRate.objects.create(cep_inicial=1000000, cep_final=1999999, valor='8.50', prazo_dias=1)
+        self.assertEqual(shipping.quote('01310-100'), (decimal.Decimal('8.50'), 1))
+
+        # Outro processo mudou a tabela: só recarrega na próxima verificação
+        ShippingRate.objects.filter(cep_inicial=1000000).update(valor='6.00')
+        cache.set(shipping.VERSION_CACHE_KEY, 'outra')
+        self.assertEqual(shipping.quote('01310-100').valor, decimal.Decimal('8.50'))
+        with mock.patch.object(shipping, 'RELOAD_CHECK_SECONDS', 0):
+            self.assertEqual(shipping.quote('01310-100').valor, decimal.Decimal('6.00'))
+
+    def test_default_rates_without_a_table(self):
+        self.assertEqual(shipping.quote('01310-100'), (decimal.Decimal('5.00'), 2))
+        self.assertEqual(shipping.quote('20040020'), (decimal.Decimal('10.00'), 5))
+        with self.assertRaises(shipping.InvalidCEP):
+            shipping.quote('2004')
+
+
+class CheckoutShippingTests(TestCase):
+    """O checkout cobra o frete da faixa do CEP, ou o padrão sem CEP."""
+
+    def setUp(self):
+        cache.clear()
+        shipping.invalidate_rates()
+        ShippingRate.objects.create(cep_inicial=1000000, cep_final=1999999, valor='7.00', prazo_dias=1)
+        self.product = make_product(100)
+        self.client.force_login(CustomUser.objects.create_user('cliente', password=None, cpf='000.000.000-00'))
+        self.client.get(reverse('orders:add_to_cart', args=[self.product.pk]))
+        self.client.get(reverse('orders:add_to_cart', args=[self.product.pk]))  # R$ 10,00
+
+    def checkout(self, **data):
+        return self.client.post(reverse('orders:checkout'), data)
+
+    def test_uses_the_rate_of_the_cep(self):
+        self.checkout(cep='01310-100')
+        self.assertEqual(Order.objects.get().valor_frete, decimal.Decimal('7.00'))
+
+    def test_without_cep_charges_the_default(self):
+        self.checkout()
+        self.assertEqual(Order.objects.get().valor_frete, DEFAULT_SHIPPING)
+
+    def test_refuses_a_cep_outside_the_table(self):
+        response = self.checkout(cep='20040-020')
+        self.assertRedirects(response, reverse('orders:checkout'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderListTests(TestCase):
+
+    def test_pages_through_orders_in_the_same_millisecond(self):
+        user = CustomUser.objects.create_user('cliente', password=None, cpf='1')
+        orders = Order.objects.bulk_create([Order(usuario=user, valor_total=10) for _ in range(25)])
+        instant = timezone.now().replace(microsecond=456000)
+        for n, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(criado_em=instant + datetime.timedelta(microseconds=n))
+
+        self.client.force_login(user)
+        seen, cursor = [], ''
+        while cursor is not None:
+            page = self.client.get(reverse('orders:order_list'), {'cursor': cursor}).context['page']
+            seen += [order.pk for order in page]
+            cursor = page.next_cursor
+        self.assertEqual(seen, [order.pk for order in reversed(orders)])
+
+
+class OrderEventsTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('cliente', password=None, cpf='1')
+        self.order = Order.objects.create(usuario=self.user, valor_total=10)
+
+    def test_status_change_reaches_subscriber_on_commit(self):
+        broker = events.InProcessBroker()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return broker.subscribe(events.order_channel(self.order.pk))
+
+        with mock.patch.object(events, '_broker', broker):
+            queue = loop.run_until_complete(subscribe())
+            with self.captureOnCommitCallbacks(execute=True):
+                order = Order.objects.get(pk=self.order.pk)
+                order.status = 'em_preparo'
+                order.save(update_fields=['status'])
+                loop.run_until_complete(asyncio.sleep(0))
+                self.assertTrue(queue.empty())  # só publica depois do commit
+            message = loop.run_until_complete(asyncio.wait_for(queue.get(), 1))
+        self.assertEqual(message['status'], 'em_preparo')
+        self.assertEqual(message['id'], self.order.pk)
+
+    def test_only_the_owner_can_subscribe(self):
+        url = reverse('orders:order_events', args=[self.order.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)  # anônimo vai para o login
+        self.assertEqual(events.get_broker().subscriber_count(events.order_channel(self.order.pk)), 0)
+
+        self.client.force_login(CustomUser.objects.create_user('outro', password=None, cpf='2'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(events.get_broker().subscriber_count(events.order_channel(self.order.pk)), 0)
@@ -19,4 +19,5 @@ urlpatterns = [
     # US-7: Acompanhar status do pedido
     path('meus-pedidos/', views.order_list_view, name='order_list'),
     path('meus-pedidos/<int:pk>/', views.order_detail_view, name='order_detail'),
+    path('meus-pedidos/<int:pk>/eventos/', views.order_events_view, name='order_events'),
 ]
\ No newline at end of file
@@ -2,77 +2,78 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.conf import settings
+from django.db.models import DecimalField, F, Prefetch, Sum
 from .models import Order, OrderItem
+from .cart import (
+    MAX_QUANTITY_PER_ITEM, DEFAULT_SHIPPING,
+    get_cart, save_cart, price_cart, invalidate,
+)
+from .placement import InsufficientStock, place_order
+from . import cart_store, events, shipping
+import asyncio
+import json
 from store.models import Product
-import decimal # Para lidar com os valores
+from store.pagination import paginate_keyset
 
 # --- Funções do Carrinho (US-4) ---
 
+# A trava do carrinho não saiu a tempo (orders/cart_store.py): nada foi alterado
+CART_BUSY_MESSAGE = 'Seu carrinho está sendo atualizado em outra aba. Tente novamente.'
+
 def add_to_cart_view(request, product_id):
     """
     Controla US-4: Adicionar cupcake ao carrinho.
-    Usa a sessão do Django para armazenar o carrinho.
+    O carrinho fica no cache (orders/cart_store.py), não na sessão.
     """
     product = get_object_or_404(Product, id=product_id)
-    
-    # Inicializa o carrinho na sessão se não existir
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
-    
-    # Pega a quantidade atual no carrinho, ou 0
-    current_quantity = cart.get(product_id_str, 0)
-    
-    # US-4 (RN#1): Quantidade máxima por pedido: 50 unidades (aqui consideramos por *item*)
-    if current_quantity >= 50:
-        messages.error(request, 'Quantidade máxima de 50 unidades por item atingida.')
+
+    # US-4 (RN#1): Quantidade máxima por pedido: 50 unidades (aqui consideramos por *item*).
+    # O incremento é atômico, então cliques em paralelo não passam do limite.
+    try:
+        cart_store.increment(request, product.id, 1, maximum=MAX_QUANTITY_PER_ITEM)
+    except cart_store.CartLimitExceeded:
+        messages.error(request, f'Quantidade máxima de {MAX_QUANTITY_PER_ITEM} unidades por item atingida.')
+    except cart_store.CartBusy:
+        messages.error(request, CART_BUSY_MESSAGE)
     else:
-        cart[product_id_str] = current_quantity + 1
         messages.success(request, f'"{product.nome}" foi adicionado ao carrinho.')
 
-    request.session['cart'] = cart
+    invalidate(request)
     return redirect('orders:cart_detail')
 
 def remove_from_cart_view(request, product_id):
     """
     Remove um item do carrinho ou diminui a quantidade.
     """
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
-
-    if product_id_str in cart:
-        cart[product_id_str] -= 1
-        if cart[product_id_str] <= 0:
-            del cart[product_id_str] # Remove o item se a quantidade for 0
-    
-    request.session['cart'] = cart
+    # Chegando a 0 o item sai do carrinho
+    try:
+        cart_store.increment(request, product_id, -1)
+    except cart_store.CartBusy:
+        messages.error(request, CART_BUSY_MESSAGE)
+    invalidate(request)
     return redirect('orders:cart_detail')
 
+
+def _warn_removed_items(request, priced):
+    # Avisa sobre itens que saíram do carrinho por falta de estoque
+    for product in priced.removed:
+        messages.warning(request, f'"{product.nome}" está sem estoque e foi removido do carrinho.')
+
 def cart_detail_view(request):
     """
     Mostra a página do carrinho (US-4).
     """
-    cart = request.session.get('cart', {})
-    cart_items = []
-    subtotal = decimal.Decimal(0)
-
-    for product_id, quantity in cart.items():
-        product = get_object_or_404(Product, id=product_id)
-        total_item = product.valor * quantity
-        subtotal += total_item
-        cart_items.append({
-            'product': product,
-            'quantity': quantity,
-            'total_item': total_item,
-        })
-        
-    # US-5 (RN#1): Pedido mínimo de R$ 10,00.
-    min_order_met = subtotal >= decimal.Decimal(10.00)
+    # Todos os produtos do carrinho numa única consulta
+    priced = price_cart(request)
+    _warn_removed_items(request, priced)
     
     context = {
-        'cart_items': cart_items,
-        'subtotal': subtotal,
-        'min_order_met': min_order_met,
+        'cart_items': priced.lines,
+        'subtotal': priced.subtotal,
+        # US-5 (RN#1): Pedido mínimo de R$ 10,00.
+        'min_order_met': priced.min_order_met,
     }
     return render(request, 'orders/cart_detail.html', context)
 
@@ -81,66 +82,75 @@ def cart_detail_view(request):
 
 def calculate_shipping_view(request):
     """
-    Controla US-13: Calcular frete por CEP (Simulação)
+    Controla US-13: Calcular frete por CEP
     """
     cep = request.GET.get('cep')
     if not cep:
         return JsonResponse({'error': 'CEP não fornecido'}, status=400)
 
-    # --- INÍCIO DA INTEGRAÇÃO COM API (Ex: Correios) ---
-    # Aqui você chamaria a API dos Correios com o 'cep'.
-    # Para simular:
+    # Faixa de peso a partir das unidades no carrinho (sem consultar o banco)
+    units = sum(get_cart(request).values()) or 1
     try:
-        # Simula uma regra de frete
-        if cep.startswith('0'): 
-            valor_frete = decimal.Decimal(5.00)
-            prazo = "2 dias úteis"
-        else:
-            valor_frete = decimal.Decimal(10.00)
-            prazo = "5 dias úteis"
-            
-        # US-13 (RN#1): Frete grátis acima de R$100 (seria verificado no checkout)
-        
-        return JsonResponse({
-            'valor': valor_frete, # CA#1
-            'prazo': prazo,     # CA#1
-        })
-    except Exception as e:
-        return JsonResponse({'error': 'Não foi possível calcular o frete.'}, status=500)
-    # --- FIM DA INTEGRAÇÃO COM API ---
+        cotacao = shipping.quote(cep, units)
+    except shipping.InvalidCEP:
+        return JsonResponse({'error': 'CEP inválido. Use o formato 00000-000.'}, status=400)
+    if cotacao is None:
+        return JsonResponse({'error': 'Ainda não entregamos neste CEP.'}, status=400)
+
+    # US-13 (RN#1): Frete grátis acima de R$100 (verificado no checkout)
+    return JsonResponse({
+        'valor': cotacao.valor, # CA#1
+        'prazo': f'{cotacao.prazo_dias} dias úteis', # CA#1
+    })
 
 @login_required # Usuário deve estar logado para finalizar o pedido
 def checkout_view(request):
     """
     Controla US-5: Finalizar pedido.
     """
-    cart = request.session.get('cart', {})
-    if not cart:
+    # Preços atuais (recalculados para segurança), uma consulta só
+    priced = price_cart(request)
+    _warn_removed_items(request, priced)
+    if not priced.lines:
         messages.error(request, 'Seu carrinho está vazio.')
         return redirect('store:product_list')
 
-    # Pega o subtotal (calculado novamente para segurança)
-    subtotal = decimal.Decimal(0)
-    for product_id, quantity in cart.items():
-        product = get_object_or_404(Product, id=product_id)
-        subtotal += product.valor * quantity
+    # O carrinho vive no cache; ao chegar no checkout ganha uma cópia no banco
+    if request.method == 'GET':
+        cart_store.persist(request.user.pk)
+
+    subtotal = priced.subtotal
         
     # US-5 (RN#1): Pedido mínimo de R$ 10,00
-    if subtotal < decimal.Decimal(10.00):
+    if not priced.min_order_met:
         messages.error(request, 'Seu pedido deve ter um valor mínimo de R$ 10,00.')
         return redirect('orders:cart_detail')
         
-    # Lógica de frete (simplificada)
-    frete = decimal.Decimal(10.00) # Valor fixo por simplicidade
-    
-    # US-13 (RN#1): Frete grátis
-    if subtotal >= decimal.Decimal(100.00):
-        frete = decimal.Decimal(0.00)
+    # US-13: Frete pela tabela de faixas de CEP (mesmo cálculo do endpoint AJAX).
+    # Sem CEP vale o frete padrão, como antes da tabela.
+    cep = request.POST.get('cep') or request.GET.get('cep')
+    frete = priced.shipping(DEFAULT_SHIPPING)
+    cep_recusado = False
+    if cep:
+        try:
+            cotacao = shipping.quote(cep, priced.items_count)
+        except shipping.InvalidCEP:
+            cotacao = None
+        if cotacao is None:
+            messages.error(request, 'CEP inválido ou fora da área de entrega.')
+            cep, cep_recusado = None, True
+        else:
+            # US-13 (RN#1): Frete grátis
+            frete = priced.shipping(cotacao.valor)
         
     valor_total = subtotal + frete
     
     # Processa a criação do pedido
     if request.method == 'POST':
+        # CEP informado que a tabela não atende: não fecha com o frete padrão
+        if cep_recusado:
+            return redirect('orders:checkout')
+
         # --- INÍCIO DA INTEGRAÇÃO DE PAGAMENTO (US-6) ---
         # Aqui você integraria com o PIX (ex: Mercado Pago).
         # Se o pagamento for confirmado:
@@ -148,29 +158,20 @@ def checkout_view(request):
         # --- FIM DA INTEGRAÇÃO DE PAGAMENTO ---
 
         if payment_confirmed:
-            # US-6 (RN#1): Pedido só é liberado após pagamento.
-            order = Order.objects.create(
-                usuario=request.user,
-                valor_total=valor_total,
-                valor_frete=frete,
-                status='recebido', # US-7: Status inicial
-                pagamento_confirmado=True
-            )
-            # Adiciona os itens do carrinho ao pedido
-            for product_id, quantity in cart.items():
-                product = get_object_or_404(Product, id=product_id)
-                OrderItem.objects.create(
-                    pedido=order,
-                    produto=product,
-                    quantidade=quantity,
-                    valor_unitario=product.valor
-                )
-                # Abater do estoque (US-11)
-                product.quantidade_estoque -= quantity
-                product.save()
+            # Cria o pedido e abate o estoque (US-11) numa única transação
+            try:
+                order = place_order(request.user, priced, frete)
+            except InsufficientStock as e:
+                for message in e.messages():
+                    messages.error(request, message)
+                return redirect('orders:cart_detail')
             
-            # Limpa o carrinho da sessão
-            del request.session['cart']
+            # Limpa o carrinho (cache e cópia no banco)
+            try:
+                save_cart(request, {})
+            except cart_store.CartBusy:
+                messages.warning(request, 'Não foi possível esvaziar o carrinho agora; confira antes do próximo pedido.')
+            cart_store.persist(request.user.pk)
             
             messages.success(request, 'Pedido realizado com sucesso!')
             return redirect('orders:order_detail', pk=order.pk)
@@ -178,6 +179,8 @@ def checkout_view(request):
             messages.error(request, 'Pagamento falhou.')
             
     context = {
+        'cart': priced,
+        'cep': cep,
         'subtotal': subtotal,
         'frete': frete,
         'valor_total': valor_total,
@@ -187,13 +190,34 @@ def checkout_view(request):
 
 # --- Funções de Status do Pedido (US-7) ---
 
+# Pedidos por página em "Meus pedidos"
+ORDERS_PER_PAGE = getattr(settings, 'ORDERS_PER_PAGE', 10)
+
+
 @login_required
 def order_list_view(request):
     """
     Mostra a lista de pedidos do usuário (US-7).
     """
-    orders = Order.objects.filter(usuario=request.user).order_by('-criado_em')
-    context = {'orders': orders}
+    # Quantidade de itens e subtotal calculados no próprio SELECT;
+    # a página é uma faixa do índice (usuario, criado_em).
+    orders = Order.objects.filter(usuario=request.user).annotate(
+        total_itens=Sum('items__quantidade'),
+        subtotal_itens=Sum(
+            F('items__quantidade') * F('items__valor_unitario'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    )
+    page = paginate_keyset(
+        orders,
+        ordering=('-criado_em', '-id'),
+        cursor=request.GET.get('cursor'),
+        page_size=ORDERS_PER_PAGE,
+    )
+    context = {
+        'orders': page,
+        'page': page,
+    }
     return render(request, 'orders/order_list.html', context)
 
 @login_required
@@ -201,6 +225,64 @@ def order_detail_view(request, pk):
     """
     Mostra os detalhes e o status de um pedido específico (US-7).
     """
-    order = get_object_or_404(Order, pk=pk, usuario=request.user)
+    # Itens e produtos numa consulta extra, não importa o tamanho do pedido
+    items = OrderItem.objects.select_related('produto').order_by('id')
+    order = get_object_or_404(
+        Order.objects.prefetch_related(Prefetch('items', queryset=items)),
+        pk=pk, usuario=request.user,
+    )
     context = {'order': order}
-    return render(request, 'orders/order_detail.html', context)
\ No newline at end of file
+    return render(request, 'orders/order_detail.html', context)
+
+
+# --- US-7: Status do pedido em tempo real (Server-Sent Events) ---
+
+# Comentário SSE enviado a cada N segundos para manter a conexão aberta
+SSE_HEARTBEAT_SECONDS = 15
+
+# Depois destes status o pedido não muda mais e o stream é encerrado
+FINAL_STATUSES = {'entregue', 'cancelado'}
+
+
+def _sse(state):
+    return f'event: status\ndata: {json.dumps(state)}\n\n'
+
+
+async def _order_event_stream(order, queue):
+    broker = events.get_broker()
+    channel = events.order_channel(order.id)
+    try:
+        state = events.order_state(order)
+        yield _sse(state)
+        while state['status'] not in FINAL_STATUSES:
+            try:
+                state = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield _sse(state)
+    finally:
+        broker.unsubscribe(channel, queue)
+
+
+@login_required
+async def order_events_view(request, pk):
+    """
+    US-7: Envia o status do pedido e cada mudança (SSE). Precisa rodar sob ASGI;
+    cada conexão parada é só uma fila aguardando no event loop.
+    """
+    user = await request.auser()
+    broker = events.get_broker()
+    channel = events.order_channel(pk)
+    # Inscreve antes de ler o pedido para não perder uma mudança no meio
+    queue = broker.subscribe(channel)
+    order = await Order.objects.only('id', 'status', 'pagamento_confirmado') \
+        .filter(pk=pk, usuario=user).afirst()
+    if order is None:
+        broker.unsubscribe(channel, queue)
+        raise Http404
+
+    response = StreamingHttpResponse(_order_event_stream(order, queue), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Não deixa o proxy (nginx) segurar os eventos
+    return response
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # Conecta os sinais que mantêm o índice de busca (US-2) sincronizado
+        from . import signals  # noqa: F401
@@ -0,0 +1,71 @@
+# store/favorites.py
+"""
+US-15: Conjunto de favoritos de cada cliente.
+
+Os ids dos produtos favoritos do usuário ficam no cache compartilhado e
+são lidos no máximo uma vez por requisição, então a vitrine marca os
+corações de todos os cards sem consulta extra. Os sinais de `Favorite`
+trocam a versão do usuário sempre que um favorito é criado ou removido
+(pelo site, pelo admin ou em cascata).
+
+O conjunto fica numa chave com a versão lida *antes* da consulta ao banco:
+se um favorito mudar no meio da leitura, o conjunto desatualizado vai para
+a versão antiga, que ninguém mais lê.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Favorite
+
+CACHE_TIMEOUT = getattr(settings, 'STORE_FAVORITES_CACHE_TIMEOUT', 60 * 60)
+
+
+def version_key(user_id):
+    return f'store:favorites:{user_id}:version'
+
+
+def _version(user_id):
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, CACHE_TIMEOUT)
+        version = cache.get(key)  # outra requisição pode ter criado antes
+    return version
+
+
+def cache_key(user_id, version):
+    return f'store:favorites:{user_id}:{version}'
+
+
+def favorite_ids(request):
+    """Ids dos produtos favoritos do usuário da requisição (conjunto vazio se anônimo)."""
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, '_favorite_ids'):
+        key = cache_key(request.user.pk, _version(request.user.pk))
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(Favorite.objects.filter(usuario=request.user).values_list('produto_id', flat=True))
+            cache.set(key, ids, CACHE_TIMEOUT)
+        request._favorite_ids = ids
+    return request._favorite_ids
+
+
+def toggle(request, product):
+    """Marca/desmarca `product` como favorito. Retorna o novo estado (True = favorito)."""
+    deleted, _ = Favorite.objects.filter(usuario=request.user, produto=product).delete()
+    if not deleted:
+        try:
+            with transaction.atomic():
+                Favorite.objects.create(usuario=request.user, produto=product)
+        except IntegrityError:
+            pass  # Outra requisição acabou de favoritar o mesmo produto
+    request.__dict__.pop('_favorite_ids', None)
+    return not deleted
+
+
+def invalidate(user_id):
+    cache.set(version_key(user_id), uuid.uuid4().hex, CACHE_TIMEOUT)
@@ -0,0 +1,157 @@
+# store/images.py
+"""
+Versões redimensionadas das fotos dos cupcakes (WebP e JPEG).
+
+Para cada `Product.imagem` geramos larguras fixas em
+`<pasta>/variantes/<nome>-<largura>w.<webp|jpg>`. Fotos não são
+ampliadas: numa foto mais estreita que a maior largura, as larguras acima
+da original viram uma só variante do tamanho original (`generated_widths`).
+O trabalho com o Pillow roda num pool de processos, então o upload no
+admin não espera o redimensionamento; quando termina, o produto é marcado
+com `imagem_variantes=True` e a largura da original (`imagem_largura`), e
+os templates passam a usar o `srcset` só com as larguras geradas
+(tag `{% product_image %}` em store/templatetags/store_images.py).
+"""
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Larguras (px) geradas para cada foto
+WIDTHS = (160, 400, 900)
+
+# Uso de cada variante no site: largura padrão do <img> e o atributo `sizes`
+VARIANTS = {
+    'thumb': {'width': 160, 'sizes': '80px'},
+    'card': {'width': 400, 'sizes': '(min-width: 768px) 33vw, 100vw'},
+    'detail': {'width': 900, 'sizes': '(min-width: 992px) 50vw, 100vw'},
+}
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'options': {'quality': 80, 'method': 4}},
+    'jpg': {'format': 'JPEG', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+WORKERS = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+
+# Em testes/desenvolvimento: gera na hora, sem pool de processos
+SYNC = getattr(settings, 'IMAGE_VARIANTS_SYNC', False)
+
+
+def variant_name(name, width, extension):
+    """'cupcakes/limao.jpg' -> 'cupcakes/variantes/limao-400w.webp'"""
+    folder, filename = posixpath.split(name)
+    stem = os.path.splitext(filename)[0]
+    return posixpath.join(folder, 'variantes', f'{stem}-{width}w.{extension}')
+
+
+def generated_widths(original_width):
+    """
+    [(largura de `WIDTHS`, largura real)] das variantes de uma foto com
+    `original_width` px. As larguras acima da original viram uma variante
+    só, na primeira delas, do tamanho da original. Sem a largura (variantes
+    geradas antes de ela ser guardada), todas.
+    """
+    if original_width is None:
+        return [(width, width) for width in WIDTHS]
+    widths = []
+    for width in WIDTHS:
+        widths.append((width, min(width, original_width)))
+        if width >= original_width:
+            break
+    return widths
+
+
+def render_variants(source_path, targets):
+    """
+    Roda no processo do pool (só Pillow, sem banco). `targets` é uma lista
+    de (largura, extensão, caminho de destino); só as larguras de
+    `generated_widths` são gravadas. Retorna (largura da original, caminhos
+    gerados).
+    """
+    from PIL import Image, ImageOps
+
+    written = []
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+        widths = {width for width, _ in generated_widths(image.width)}
+        for width, extension, target in targets:
+            if width not in widths:
+                continue
+            resized = image.copy()
+            if resized.width > width:
+                resized.thumbnail((width, width * 10), Image.LANCZOS)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            spec = FORMATS[extension]
+            resized.save(target, spec['format'], **spec['options'])
+            written.append(target)
+    return image.width, written
+
+
+def image_storage():
+    # O storage configurado no campo Product.imagem
+    from .models import Product
+    return Product._meta.get_field('imagem').storage
+
+
+def variant_targets(name, original_width=None):
+    """(largura, extensão, caminho) das variantes de `name` (todas, sem a largura da original)."""
+    storage = image_storage()
+    return [
+        (width, extension, storage.path(variant_name(name, width, extension)))
+        for width, _ in generated_widths(original_width)
+        for extension in FORMATS
+    ]
+
+
+def mark_done(names, original_width):
+    from .models import Product
+    Product.objects.filter(imagem__in=names).update(imagem_variantes=True, imagem_largura=original_width)
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def generate_now(name):
+    """Gera as variantes de `name` no processo atual."""
+    original_width, _ = render_variants(image_storage().path(name), variant_targets(name))
+    mark_done([name], original_width)
+
+
+def schedule(name):
+    """
+    Agenda a geração das variantes de `name` no pool de processos.
+    Retorna o Future (ou None quando roda de forma síncrona).
+    """
+    if SYNC:
+        generate_now(name)
+        return None
+
+    future = get_executor().submit(render_variants, image_storage().path(name), variant_targets(name))
+
+    def done(future):
+        # Roda numa thread do processo principal quando o pool termina
+        error = future.exception()
+        if error is not None:
+            # O produto fica com imagem_variantes=False: `generate_image_variants` refaz
+            logger.error('Falha ao gerar as variantes de %s', name, exc_info=error)
+            return
+        try:
+            mark_done([name], future.result()[0])
+        finally:
+            connection.close()
+
+    future.add_done_callback(done)
+    return future
@@ -0,0 +1,124 @@
+# store/inventory.py
+"""
+Estoque fracionado (sharded) para cupcakes muito vendidos.
+
+Com `Product.estoque_particoes = N`, o estoque fica dividido em N linhas
+de `StockShard`. Cada venda abate uma partição sorteada (e tenta as outras
+se ela não tiver o suficiente), então vendas simultâneas do mesmo produto
+não disputam a mesma linha do banco.
+
+`Product.quantidade_estoque` continua existindo como total em cache: é
+recalculado (`sync_totals`) quando alguma partição zera e quando o
+estoque é alterado pelo dashboard/admin, mas não a cada venda (isso
+voltaria a disputar a linha do produto). Só diz se o produto tem estoque,
+e assim `em_estoque` e o filtro `quantidade_estoque__gt=0` da vitrine
+continuam funcionando. Onde a quantidade é mostrada, ela vem de
+`with_stock` (soma das partições).
+"""
+import random
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockShard
+
+
+def distribute_stock(product, total=None):
+    """
+    Divide `total` (padrão: `product.quantidade_estoque`) igualmente entre
+    as partições do produto, recriando-as.
+    """
+    slots = product.estoque_particoes
+    total = product.quantidade_estoque if total is None else total
+    base, extra = divmod(total, slots)
+    with transaction.atomic():
+        StockShard.objects.filter(produto=product).delete()
+        StockShard.objects.bulk_create([
+            StockShard(produto=product, particao=i, quantidade=base + (1 if i < extra else 0))
+            for i in range(slots)
+        ])
+        Product.objects.filter(pk=product.pk).update(quantidade_estoque=total, atualizado_em=timezone.now())
+
+
+def clear_shards(product):
+    StockShard.objects.filter(produto=product).delete()
+
+
+def shard_totals(product_ids):
+    """{produto_id: soma das partições} numa única consulta."""
+    rows = StockShard.objects.filter(produto_id__in=product_ids) \
+        .values('produto_id').annotate(total=Sum('quantidade')).order_by()
+    return {row['produto_id']: row['total'] for row in rows}
+
+
+def _shard_sum():
+    total = StockShard.objects.filter(produto=OuterRef('pk')) \
+        .values('produto').annotate(total=Sum('quantidade')).values('total')
+    return Coalesce(Subquery(total), 0)
+
+
+def stock_expression():
+    """Estoque real: soma das partições se o produto é fracionado, senão `quantidade_estoque`."""
+    return Case(
+        When(estoque_particoes__gt=0, then=_shard_sum()),
+        default=F('quantidade_estoque'),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def with_stock(queryset):
+    """Anota `estoque_atual` (estoque real) nos produtos, na mesma consulta."""
+    return queryset.annotate(estoque_atual=stock_expression())
+
+
+def sync_totals(product_ids):
+    """Atualiza o total em cache (`quantidade_estoque`) com a soma das partições."""
+    Product.objects.filter(pk__in=product_ids, estoque_particoes__gt=0) \
+        .update(quantidade_estoque=_shard_sum(), atualizado_em=timezone.now())
+
+
+def _take(product_id, particao, quantity, **condition):
+    return StockShard.objects.filter(
+        produto_id=product_id, particao=particao, **condition
+    ).update(quantidade=F('quantidade') - quantity)
+
+
+def decrement(product_id, slots, quantity):
+    """
+    Abate `quantity` unidades das partições do produto. Retorna False se
+    não houver estoque suficiente; nesse caso o chamador deve desfazer a
+    transação (alguma partição pode ter sido abatida parcialmente).
+    """
+    start = random.randrange(slots)
+    order = [(start + i) % slots for i in range(slots)]
+
+    # Caminho rápido: uma partição que continua com saldo depois da venda.
+    # O produto continua com estoque, então a linha dele não é tocada.
+    for particao in order:
+        if _take(product_id, particao, quantity, quantidade__gt=quantity):
+            return True
+
+    # Uma partição que zera com a venda: atualiza o total em cache
+    for particao in order:
+        if _take(product_id, particao, quantity, quantidade=quantity):
+            sync_totals([product_id])
+            return True
+
+    # Nenhuma partição sozinha tem o suficiente: junta várias
+    shards = list(
+        StockShard.objects.filter(produto_id=product_id, quantidade__gt=0)
+        .values_list('particao', 'quantidade')
+    )
+    if sum(available for _, available in shards) < quantity:
+        return False
+    remaining = quantity
+    for particao, available in shards:
+        take = min(available, remaining)
+        if _take(product_id, particao, take, quantidade__gte=take):
+            remaining -= take
+        if not remaining:
+            break
+    sync_totals([product_id])
+    return remaining == 0
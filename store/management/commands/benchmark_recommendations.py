@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import Order, OrderItem
+from store import recommendations
+from store.models import Product, ProductPair
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_rows(items, products, basket, seed):
+    """(pedido, produto) de pedidos sintéticos (números a partir de 1), em ordem de pedido."""
+    rng = random.Random(seed)
+    # Popularidade desigual: poucos sabores concentram a maior parte das vendas
+    weights = [1 / rank for rank in range(1, products + 1)]
+    order_id = 0
+    produced = 0
+    while produced < items:
+        order_id += 1
+        size = min(items - produced, rng.randint(1, 2 * basket - 1))
+        for product_id in rng.choices(range(1, products + 1), weights, k=size):
+            yield order_id, product_id
+        produced += size
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o recálculo da matriz de co-ocorrência como o rebuild_recommendations faz: '
+        'leitura dos itens de pedido no banco, contagem dos pares, top-K por produto e '
+        'gravação em lote. Os pedidos sintéticos são gravados numa transação desfeita no fim.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--itens', type=int, default=1_000_000)
+        parser.add_argument('--produtos', type=int, default=300)
+        parser.add_argument('--cesta', type=int, default=3, help='Itens por pedido, em média.')
+        parser.add_argument('--top', type=int, default=recommendations.TOP_K)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = list(synthetic_rows(options['itens'], options['produtos'], options['cesta'], options['seed']))
+        batch_size = options['batch_size']
+        try:
+            with transaction.atomic():
+                self._insert(rows, options['produtos'], batch_size)
+                self.stdout.write(f'{len(rows)} itens em {rows[-1][0]} pedidos, {options["produtos"]} produtos.')
+                self._measure(options['top'], batch_size)
+                raise _Rollback  # Não deixa os pedidos sintéticos nem a matriz deles
+        except _Rollback:
+            pass
+
+    def _insert(self, rows, products, batch_size):
+        product_ids = [product.pk for product in Product.objects.bulk_create([
+            Product(nome=f'Benchmark {n}', sabor='baunilha', valor=5, imagem='cupcakes/benchmark.jpg')
+            for n in range(products)
+        ], batch_size=batch_size)]
+        order_ids = [order.pk for order in Order.objects.bulk_create([
+            Order(valor_total=0) for _ in range(rows[-1][0])
+        ], batch_size=batch_size)]
+        OrderItem.objects.bulk_create((
+            OrderItem(pedido_id=order_ids[order - 1], produto_id=product_ids[product - 1], valor_unitario=5)
+            for order, product in rows
+        ), batch_size=batch_size)
+
+    def _measure(self, k, batch_size):
+        began = time.perf_counter()
+        rows = list(recommendations.order_rows(batch_size))
+        read = time.perf_counter()
+        counts = recommendations.count_pairs(recommendations.baskets(rows))
+        counted = time.perf_counter()
+        neighbors = recommendations.top_neighbors(counts, k)
+        ranked = time.perf_counter()
+        recommendations.save_matrix(counts, k, batch_size, neighbors)
+        written = time.perf_counter()
+
+        self.stdout.write(f'  leitura dos itens (banco): {read - began:.2f}s ({len(rows)} linhas)')
+        self.stdout.write(f'  contagem dos pares: {counted - read:.2f}s ({len(counts)} pares)')
+        self.stdout.write(f'  top-{k} por produto: {ranked - counted:.2f}s ({len(neighbors)} produtos)')
+        self.stdout.write(
+            f'  gravação em lote: {written - ranked:.2f}s ({ProductPair.objects.count()} linhas de ProductPair)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'  recálculo total: {written - began:.2f}s'))
@@ -0,0 +1,87 @@
+import os
+import posixpath
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from store import images
+from store.models import Product
+from store.storage import content_name, file_digest, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        'Renomeia as fotos dos produtos pelo hash do conteúdo, guardando cada '
+        'arquivo repetido uma só vez, e atualiza os produtos em lote.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pasta', default=Product._meta.get_field('imagem').upload_to,
+                            help='Pasta dentro de MEDIA_ROOT a deduplicar (padrão: a do upload).')
+        parser.add_argument('--simular', action='store_true', help='Só mostra o que seria feito.')
+        parser.add_argument('--manter', action='store_true', help='Não apaga os arquivos antigos.')
+        parser.add_argument('--lote', type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = images.image_storage()
+        folder = options['pasta'].strip('/')
+        simulate = options['simular']
+
+        # 1. Hash de cada arquivo da pasta (as variantes ficam de fora)
+        renamed = {}
+        _, files = storage.listdir(folder)
+        for filename in sorted(files):
+            name = posixpath.join(folder, filename)
+            if is_content_addressed(name):
+                continue
+            with storage.open(name, 'rb') as f:
+                renamed[name] = content_name(name, file_digest(f))
+
+        groups = defaultdict(list)
+        for old, new in renamed.items():
+            groups[new].append(old)
+
+        # 2. Grava uma cópia por conteúdo (os originais só saem no fim)
+        for new, olds in groups.items():
+            self.stdout.write(f'{new} <- {", ".join(olds)}')
+            if not simulate and not storage.exists(new):
+                with storage.open(olds[0], 'rb') as f:
+                    storage.save(new, f)
+
+        # 3. Aponta os produtos para os novos nomes
+        products = list(Product.objects.filter(imagem__in=renamed).only('id', 'imagem', 'imagem_variantes', 'imagem_largura', 'atualizado_em'))
+        now = timezone.now()
+        for product in products:
+            new = renamed[product.imagem.name]
+            product.imagem = new
+            product.atualizado_em = now
+            # Variantes são nomeadas pela foto: só valem se já existirem para o novo nome
+            product.imagem_variantes = all(
+                os.path.exists(path) for _, _, path in images.variant_targets(new, product.imagem_largura)
+            )
+        if not simulate:
+            with transaction.atomic():
+                Product.objects.bulk_update(
+                    products, ['imagem', 'imagem_variantes', 'atualizado_em'], batch_size=options['lote'],
+                )
+
+        # 4. Remove os arquivos antigos e as variantes deles
+        removed = 0
+        if not simulate and not options['manter']:
+            for old in renamed:
+                storage.delete(old)
+                removed += 1
+                for _, _, path in images.variant_targets(old):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        pending = sum(1 for product in products if not product.imagem_variantes)
+        self.stdout.write(self.style.SUCCESS(
+            ('Simulação: ' if simulate else '') +
+            f'{len(renamed)} arquivos viraram {len(groups)}; '
+            f'{len(products)} produtos atualizados, {removed} arquivos antigos removidos.'
+        ))
+        if pending:
+            self.stdout.write(f'{pending} produtos sem variantes: rode `generate_image_variants`.')
@@ -0,0 +1,42 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from store import images
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Gera as versões redimensionadas (WebP/JPEG) das fotos dos produtos existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Refaz também as que já têm variantes.')
+        parser.add_argument('--workers', type=int, default=images.WORKERS)
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(imagem='')
+        if not options['todas']:
+            products = products.filter(imagem_variantes=False)
+        names = sorted(set(products.values_list('imagem', flat=True)))
+
+        done, failed = defaultdict(list), 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(images.render_variants, images.image_storage().path(name), images.variant_targets(name)): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    original_width, _ = future.result()
+                    done[original_width].append(name)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{name}: {e}')
+
+        # Um UPDATE por largura de original
+        for original_width, processed in done.items():
+            images.mark_done(processed, original_width)
+        total = sum(len(processed) for processed in done.values())
+        self.stdout.write(self.style.SUCCESS(f'{total} imagens processadas, {failed} com erro.'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula do zero a matriz de produtos comprados juntos e as recomendações '
+        'de cada produto (normalmente atualizadas a cada pedido).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=recommendations.TOP_K, help='Recomendações por produto.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        pairs = recommendations.rebuild(options['top'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{pairs} pares de produtos em {time.perf_counter() - began:.2f}s.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.search import index_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recria o índice de busca (US-2) a partir de todos os produtos.'
+
+    def handle(self, *args, **options):
+        if not index_available():
+            self.stdout.write(self.style.WARNING('Banco sem FTS5: a busca usa icontains, nada a fazer.'))
+            return
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Índice de busca recriado com {total} produtos.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os agregados de avaliações (US-10) de todos os produtos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = reconcile_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} produtos corrigidos.'))
@@ -0,0 +1,33 @@
+# US-2: Índice de busca textual (FTS5) para nome e sabor dos produtos
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 só existe no SQLite; em outros bancos a busca usa icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts USING fts5("
+        "nome, sabor, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO store_product_fts (rowid, nome, sabor) SELECT id, nome, sabor FROM store_product"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS store_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:04
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    # Autocontida (não importa store.ratings): o código da app pode mudar
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('store', 'Review')
+    rows = Review.objects.values('produto_id').annotate(
+        avaliacoes_quantidade=Count('id'),
+        avaliacoes_soma=Sum('estrelas'),
+        **{f'avaliacoes_{n}': Count('id', filter=Q(estrelas=n)) for n in range(1, 6)},
+    ).order_by()
+    products = []
+    for row in rows:
+        product = Product(pk=row.pop('produto_id'))
+        for field, value in row.items():
+            setattr(product, field, value or 0)
+        products.append(product)
+    Product.objects.bulk_update(products, [
+        'avaliacoes_quantidade', 'avaliacoes_soma',
+        'avaliacoes_1', 'avaliacoes_2', 'avaliacoes_3', 'avaliacoes_4', 'avaliacoes_5',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_quantidade',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='avaliacoes_soma',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
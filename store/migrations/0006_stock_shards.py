@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_review_produto_criado_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='estoque_particoes',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('particao', models.PositiveSmallIntegerField()),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='store.product')),
+            ],
+            options={
+                'unique_together': {('produto', 'particao')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:18
+
+import store.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_product_imagem_variantes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='imagem',
+            field=models.ImageField(storage=store.storage.ContentAddressedStorage(), upload_to='cupcakes/'),
+        ),
+    ]
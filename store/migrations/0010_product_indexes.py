@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantidade_estoque__gt', 0)), fields=['id'], name='product_vitrine_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantidade_estoque__gt', 0)), fields=['categoria', 'id'], name='product_vitrine_categoria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['nome'], name='product_nome_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='imagem_largura',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from .storage import ContentAddressedStorage
+
 # US-3: Para filtrar cupcakes por tipo
 class Category(models.Model):
     TIPO_CHOICES = [
@@ -17,23 +19,119 @@ class Product(models.Model):
     # US-1: Campos do cupcake (CA#2)
     nome = models.CharField(max_length=100)
     sabor = models.CharField(max_length=100)
-    imagem = models.ImageField(upload_to='cupcakes/')
+    # Arquivos nomeados pelo hash do conteúdo (store/storage.py)
+    imagem = models.ImageField(upload_to='cupcakes/', storage=ContentAddressedStorage())
+    # As versões redimensionadas da imagem já foram geradas (store/images.py)
+    imagem_variantes = models.BooleanField(default=False, editable=False)
+    # Largura (px) da imagem original: o srcset só lista as larguras geradas
+    imagem_largura = models.PositiveIntegerField(null=True, blank=True, editable=False)
     valor = models.DecimalField(max_digits=6, decimal_places=2)
     
     # US-11: Gerenciar estoque (CA#1)
     quantidade_estoque = models.PositiveIntegerField(default=0)
+
+    # Estoque fracionado para cupcakes muito vendidos (promoções): com N > 0
+    # o estoque real fica dividido em N StockShard e `quantidade_estoque`
+    # vira um total em cache (ver store/inventory.py).
+    estoque_particoes = models.PositiveSmallIntegerField(default=0)
     
     # US-3: Relação com Categoria
     categoria = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # US-10 (CA#2): Agregados das avaliações, mantidos pelos sinais de Review
+    # (store/signals.py) para não calcular a média a cada visualização.
+    avaliacoes_quantidade = models.PositiveIntegerField(default=0, editable=False)
+    avaliacoes_soma = models.PositiveIntegerField(default=0, editable=False)
+    avaliacoes_1 = models.PositiveIntegerField(default=0, editable=False)
+    avaliacoes_2 = models.PositiveIntegerField(default=0, editable=False)
+    avaliacoes_3 = models.PositiveIntegerField(default=0, editable=False)
+    avaliacoes_4 = models.PositiveIntegerField(default=0, editable=False)
+    avaliacoes_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    # API do catálogo (catalog_api_view em store/views.py): versão do produto para ETag/Last-Modified.
+    # Os UPDATEs diretos (estoque, avaliações, fotos) também atualizam este campo.
+    atualizado_em = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # US-1: Vitrine. Só os produtos com estoque entram nestes índices
+            # (parciais), na ordem da paginação por cursor (id).
+            models.Index(fields=['id'], condition=models.Q(quantidade_estoque__gt=0),
+                         name='product_vitrine_idx'),
+            # US-3: Vitrine filtrada por categoria
+            models.Index(fields=['categoria', 'id'], condition=models.Q(quantidade_estoque__gt=0),
+                         name='product_vitrine_categoria_idx'),
+            # US-11: Lista de estoque do dashboard, por nome
+            models.Index(fields=['nome'], name='product_nome_idx'),
+        ]
+
     @property
     def em_estoque(self):
         # US-1 (RN#1): Cupcakes fora de estoque não devem aparecer.
         return self.quantidade_estoque > 0
 
+    @property
+    def media_avaliacoes(self):
+        if not self.avaliacoes_quantidade:
+            return 0
+        return self.avaliacoes_soma / self.avaliacoes_quantidade
+
+    @property
+    def histograma_avaliacoes(self):
+        # [(5, n5), (4, n4), ...] na ordem em que aparece na página
+        return [(estrelas, getattr(self, f'avaliacoes_{estrelas}')) for estrelas in range(5, 0, -1)]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores carregados, para saber se o estoque foi alterado (estoque fracionado)
+        instance._estoque_salvo = instance.__dict__.get('quantidade_estoque')
+        instance._particoes_salvas = instance.__dict__.get('estoque_particoes')
+        instance._imagem_salva = instance.__dict__.get('imagem')
+        return instance
+
     def __str__(self):
         return self.nome
 
+class StockShard(models.Model):
+    """Uma fatia do estoque de um produto com estoque fracionado."""
+    produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    particao = models.PositiveSmallIntegerField()
+    quantidade = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('produto', 'particao')
+
+    def __str__(self):
+        return f'{self.produto_id}#{self.particao}: {self.quantidade}'
+
+# "Comprados juntos": em quantos pedidos `produto` e `outro` aparecem juntos.
+# Cada par é guardado nos dois sentidos (store/recommendations.py).
+class ProductPair(models.Model):
+    produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    outro = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    pedidos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('produto', 'outro')
+
+    def __str__(self):
+        return f'{self.produto_id} + {self.outro_id}: {self.pedidos}'
+
+# Os K produtos mais comprados junto com cada produto, já ordenados
+class Recommendation(models.Model):
+    produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recomendacoes')
+    recomendado = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    posicao = models.PositiveSmallIntegerField()
+    pedidos = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['produto', 'posicao']
+        unique_together = ('produto', 'posicao')
+
+    def __str__(self):
+        return f'{self.produto_id} -> {self.recomendado_id} (#{self.posicao})'
+
 # US-10: Avaliar cupcakes
 class Review(models.Model):
     produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
@@ -46,6 +144,18 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('produto', 'usuario') # Um review por usuário/produto
+        indexes = [
+            # Lista de avaliações do produto, mais recentes primeiro (paginada)
+            models.Index(fields=['produto', 'criado_em'], name='review_produto_criado_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda as estrelas carregadas para que os sinais saibam o valor
+        # anterior quando a avaliação for alterada (ex.: update_or_create).
+        instance._estrelas_salvas = instance.__dict__.get('estrelas')
+        return instance
 
 # US-15: Criar lista de favoritos
 class Favorite(models.Model):
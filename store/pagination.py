@@ -0,0 +1,191 @@
+# store/pagination.py
+"""
+Paginação por cursor (keyset) reutilizável pelas listagens da loja.
+
+Ao contrário do OFFSET, cada página é uma busca por faixa no índice
+da ordenação, então o custo não cresce com o número da página nem com
+o tamanho do catálogo.
+"""
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Direções do cursor: 'n' (próxima página) e 'p' (página anterior)
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# Datetimes vão no cursor como {"dt": isoformat}, com os microssegundos
+DATETIME_TAG = 'dt'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # O DjangoJSONEncoder corta em milissegundos: dois registros no mesmo
+        # milissegundo ficariam com a mesma chave e a próxima página os pularia
+        if isinstance(o, datetime.datetime):
+            return {DATETIME_TAG: o.isoformat()}
+        return super().default(o)
+
+
+def _decode_object(obj):
+    if set(obj) == {DATETIME_TAG}:
+        value = parse_datetime(obj[DATETIME_TAG]) if isinstance(obj[DATETIME_TAG], str) else None
+        if value is None:
+            raise ValueError(obj)
+        return value
+    return obj
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'k': values}, cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()), object_hook=_decode_object)
+        direction, values = data['d'], data['k']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def _split(field):
+    # '-criado_em' -> ('criado_em', True)
+    return (field[1:], True) if field.startswith('-') else (field, False)
+
+
+def _keyset_filter(ordering, values):
+    """
+    Monta o filtro "linhas depois de `values`" para a ordenação dada:
+    (a > va) OU (a = va E b > vb) OU ...
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name, descending = _split(field)
+        lookup = 'lt' if descending else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _key(self, obj):
+        # Aceita instâncias ou linhas de .values()
+        names = [_split(field)[0] for field in self.ordering]
+        if isinstance(obj, dict):
+            return [obj[name] for name in names]
+        return [getattr(obj, name) for name in names]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return encode_cursor(NEXT, self._key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return encode_cursor(PREVIOUS, self._key(self.object_list[0]))
+
+
+def _ordering_field(queryset, name):
+    # Campo do model ou anotação (ex.: `relevancia` da busca)
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    if name == 'pk':
+        return queryset.model._meta.pk
+    return queryset.model._meta.get_field(name)
+
+
+def _cursor_values(queryset, ordering, values):
+    """
+    Converte os valores do cursor com o `to_python()` de cada campo da
+    ordenação. O cursor vem da URL: um valor adulterado (ex.: texto numa
+    chave numérica) levanta `InvalidCursor` em vez de um erro no filtro.
+    """
+    if len(values) != len(ordering):
+        raise InvalidCursor(values)
+    converted = []
+    for field, value in zip(ordering, values):
+        if value is None or isinstance(value, (dict, list)):
+            raise InvalidCursor(values)
+        try:
+            converted.append(_ordering_field(queryset, _split(field)[0]).to_python(value))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(values)
+    return converted
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20, strict=False):
+    """
+    Retorna um `KeysetPage` com até `page_size` objetos de `queryset`.
+
+    `ordering` deve identificar as linhas de forma única (termine com 'id'
+    ou '-id'). Cursores inválidos voltam para a primeira página, ou
+    levantam `InvalidCursor` com `strict=True` (APIs JSON respondem 400).
+    Sempre executa uma única consulta.
+    """
+    direction, values = NEXT, None
+    if cursor:
+        try:
+            direction, values = decode_cursor(cursor)
+            values = _cursor_values(queryset, ordering, values)
+        except InvalidCursor:
+            if strict:
+                raise
+            direction, values = NEXT, None
+
+    if direction == PREVIOUS:
+        queryset = queryset.filter(_keyset_filter(_reverse(ordering), values))
+        rows = list(queryset.order_by(*_reverse(ordering))[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        return KeysetPage(rows, ordering, has_next=True, has_previous=has_more)
+
+    if values is not None:
+        queryset = queryset.filter(_keyset_filter(ordering, values))
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    return KeysetPage(rows[:page_size], ordering, has_next=has_more, has_previous=values is not None)
+
+
+def cursor_querystring(request, cursor, param='cursor'):
+    """
+    Monta a querystring do link de navegação mantendo os outros filtros
+    (ex.: `q` e `categoria` da vitrine).
+    """
+    params = request.GET.copy()
+    params[param] = cursor
+    return params.urlencode()
@@ -0,0 +1,227 @@
+# store/profiling.py
+"""
+Medição de consultas SQL e templates por requisição (caça aos N+1).
+
+Para ligar, inclua 'store.profiling.QueryProfileMiddleware' em
+`MIDDLEWARE` e defina `SQL_PROFILING = True` (ex.: `SQL_PROFILING = DEBUG`).
+Desligado, o middleware se retira da cadeia na inicialização
+(`MiddlewareNotUsed`) e não custa nada por requisição.
+
+Ligado, cada resposta ganha um cabeçalho `Server-Timing` (visível no
+DevTools do navegador) com o tempo de banco, o número de consultas e o
+tempo de renderização dos templates. Requisições acima de
+`SQL_PROFILING_SLOW_MS`, ou com a mesma consulta repetida
+`SQL_PROFILING_DUPLICATES` vezes ou mais (o padrão de um N+1), vão para o
+log 'store.profiling' com as consultas mais repetidas.
+
+Orçamentos: `SQL_PROFILING_BUDGETS = {'store:product_list': 5, ...}` com
+`SQL_PROFILING_ENFORCE_BUDGETS = True` faz a view que passar do limite
+levantar `QueryBudgetExceeded` (útil nos testes). Para um trecho de
+código qualquer há o gerenciador de contexto `query_budget(n)`.
+
+Planos: `full_scans(profile, tabelas)` roda `EXPLAIN QUERY PLAN` (SQLite)
+nas consultas registradas e aponta as que percorrem uma tabela inteira
+(os testes de dashboard/tests.py usam isso para vigiar os índices).
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import re
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_active = contextvars.ContextVar('store_query_profile', default=None)
+
+# Listas de parâmetros de tamanho variável: IN (%s, %s, ...) -> IN (...)
+_PARAM_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+# Linhas do EXPLAIN QUERY PLAN do SQLite: "SCAN tabela [USING ... INDEX nome]"
+_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+# Apelidos que o Django dá às tabelas: FROM "orders_order" U0, JOIN "store_product" T3
+_ALIAS_RE = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+_LIMIT_RE = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+Query = namedtuple('Query', 'sql params duration using')
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """SQL sem os valores que variam, para agrupar consultas repetidas."""
+    return _NUMBER_RE.sub('N', _PARAM_LIST_RE.sub('(...)', sql))
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryProfile:
+    """Consultas (SQL, duração) e tempo de template de um trecho de código."""
+
+    def __init__(self):
+        self.queries = []
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Usado com connection.execute_wrapper()
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(Query(
+                sql, None if many else params, time.perf_counter() - began, context['connection'].alias,
+            ))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def db_time(self):
+        return sum(query.duration for query in self.queries)
+
+    def duplicates(self, minimum=2):
+        """[(fingerprint, vezes), ...] das consultas repetidas, mais repetidas primeiro."""
+        counts = Counter(fingerprint(query.sql) for query in self.queries)
+        return [(sql, n) for sql, n in counts.most_common() if n >= minimum]
+
+    def summary(self, top=5):
+        lines = [f'{self.count} consultas, {self.db_time * 1000:.1f} ms no banco']
+        lines += [f'  {n}x {sql[:300]}' for sql, n in self.duplicates()[:top]]
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def profile_queries():
+    """Registra as consultas de todos os bancos (e o tempo de template) do bloco."""
+    profile = QueryProfile()
+    token = _active.set(profile)
+    try:
+        with contextlib.ExitStack() as stack:
+            # connections.all() só cria os objetos de conexão desta thread, sem conectar
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield profile
+    finally:
+        _active.reset(token)
+
+
+@contextlib.contextmanager
+def query_budget(maximum, label='bloco'):
+    """Levanta `QueryBudgetExceeded` se o bloco fizer mais de `maximum` consultas."""
+    with profile_queries() as profile:
+        yield profile
+    if profile.count > maximum:
+        raise QueryBudgetExceeded(f'{label}: orçamento de {maximum} consultas estourado\n{profile.summary()}')
+
+
+def query_plan(query):
+    """Linhas do EXPLAIN QUERY PLAN (SQLite) de uma consulta registrada."""
+    connection = connections[query.using]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {query.sql}', query.params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(profile, tables):
+    """
+    [(sql, linha do plano), ...] das consultas SELECT de `profile` que
+    percorrem uma tabela inteira de `tables`: sem índice nenhum, ou
+    lendo um índice inteiro sem LIMIT (leitura em ordem com LIMIT, como a
+    paginação por cursor, para cedo e não conta). Só SQLite.
+    """
+    found = []
+    for query in profile.queries:
+        if query.params is None or not query.sql.lstrip().upper().startswith('SELECT'):
+            continue
+        if connections[query.using].vendor != 'sqlite':
+            continue
+        aliases = {alias: table for table, alias in _ALIAS_RE.findall(query.sql)}
+        limited = bool(_LIMIT_RE.search(query.sql))
+        for line in query_plan(query):
+            match = _SCAN_RE.match(line)
+            if not match or aliases.get(match[1], match[1]) not in tables:
+                continue
+            if ' USING ' not in line or not limited:
+                found.append((query.sql, line))
+    return found
+
+
+_template_timer_installed = False
+
+
+def install_template_timer():
+    """Mede o tempo de renderização dos templates (só o template mais externo)."""
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    from django.template.base import Template
+
+    original = Template._render
+
+    def timed_render(self, context):
+        profile = _active.get()
+        if profile is None or profile._template_depth:
+            return original(self, context)
+        profile._template_depth += 1
+        began = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            profile.template_time += time.perf_counter() - began
+            profile._template_depth -= 1
+
+    Template._render = timed_render
+    _template_timer_installed = True
+
+
+def server_timing(profile, total):
+    return ', '.join([
+        f'db;dur={profile.db_time * 1000:.1f};desc="SQL ({profile.count} consultas)"',
+        f'tpl;dur={profile.template_time * 1000:.1f};desc="Templates"',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+class QueryProfileMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SQL_PROFILING_SLOW_MS', 500)
+        self.duplicate_threshold = getattr(settings, 'SQL_PROFILING_DUPLICATES', 5)
+        self.budgets = getattr(settings, 'SQL_PROFILING_BUDGETS', {})
+        self.enforce_budgets = getattr(settings, 'SQL_PROFILING_ENFORCE_BUDGETS', False)
+        install_template_timer()
+
+    def __call__(self, request):
+        began = time.perf_counter()
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        total = time.perf_counter() - began
+
+        response['Server-Timing'] = server_timing(profile, total)
+
+        view_name = request.resolver_match.view_name if request.resolver_match else request.path
+        repeated = profile.duplicates(self.duplicate_threshold)
+        if total * 1000 > self.slow_ms or repeated:
+            reason = 'possível N+1' if repeated else 'requisição lenta'
+            logger.warning('%s em %s %s (%s, %.0f ms, template %.0f ms): %s',
+                           reason, request.method, request.path, view_name, total * 1000,
+                           profile.template_time * 1000, profile.summary())
+
+        budget = self.budgets.get(view_name)
+        if self.enforce_budgets and budget is not None and profile.count > budget:
+            raise QueryBudgetExceeded(
+                f'{view_name}: orçamento de {budget} consultas estourado\n{profile.summary()}'
+            )
+        return response
@@ -0,0 +1,61 @@
+# store/ratings.py
+"""
+US-10 (CA#2): Recalcula em lote os agregados de avaliações do Produto.
+
+Os sinais de Review mantêm os contadores incrementalmente; esta rotina
+corrige divergências (ex.: avaliações apagadas direto no banco) com uma
+consulta agrupada e `bulk_update` em lotes.
+"""
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+RATING_FIELDS = [
+    'avaliacoes_quantidade', 'avaliacoes_soma',
+    'avaliacoes_1', 'avaliacoes_2', 'avaliacoes_3', 'avaliacoes_4', 'avaliacoes_5',
+]
+
+
+def compute_rating_aggregates(review_model):
+    """Retorna {produto_id: {campo: valor}} a partir da tabela de avaliações."""
+    rows = review_model.objects.values('produto_id').annotate(
+        avaliacoes_quantidade=Count('id'),
+        avaliacoes_soma=Sum('estrelas'),
+        **{f'avaliacoes_{n}': Count('id', filter=Q(estrelas=n)) for n in range(1, 6)},
+    ).order_by()
+    return {row.pop('produto_id'): row for row in rows}
+
+
+def reconcile_ratings(product_model=None, review_model=None, batch_size=1000):
+    """Corrige os agregados de todos os produtos. Retorna quantos foram alterados."""
+    if product_model is None or review_model is None:
+        from .models import Product, Review
+        product_model, review_model = Product, Review
+
+    expected = compute_rating_aggregates(review_model)
+    empty = dict.fromkeys(RATING_FIELDS, 0)
+    changed = []
+    fields = RATING_FIELDS + ['atualizado_em']
+    total = 0
+
+    products = product_model.objects.only('id', *RATING_FIELDS).order_by('id')
+    for product in products.iterator(chunk_size=batch_size):
+        values = expected.get(product.id, empty)
+        if any(getattr(product, field) != values[field] for field in RATING_FIELDS):
+            for field in RATING_FIELDS:
+                setattr(product, field, values[field])
+            product.atualizado_em = timezone.now()
+            changed.append(product)
+        if len(changed) >= batch_size:
+            total += _flush(product_model, changed, fields)
+            changed = []
+    total += _flush(product_model, changed, fields)
+    return total
+
+
+def _flush(product_model, products, fields):
+    if not products:
+        return 0
+    with transaction.atomic():
+        product_model.objects.bulk_update(products, fields)
+    return len(products)
@@ -0,0 +1,150 @@
+# store/recommendations.py
+"""
+"Quem comprou também levou": recomendações por co-ocorrência nos pedidos.
+
+A matriz produto × produto (em quantos pedidos os dois aparecem juntos) é
+esparsa: só existem os pares que já foram comprados juntos. Ela fica na
+tabela `ProductPair` e é atualizada a cada pedido novo (`record_order`),
+somando 1 a todos os pares da cesta num único UPDATE. Os K vizinhos mais
+fortes de cada produto ficam materializados em `Recommendation`, então a
+página do produto lê as recomendações numa só consulta.
+
+`rebuild` recalcula tudo a partir de `OrderItem`: os itens são lidos em
+ordem de pedido com `.iterator()` e os pares de cada cesta são contados
+em memória (`Counter` sobre `itertools.combinations`).
+
+Checkouts simultâneos: o `+ 1` de cada par é um UPDATE atômico no banco,
+então nenhum pedido se perde, e `ignore_conflicts` absorve dois pedidos
+criando o mesmo par. Duas cestas com produtos em comum podem, porém, se
+travar mutuamente (deadlock) ou disputar as mesmas posições de
+`Recommendation` (IntegrityError); `record_order` então recomeça do zero,
+até `RECORD_ATTEMPTS` vezes. O top-K de um produto é recalculado com os
+pares já confirmados, então pode ficar um pedido atrás de outro checkout
+simultâneo até o próximo pedido com esse produto (ou o próximo `rebuild`).
+"""
+import heapq
+import itertools
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import ProductPair, Recommendation
+
+# Vizinhos guardados por produto
+TOP_K = getattr(settings, 'RECOMMENDATIONS_TOP_K', 8)
+
+# Cestas com mais produtos distintos que isso são ignoradas (pares demais, pouco sinal)
+MAX_BASKET = getattr(settings, 'RECOMMENDATIONS_MAX_BASKET', 50)
+
+# Tentativas de `record_order` quando esbarra em outro checkout simultâneo
+RECORD_ATTEMPTS = 3
+
+
+def baskets(rows):
+    """(pedido_id, produto_id) ordenados por pedido -> conjunto de produtos de cada pedido."""
+    for _, items in itertools.groupby(rows, key=lambda row: row[0]):
+        yield {product_id for _, product_id in items if product_id is not None}
+
+
+def count_pairs(baskets):
+    """Conta os pares (a, b), com a < b, das cestas. Retorna um `Counter` esparso."""
+    counts = Counter()
+    for basket in baskets:
+        if 2 <= len(basket) <= MAX_BASKET:
+            counts.update(itertools.combinations(sorted(basket), 2))
+    return counts
+
+
+def top_neighbors(counts, k=TOP_K):
+    """{produto: [(outro, pedidos), ...]} com os k pares mais fortes (empate: menor id)."""
+    neighbors = defaultdict(list)
+    for (a, b), total in counts.items():
+        neighbors[a].append((total, b))
+        neighbors[b].append((total, a))
+    return {
+        product_id: [
+            (other, total)
+            for total, other in heapq.nlargest(k, items, key=lambda item: (item[0], -item[1]))
+        ]
+        for product_id, items in neighbors.items()
+    }
+
+
+def save_matrix(counts, k=TOP_K, batch_size=5000, neighbors=None):
+    """
+    Substitui a matriz e as recomendações pelas calculadas a partir de
+    `counts` (`neighbors`: o `top_neighbors` já calculado, se houver).
+    """
+    if neighbors is None:
+        neighbors = top_neighbors(counts, k)
+    with transaction.atomic():
+        ProductPair.objects.all().delete()
+        Recommendation.objects.all().delete()
+        ProductPair.objects.bulk_create((
+            ProductPair(produto_id=a, outro_id=b, pedidos=total)
+            for pair, total in counts.items()
+            for a, b in (pair, pair[::-1])
+        ), batch_size=batch_size)
+        Recommendation.objects.bulk_create((
+            Recommendation(produto_id=product_id, recomendado_id=other, posicao=position, pedidos=total)
+            for product_id, items in neighbors.items()
+            for position, (other, total) in enumerate(items, start=1)
+        ), batch_size=batch_size)
+    return len(counts)
+
+
+def order_rows(batch_size=5000):
+    """(pedido_id, produto_id) de todos os itens de pedido, em ordem de pedido, sem carregar tudo."""
+    from orders.models import OrderItem
+
+    return OrderItem.objects.filter(produto__isnull=False).order_by('pedido_id') \
+        .values_list('pedido_id', 'produto_id').iterator(chunk_size=batch_size)
+
+
+def rebuild(k=TOP_K, batch_size=5000):
+    """Recalcula a matriz inteira a partir dos itens de pedido. Retorna o número de pares."""
+    return save_matrix(count_pairs(baskets(order_rows(batch_size))), k, batch_size)
+
+
+def refresh_top(product_ids, k=TOP_K):
+    """Refaz as recomendações materializadas dos produtos informados."""
+    ranked = ProductPair.objects.filter(produto__in=product_ids).annotate(
+        posicao=Window(RowNumber(), partition_by=[F('produto')], order_by=[F('pedidos').desc(), F('outro').asc()]),
+    ).filter(posicao__lte=k).values_list('produto_id', 'outro_id', 'posicao', 'pedidos')
+
+    with transaction.atomic():
+        Recommendation.objects.filter(produto__in=product_ids).delete()
+        Recommendation.objects.bulk_create([
+            Recommendation(produto_id=product_id, recomendado_id=other, posicao=position, pedidos=total)
+            for product_id, other, position, total in ranked
+        ])
+
+
+def _record(ids, k):
+    with transaction.atomic():
+        # Cria os pares que ainda não existem e soma 1 em todos de uma vez
+        ProductPair.objects.bulk_create(
+            [ProductPair(produto_id=a, outro_id=b) for a in ids for b in ids if a != b],
+            ignore_conflicts=True,
+        )
+        ProductPair.objects.filter(produto__in=ids, outro__in=ids).update(pedidos=F('pedidos') + 1)
+        refresh_top(ids, k)
+
+
+def record_order(product_ids, k=TOP_K):
+    """Soma um pedido novo (ids dos produtos da cesta) à matriz, sem recalcular o resto."""
+    ids = sorted({product_id for product_id in product_ids if product_id is not None})
+    if not 2 <= len(ids) <= MAX_BASKET:
+        return
+    for attempt in range(1, RECORD_ATTEMPTS + 1):
+        try:
+            _record(ids, k)
+            return
+        except (IntegrityError, OperationalError):
+            # Deadlock/conflito com outro checkout: a transação foi desfeita
+            # inteira, então dá para recomeçar (dentro de outra transação, não)
+            if attempt == RECORD_ATTEMPTS or transaction.get_connection().in_atomic_block:
+                raise
@@ -0,0 +1,85 @@
+# store/reference.py
+"""
+Dados de referência: listas pequenas que quase nunca mudam e aparecem em
+toda página (categorias do filtro e dos cards da vitrine). Rótulos de
+`choices` (status do pedido etc.) já estão no código e não precisam disto.
+
+Cada processo guarda a sua cópia na memória e, no máximo a cada
+`REFERENCE_CHECK_SECONDS`, confere a versão no cache compartilhado. Quando
+os dados mudam (ex.: sinais de `Category`), `invalidate()` troca a versão e
+todos os processos recarregam na próxima conferência, o mesmo esquema das
+faixas de frete (orders/shipping.py).
+
+Nos templates: `{% load store_reference %}` e
+`{{ product.categoria_id|reference_label:'categories' }}`.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHECK_SECONDS = getattr(settings, 'REFERENCE_CHECK_SECONDS', 5)
+
+Option = namedtuple('Option', 'value label')
+
+_registry = {}
+
+
+class ReferenceData:
+    """Lista de (valor, rótulo) carregada por `loader`, com cópia por processo."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.version_key = f'store:reference:{name}:version'
+        self._lock = threading.Lock()
+        self._options = None
+        self._labels = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def options(self):
+        """(Option(valor, rótulo), ...) na ordem de exibição."""
+        now = time.monotonic()
+        if self._options is not None and now - self._checked_at < CHECK_SECONDS:
+            return self._options
+
+        with self._lock:
+            version = cache.get(self.version_key)
+            if self._options is None or version != self._version:
+                options = tuple(Option(*row) for row in self.loader())
+                self._labels = dict(options)
+                self._options = options
+                self._version = version
+            self._checked_at = now
+            return self._options
+
+    def label(self, value, default=''):
+        self.options()
+        return self._labels.get(value, default)
+
+    def invalidate(self):
+        """Avisa todos os processos que os dados mudaram."""
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+        self._checked_at = 0.0
+
+
+def register(name, loader):
+    _registry[name] = ReferenceData(name, loader)
+    return _registry[name]
+
+
+def get(name):
+    return _registry[name]
+
+
+def _load_categories():
+    from .models import Category
+    return [(category.id, category.get_nome_display()) for category in Category.objects.order_by('id')]
+
+
+# US-3: Filtro por tipo da vitrine
+categories = register('categories', _load_categories)
@@ -0,0 +1,101 @@
+# store/search.py
+"""
+US-2: Índice de busca textual dos cupcakes (nome e sabor).
+
+No SQLite usamos uma tabela virtual FTS5 com o tokenizador `unicode61`
+removendo acentos, então "limao" encontra "limão". Cada termo da busca
+é tratado como prefixo ("lim" encontra "limão") e os resultados são
+ordenados por relevância (bm25).
+
+Em outros bancos o índice não existe e a busca volta ao `icontains`.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+INDEX_TABLE = 'store_product_fts'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Remove acentos e deixa em minúsculas: 'Limão' -> 'limao'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def match_expression(query):
+    """
+    Converte o texto digitado numa expressão MATCH do FTS5.
+    Cada palavra vira um prefixo entre aspas (evita que a sintaxe do
+    FTS5 seja interpretada): 'bolo lim' -> '"bolo"* "lim"*'
+    """
+    return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(fold(query)))
+
+
+def index_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_product(product):
+    if not index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [product.pk])
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE} (rowid, nome, sabor) VALUES (%s, %s, %s)",
+            [product.pk, product.nome, product.sabor],
+        )
+
+
+def remove_product(product_id):
+    if not index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [product_id])
+
+
+def rebuild_index():
+    """Recria o índice inteiro a partir da tabela de produtos. Retorna o total indexado."""
+    if not index_available():
+        return 0
+    table = Product._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+        cursor.execute(f"INSERT INTO {INDEX_TABLE} (rowid, nome, sabor) SELECT id, nome, sabor FROM {table}")
+        cursor.execute(f"INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {INDEX_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search_products(queryset, query):
+    """
+    Restringe `queryset` aos produtos que casam com `query` e anota
+    `relevancia` (quanto menor, mais relevante, como o bm25 do FTS5).
+
+    O conjunto de ids vem do índice numa única subconsulta; a relevância
+    só é calculada para as linhas que já casaram.
+    """
+    match = match_expression(query)
+    if not match:
+        return queryset.none().annotate(relevancia=Value(0.0))
+
+    if not index_available():
+        # Sem FTS5: busca simples, sem ranking (relevância constante)
+        return queryset.filter(
+            Q(nome__icontains=query) | Q(sabor__icontains=query)
+        ).annotate(relevancia=Value(0.0))
+
+    table = Product._meta.db_table
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s", (match,))
+    ).annotate(relevancia=RawSQL(
+        f"SELECT rank FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s AND rowid = {table}.id",
+        (match,),
+        output_field=FloatField(),
+    ))
@@ -0,0 +1,114 @@
+# store/signals.py
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import favorites, images, inventory, reference, search
+from .models import Category, Favorite, Product, Review
+
+# Campos do produto que fazem parte do índice de busca (US-2)
+SEARCH_FIELDS = {'nome', 'sabor'}
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    # Atualizações só de estoque/preço não mexem no índice
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    search.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_stock_shards(sender, instance, created, update_fields=None, **kwargs):
+    # Estoque fracionado: redistribui quando o estoque ou o número de
+    # partições é alterado (dashboard/admin). Vendas não passam por aqui.
+    if update_fields is not None and not {'quantidade_estoque', 'estoque_particoes'}.intersection(update_fields):
+        return
+    particoes_salvas = getattr(instance, '_particoes_salvas', 0)
+    if not instance.estoque_particoes:
+        if particoes_salvas:
+            inventory.clear_shards(instance)
+    elif (created
+            or instance.estoque_particoes != particoes_salvas
+            or instance.quantidade_estoque != getattr(instance, '_estoque_salvo', None)):
+        inventory.distribute_stock(instance)
+    instance._estoque_salvo = instance.quantidade_estoque
+    instance._particoes_salvas = instance.estoque_particoes
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, created, update_fields=None, **kwargs):
+    # Nova foto: gera as versões redimensionadas fora da requisição
+    if update_fields is not None and 'imagem' not in update_fields:
+        return
+    name = instance.imagem.name
+    if not name or name == getattr(instance, '_imagem_salva', None):
+        return
+    instance._imagem_salva = name
+    if instance.imagem_variantes:
+        Product.objects.filter(pk=instance.pk).update(imagem_variantes=False)
+        instance.imagem_variantes = False
+    transaction.on_commit(lambda: images.schedule(name))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+
+# --- US-10: Agregados de avaliações no Produto ---
+
+def _rating_changes(estrelas, delta):
+    # Expressões F() para somar `delta` avaliações de `estrelas` ao produto
+    return {
+        'avaliacoes_quantidade': F('avaliacoes_quantidade') + delta,
+        'avaliacoes_soma': F('avaliacoes_soma') + delta * estrelas,
+        f'avaliacoes_{estrelas}': F(f'avaliacoes_{estrelas}') + delta,
+    }
+
+
+@receiver(post_save, sender=Review)
+def update_rating_aggregates(sender, instance, created, **kwargs):
+    estrelas = int(instance.estrelas)
+    anterior = getattr(instance, '_estrelas_salvas', None)
+
+    if created:
+        changes = _rating_changes(estrelas, 1)
+    elif anterior is not None and int(anterior) != estrelas:
+        # Avaliação alterada: move uma unidade do histograma e ajusta a soma
+        anterior = int(anterior)
+        changes = {
+            'avaliacoes_soma': F('avaliacoes_soma') + (estrelas - anterior),
+            f'avaliacoes_{anterior}': F(f'avaliacoes_{anterior}') - 1,
+            f'avaliacoes_{estrelas}': F(f'avaliacoes_{estrelas}') + 1,
+        }
+    else:
+        return
+
+    # Um único UPDATE atômico, sem ler o produto
+    Product.objects.filter(pk=instance.produto_id).update(**changes, atualizado_em=timezone.now())
+    instance._estrelas_salvas = estrelas
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating_aggregates(sender, instance, **kwargs):
+    anterior = getattr(instance, '_estrelas_salvas', instance.estrelas)
+    Product.objects.filter(pk=instance.produto_id).update(
+        **_rating_changes(int(anterior), -1), atualizado_em=timezone.now(),
+    )
+
+
+# US-15: O conjunto de favoritos em cache muda junto com a tabela
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorites(sender, instance, **kwargs):
+    transaction.on_commit(lambda: favorites.invalidate(instance.usuario_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reload_categories(sender, **kwargs):
+    # US-3: Todos os processos recarregam as categorias (store/reference.py)
+    transaction.on_commit(reference.categories.invalidate)
@@ -0,0 +1,97 @@
+# store/storage.py
+"""
+Armazenamento das fotos dos cupcakes endereçado pelo conteúdo.
+
+O arquivo é gravado como `<pasta>/<sha256>.<ext>` (hash do conteúdo, 32
+primeiros dígitos), então o mesmo upload feito várias vezes ocupa um só
+arquivo, e a URL muda sempre que o conteúdo muda. Por isso essas URLs
+(e as variantes geradas a partir delas em `store/images.py`) podem ser
+servidas com cache "imutável" de um ano.
+
+Como um arquivo pode ser compartilhado por vários produtos, o storage
+nunca apaga nada sozinho; a limpeza fica com o comando `dedupe_media`.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.conf.urls.static import static as static_urls
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.views import static
+
+HASH_LENGTH = 32
+
+# Cache-Control para arquivos cujo nome é o hash do conteúdo
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# 'cupcakes/<hash>.jpg' e as variantes 'cupcakes/variantes/<hash>-400w.webp'
+CONTENT_ADDRESSED_RE = re.compile(rf'(^|/)[0-9a-f]{{{HASH_LENGTH}}}(-\d+w)?\.[a-z0-9]+$')
+
+
+def file_digest(content):
+    """sha256 (truncado) de um arquivo do Django ou de um arquivo aberto em modo binário."""
+    digest = hashlib.sha256()
+    chunks = content.chunks() if hasattr(content, 'chunks') else iter(lambda: content.read(64 * 1024), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def content_name(name, digest):
+    """'cupcakes/calabresa.JPG' + hash -> 'cupcakes/<hash>.jpg'"""
+    folder, filename = posixpath.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return posixpath.join(folder, digest + extension)
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_RE.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """`FileSystemStorage` que nomeia os arquivos pelo hash do conteúdo."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = content_name(self.generate_filename(name), file_digest(content))
+        # Mesmo conteúdo já gravado: reaproveita o arquivo existente
+        if self.exists(name):
+            return name
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return super().save(name, content, max_length=max_length)
+
+
+def serve(request, path, document_root=None, show_indexes=False):
+    """
+    `django.views.static.serve` com Cache-Control imutável para os arquivos
+    endereçados pelo conteúdo. Em produção o servidor web deve fazer o
+    mesmo (ex.: nginx com `expires max` para o padrão de
+    `CONTENT_ADDRESSED_RE`).
+    """
+    response = static.serve(request, path, document_root or settings.MEDIA_ROOT, show_indexes)
+    if response.status_code in (200, 304) and is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def media_urlpatterns():
+    """
+    Fotos dos cupcakes em desenvolvimento, pelo `serve` acima. No urls.py
+    do projeto:
+
+        from store.storage import media_urlpatterns
+        urlpatterns += media_urlpatterns()
+
+    Vazio fora do DEBUG (em produção quem serve é o servidor web) e sem
+    MEDIA_URL configurado (o Django transforma '' em '/', que engoliria
+    todas as URLs do site).
+    """
+    if not settings.DEBUG or not settings.MEDIA_URL.strip('/'):
+        return []
+    return static_urls(settings.MEDIA_URL, view=serve, document_root=settings.MEDIA_ROOT)
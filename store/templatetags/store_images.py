@@ -0,0 +1,50 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from store import images
+
+register = template.Library()
+
+
+def _srcset(storage, name, extension, widths):
+    # Cada variante com a largura que ela tem de verdade
+    return ', '.join(
+        f'{storage.url(images.variant_name(name, width, extension))} {actual}w'
+        for width, actual in widths
+    )
+
+
+@register.simple_tag
+def product_image(product, variant='card', css_class='', style=''):
+    """
+    <picture> com WebP e JPEG nas larguras geradas, para o navegador baixar
+    só o tamanho necessário. Enquanto as variantes não existem, usa a
+    imagem original.
+
+    Uso: {% product_image product 'card' 'card-img-top' 'height: 250px;' %}
+    """
+    if not product.imagem:
+        return ''
+    spec = images.VARIANTS[variant]
+    name = product.imagem.name
+    storage = product.imagem.storage
+
+    if not product.imagem_variantes:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="lazy">',
+            product.imagem.url, css_class, product.nome, style,
+        )
+
+    widths = images.generated_widths(product.imagem_largura)
+    # Foto mais estreita que a variante pedida: a maior que foi gerada
+    default = min(spec['width'], widths[-1][0])
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="lazy"></picture>',
+        format_html_join('', '<source type="image/webp" srcset="{}" sizes="{}">', [(_srcset(storage, name, 'webp', widths), spec['sizes'])]),
+        storage.url(images.variant_name(name, default, 'jpg')),
+        _srcset(storage, name, 'jpg', widths),
+        spec['sizes'],
+        css_class,
+        product.nome,
+        style,
+    )
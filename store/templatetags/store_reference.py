@@ -0,0 +1,21 @@
+from django import template
+
+from store import reference
+
+register = template.Library()
+
+
+@register.filter
+def reference_label(value, name):
+    """
+    Rótulo de `value` nos dados de referência `name` (store/reference.py),
+    sem consulta ao banco.
+
+    Uso: {{ product.categoria_id|reference_label:'categories' }}
+    (nome não registrado: rótulo vazio, como um valor desconhecido)
+    """
+    try:
+        data = reference.get(name)
+    except KeyError:
+        return ''
+    return data.label(value)
@@ -1,3 +1,489 @@
-from django.test import TestCase
+import datetime
+import decimal
+import io
+import itertools
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.cart import CartLine, PricedCart
+from orders.models import Order, OrderItem
+from orders.placement import decrement_stock, place_order
+from users.models import CustomUser
+from . import favorites, images, ratings, recommendations, reference, search, storage
+from .models import Category, Favorite, Product, ProductPair, Recommendation, Review
+from .pagination import encode_cursor
+from .profiling import QueryBudgetExceeded, profile_queries, query_budget
+from .templatetags.store_reference import reference_label
+
+PROFILING_MIDDLEWARE = 'store.profiling.QueryProfileMiddleware'
+
+
+def make_products(total):
+    category = Category.objects.create(nome='doce')
+    return Product.objects.bulk_create([
+        Product(nome=f'Cupcake {n}', sabor='chocolate', valor=decimal.Decimal('5.00'),
+                quantidade_estoque=10, categoria=category, imagem='cupcakes/x.jpg')
+        for n in range(total)
+    ])
+
+
+class QueryBudgetTests(TestCase):
+    """O número de consultas das páginas não pode crescer com o tamanho dos dados."""
+
+    def test_product_list(self):
+        make_products(30)
+        with query_budget(2, 'vitrine'):
+            response = self.client.get(reverse('store:product_list'))
+        self.assertEqual(len(response.context['products']), 12)
+
+    def test_product_detail_with_reviews(self):
+        product = make_products(1)[0]
+        for n in range(15):
+            user = CustomUser.objects.create_user(f'cliente{n}', password=None, cpf=str(n))
+            Review.objects.create(produto=product, usuario=user, estrelas=5, comentario='Ótimo')
+        with query_budget(3, 'produto'):
+            response = self.client.get(reverse('store:product_detail', args=[product.pk]))
+        self.assertContains(response, 'cliente14')  # mais recente primeiro
+
+    def test_categories_come_from_reference_cache(self):
+        reference.categories.invalidate()
+        make_products(3)
+        self.client.get(reverse('store:product_list'))
+        with query_budget(1, 'vitrine'):
+            response = self.client.get(reverse('store:product_list'))
+        self.assertContains(response, '<span class="badge bg-secondary mb-2">Doce</span>', count=3)
+        self.assertEqual(reference_label(1, 'nao_registrado'), '')
+
+        # Categoria nova: o sinal troca a versão e a vitrine recarrega a lista
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(nome='salgado')
+        self.assertContains(self.client.get(reverse('store:product_list')), 'Salgado')
+
+    def test_repeated_queries_are_grouped(self):
+        products = make_products(6)
+        with profile_queries() as profile:
+            for product in Product.objects.filter(pk__in=[p.pk for p in products]):
+                product.categoria.nome  # N+1 de propósito
+        [(sql, repeated)] = profile.duplicates()
+        self.assertEqual(repeated, 6)
+        self.assertIn('store_category', sql)
+
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(2):
+                for product in Product.objects.all():
+                    product.categoria.nome
+
+
+@override_settings(
+    SQL_PROFILING=True,
+    MIDDLEWARE=[*settings.MIDDLEWARE, PROFILING_MIDDLEWARE],
+    SQL_PROFILING_BUDGETS={'store:product_list': 0},
+)
+class QueryProfileMiddlewareTests(TestCase):
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('store:product_list'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="SQL \(\d+ consultas\)", tpl;dur=')
+
+    @override_settings(SQL_PROFILING_ENFORCE_BUDGETS=True)
+    def test_enforced_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('store:product_list'))
+
+    @override_settings(SQL_PROFILING=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('store:product_list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class CatalogApiTests(TestCase):
+    """API JSON do catálogo: páginas limitadas e 304 enquanto nada mudou."""
+
+    def test_list_revalidates_with_etag(self):
+        products = make_products(5)
+        url = reverse('store:catalog_api')
+        response = self.client.get(url, {'por_pagina': 2})
+        self.assertEqual([row['id'] for row in response.json()['results']], [p.pk for p in products[:2]])
+        self.assertEqual(response.json()['results'][0]['categoria']['nome'], 'Doce')
+        self.assertEqual(len(self.client.get(url, {'por_pagina': 1000}).json()['results']), 5)
+        self.assertEqual(self.client.get(url, {'categoria': 'x'}).status_code, 400)
+
+        etag = response['ETag']
+        with query_budget(1, 'api'):  # só a página; o JSON não é montado
+            response = self.client.get(url, {'por_pagina': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Nova avaliação: o produto muda de versão e a página também
+        user = CustomUser.objects.create_user('cliente', password=None, cpf='1')
+        Review.objects.create(produto=products[1], usuario=user, estrelas=4)
+        response = self.client.get(url, {'por_pagina': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][1]['avaliacoes'], {'quantidade': 1, 'media': 4.0})
+
+    def test_product_last_modified(self):
+        product = make_products(1)[0]
+        Product.objects.filter(pk=product.pk).update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+        url = reverse('store:catalog_product_api', args=[product.pk])
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Vender o estoque todo muda a versão (some da vitrine)
+        product.refresh_from_db()
+        decrement_stock([CartLine(product, 10)])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['em_estoque'])
+
+
+class KeysetPaginationTests(TestCase):
+
+    def test_reviews_in_the_same_millisecond(self):
+        product = make_products(1)[0]
+        for n in range(6):
+            user = CustomUser.objects.create_user(f'cliente{n}', password=None, cpf=str(n))
+            Review.objects.create(produto=product, usuario=user, estrelas=5)
+        # Todas no mesmo milissegundo: o cursor precisa dos microssegundos
+        instant = timezone.now().replace(microsecond=123000)
+        for n, review in enumerate(Review.objects.order_by('id')):
+            Review.objects.filter(pk=review.pk).update(criado_em=instant + datetime.timedelta(microseconds=n * 100))
+
+        url = reverse('store:product_reviews_json', args=[product.pk])
+        seen, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get(url, {'por_pagina': 2, 'cursor': cursor}).json()
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+        self.assertEqual(seen, list(Review.objects.order_by('-criado_em', '-id').values_list('id', flat=True)))
+
+    def test_tampered_cursor(self):
+        product = make_products(3)[0]
+        cursor = encode_cursor('n', ['abc'])
+        response = self.client.get(reverse('store:product_list'), {'cursor': cursor})
+        self.assertEqual(len(response.context['products']), 3)  # volta para a primeira página
+        for url in (reverse('store:catalog_api'), reverse('store:product_reviews_json', args=[product.pk])):
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400, url)
+        bad_rank = {'q': 'chocolate', 'cursor': encode_cursor('n', ['x', 1])}
+        self.assertEqual(self.client.get(reverse('store:catalog_api'), bad_rank).status_code, 400)
+        bad_date = encode_cursor('n', ['ontem', 1])
+        self.assertEqual(self.client.get(reverse('store:product_reviews_json', args=[product.pk]),
+                                         {'cursor': bad_date}).status_code, 400)
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.folder = os.path.join(media_root, 'cupcakes')
+
+    def test_same_content_is_stored_once(self):
+        image_storage = images.image_storage()
+        first = image_storage.save('cupcakes/Calabresa.JPG', ContentFile(b'foto'))
+        again = image_storage.save('cupcakes/outro-nome.jpg', ContentFile(b'foto'))
+        other = image_storage.save('cupcakes/outro-nome.jpg', ContentFile(b'outra foto'))
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertTrue(storage.is_content_addressed(first))
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+
+        response = storage.serve(RequestFactory().get('/'), first)
+        self.assertEqual(response['Cache-Control'], storage.IMMUTABLE_CACHE_CONTROL)
+
+    def test_media_urls_only_in_debug(self):
+        with self.settings(DEBUG=False):
+            self.assertEqual(storage.media_urlpatterns(), [])
+        with self.settings(DEBUG=True, MEDIA_URL=''):
+            self.assertEqual(storage.media_urlpatterns(), [])
+        with self.settings(DEBUG=True, MEDIA_URL='/media/'):
+            [pattern] = storage.media_urlpatterns()
+            self.assertIs(pattern.callback, storage.serve)
+
+    def test_dedupe_media_renames_and_shares_files(self):
+        os.makedirs(self.folder)
+        for filename, content in [('a.jpg', b'igual'), ('b.JPG', b'igual'), ('c.jpg', b'diferente')]:
+            with open(os.path.join(self.folder, filename), 'wb') as f:
+                f.write(content)
+        a, b, c = Product.objects.bulk_create([
+            Product(nome=name, sabor='chocolate', valor=5, imagem=f'cupcakes/{name}')
+            for name in ('a.jpg', 'b.JPG', 'c.jpg')
+        ])
+        response = storage.serve(RequestFactory().get('/'), 'cupcakes/a.jpg')
+        self.assertNotIn('immutable', response.get('Cache-Control', ''))
+
+        call_command('dedupe_media', stdout=io.StringIO())
+        names = dict(Product.objects.values_list('nome', 'imagem'))
+        self.assertEqual(names['a.jpg'], names['b.JPG'])
+        self.assertNotEqual(names['a.jpg'], names['c.jpg'])
+        self.assertEqual(sorted(os.listdir(self.folder)), sorted(posixpath.basename(name) for name in set(names.values())))
+
+
+class ImageVariantTests(TestCase):
+
+    def test_failed_generation_is_logged(self):
+        executor = ThreadPoolExecutor(max_workers=1)  # no lugar do pool de processos
+        with mock.patch.object(images, 'SYNC', False), \
+                mock.patch.object(images, 'get_executor', return_value=executor), \
+                self.assertLogs('store.images', 'ERROR') as logs:
+            images.schedule('cupcakes/nao-existe.jpg')
+            executor.shutdown(wait=True)
+        self.assertIn('cupcakes/nao-existe.jpg', logs.output[0])
+
+    def test_generated_widths_never_upscale(self):
+        self.assertEqual(images.generated_widths(2000), [(160, 160), (400, 400), (900, 900)])
+        self.assertEqual(images.generated_widths(500), [(160, 160), (400, 400), (900, 500)])
+        self.assertEqual(images.generated_widths(400), [(160, 160), (400, 400)])
+        self.assertEqual(images.generated_widths(100), [(160, 100)])
+        self.assertEqual(images.generated_widths(None), [(160, 160), (400, 400), (900, 900)])
+
+    def test_srcset_lists_only_generated_widths(self):
+        from PIL import Image
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        photo = io.BytesIO()
+        Image.new('RGB', (500, 300), 'pink').save(photo, 'JPEG')
+        with override_settings(MEDIA_ROOT=media_root):
+            name = images.image_storage().save('cupcakes/estreita.jpg', ContentFile(photo.getvalue()))
+            product = make_products(1)[0]
+            Product.objects.filter(pk=product.pk).update(imagem=name)
+            images.generate_now(name)
+
+            product.refresh_from_db()
+            self.assertEqual((product.imagem_variantes, product.imagem_largura), (True, 500))
+            with Image.open(images.image_storage().path(images.variant_name(name, 900, 'jpg'))) as variant:
+                self.assertEqual(variant.width, 500)
+            html = Template('{% load store_images %}{% product_image product "detail" %}').render(
+                Context({'product': product})
+            )
+        self.assertIn('-900w.webp 500w', html)
+        self.assertNotIn(' 900w', html)
+        self.assertIn(f'src="{settings.MEDIA_URL}{images.variant_name(name, 900, "jpg")}"', html)
+
+
+class FavoriteCacheTests(TestCase):
+
+    def request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_stale_read_does_not_overwrite_newer_state(self):
+        user = CustomUser.objects.create_user('cliente', password=None, cpf='1')
+        product = make_products(1)[0]
+
+        def read_then_toggle(**kwargs):
+            # A consulta termina antes de outra requisição favoritar (e invalidar)
+            stale = mock.Mock()
+            stale.values_list.return_value = []
+            with self.captureOnCommitCallbacks(execute=True):
+                Favorite.objects.create(usuario=user, produto=product)
+            return stale
+
+        with mock.patch.object(favorites.Favorite.objects, 'filter', side_effect=read_then_toggle):
+            self.assertEqual(favorites.favorite_ids(self.request(user)), frozenset())
+        self.assertEqual(favorites.favorite_ids(self.request(user)), {product.pk})
+
+
+@skipUnless(connection.vendor == 'sqlite', 'índice FTS5 do SQLite')
+class SearchIndexTests(TestCase):
+
+    def search_ids(self, query):
+        return list(search.search_products(Product.objects.all(), query).order_by('relevancia', 'id')
+                    .values_list('id', flat=True))
+
+    def test_index_follows_save_and_delete(self):
+        product = Product.objects.create(nome='Cupcake de Limão', sabor='limão siciliano', valor=5,
+                                         quantidade_estoque=5, imagem='cupcakes/x.jpg')
+        self.assertEqual(self.search_ids('limao'), [product.pk])  # sem acento
+        self.assertEqual(self.search_ids('sicil'), [product.pk])  # prefixo
+
+        product.nome, product.sabor = 'Cupcake de Morango', 'morango'
+        product.save()
+        self.assertEqual(self.search_ids('limao'), [])
+        self.assertEqual(self.search_ids('morang'), [product.pk])
+
+        product.quantidade_estoque = 3
+        product.save(update_fields=['quantidade_estoque'])  # não reindexa
+        self.assertEqual(self.search_ids('morang'), [product.pk])
+
+        product.delete()
+        self.assertEqual(self.search_ids('morang'), [])
+
+    def test_ranked_pages_cover_every_match_once(self):
+        for n in range(9):
+            # Relevâncias diferentes e empates (desempatados pelo id)
+            Product.objects.create(nome='Chocolate ' * (n % 3 + 1) + str(n), sabor='chocolate' if n % 2 else 'baunilha',
+                                   valor=5, quantidade_estoque=5, imagem='cupcakes/x.jpg')
+        Product.objects.create(nome='Baunilha', sabor='baunilha', valor=5, quantidade_estoque=5, imagem='cupcakes/x.jpg')
+
+        ranks = list(search.search_products(Product.objects.all(), 'choc').values_list('relevancia', flat=True))
+        self.assertTrue(1 < len(set(ranks)) < len(ranks))
+
+        seen, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get(reverse('store:catalog_api'), {'q': 'choc', 'por_pagina': 2, 'cursor': cursor}).json()
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+        self.assertEqual(len(seen), 9)
+        self.assertEqual(seen, self.search_ids('choc'))
+
+
+class RatingAggregateTests(TestCase):
+
+    def assertCountersMatch(self, product):
+        expected = ratings.compute_rating_aggregates(Review).get(product.pk, dict.fromkeys(ratings.RATING_FIELDS, 0))
+        stored = Product.objects.filter(pk=product.pk).values(*ratings.RATING_FIELDS).get()
+        self.assertEqual(stored, {field: expected[field] or 0 for field in ratings.RATING_FIELDS})
+
+    def test_counters_follow_create_edit_and_delete(self):
+        product = make_products(1)[0]
+        users = [CustomUser.objects.create_user(f'cliente{n}', password=None, cpf=str(n)) for n in range(3)]
+        reviews = [Review.objects.create(produto=product, usuario=user, estrelas=n + 3) for n, user in enumerate(users)]
+        self.assertCountersMatch(product)
+
+        review = Review.objects.get(pk=reviews[0].pk)  # lido do banco, como na view
+        review.estrelas = 1
+        review.save()
+        self.assertCountersMatch(product)
+        # Editar pelo update_or_create da página do produto (estrelas chegam como texto)
+        Review.objects.update_or_create(produto=product, usuario=users[1], defaults={'estrelas': '2'})
+        self.assertCountersMatch(product)
+
+        Review.objects.get(pk=reviews[2].pk).delete()
+        self.assertCountersMatch(product)
+        product.refresh_from_db()
+        self.assertEqual((product.avaliacoes_quantidade, product.media_avaliacoes), (2, 1.5))
+
+    def test_rejects_stars_outside_one_to_five(self):
+        product = make_products(1)[0]
+        self.client.force_login(CustomUser.objects.create_user('cliente', password=None, cpf='1'))
+        url = reverse('store:product_detail', args=[product.pk])
+        for estrelas in ('7', '0', 'abc', ''):
+            response = self.client.post(url, {'estrelas': estrelas, 'comentario': 'x'})
+            self.assertEqual(response.status_code, 400, estrelas)
+        self.assertFalse(Review.objects.exists())
+
+        response = self.client.post(url, {'estrelas': '5', 'comentario': 'Ótimo'})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertCountersMatch(product)
+
+    def test_reconcile_fixes_drift(self):
+        product = make_products(1)[0]
+        user = CustomUser.objects.create_user('cliente', password=None, cpf='1')
+        Review.objects.create(produto=product, usuario=user, estrelas=4)
+        # Apagada direto no banco (sem sinais) e contador corrompido
+        Review.objects.filter(produto=product)._raw_delete(Review.objects.db)
+        Product.objects.filter(pk=product.pk).update(avaliacoes_5=7)
+        self.assertEqual(ratings.reconcile_ratings(), 1)
+        self.assertCountersMatch(product)
+        self.assertEqual(ratings.reconcile_ratings(), 0)
+
+
+class RecommendationTests(TestCase):
+    """A matriz mantida pedido a pedido é a mesma que o recálculo completo."""
+
+    def snapshot(self):
+        return (
+            sorted(ProductPair.objects.values_list('produto_id', 'outro_id', 'pedidos')),
+            list(Recommendation.objects.values_list('produto_id', 'recomendado_id', 'posicao', 'pedidos')),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        products = make_products(6)
+        user = CustomUser.objects.create_user('cliente', password=None, cpf='1')
+        # Inclui uma cesta de um produto só (não conta) e empates
+        for basket in ([0, 1, 2], [0, 1], [1, 2, 3], [0], [3, 4, 1], [0, 1, 2], [5, 0], [2, 4]):
+            priced = PricedCart([CartLine(products[n], 1) for n in basket], [])
+            with self.captureOnCommitCallbacks(execute=True):
+                place_order(user, priced, frete=0)
+        incremental = self.snapshot()
+        self.assertTrue(incremental[0])
+
+        recommendations.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_incremental_matches_rebuild_with_small_top(self):
+        products = make_products(5)
+        for basket in ([0, 1, 2, 3], [0, 1], [0, 2], [0, 4], [4, 3]):
+            recommendations.record_order([products[n].pk for n in basket], k=2)
+        incremental = self.snapshot()
+        self.assertEqual(Recommendation.objects.filter(produto=products[0]).count(), 2)
+
+        # O recálculo parte dos itens de pedido
+        for basket in ([0, 1, 2, 3], [0, 1], [0, 2], [0, 4], [4, 3]):
+            order = Order.objects.create(valor_total=0)
+            OrderItem.objects.bulk_create([
+                OrderItem(pedido=order, produto=products[n], valor_unitario=5) for n in basket
+            ])
+        recommendations.rebuild(k=2)
+        self.assertEqual(self.snapshot(), incremental)
+
+
+class ConcurrentRecommendationTests(TransactionTestCase):
+    """Checkouts simultâneos não perdem pedidos na matriz."""
+
+    threads = 8
+    orders_per_thread = 5
+
+    def test_concurrent_baskets_match_rebuild(self):
+        products = make_products(4)
+        ids = [product.pk for product in products]
+        baskets = [ids[:3], ids[1:], [ids[0], ids[3]], ids]
+        # Os pedidos já gravados; cada thread soma os seus à matriz ao mesmo tempo
+        plan = [[baskets[(n + i) % len(baskets)] for i in range(self.orders_per_thread)] for n in range(self.threads)]
+        for basket in itertools.chain.from_iterable(plan):
+            order = Order.objects.create(valor_total=0)
+            OrderItem.objects.bulk_create([
+                OrderItem(pedido=order, produto_id=product_id, valor_unitario=5) for product_id in basket
+            ])
+        start = threading.Barrier(self.threads)
+        failures = []
+
+        def buyer(orders):
+            start.wait()
+            try:
+                for basket in orders:
+                    for _retry in range(200):
+                        try:
+                            recommendations.record_order(basket)
+                        except OperationalError:
+                            # SQLite: banco travado por outra escrita, tenta de novo
+                            time.sleep(0.005)
+                            continue
+                        break
+                    else:
+                        failures.append(basket)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buyer, args=(orders,)) for orders in plan]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(failures, [])
+        pairs = sorted(ProductPair.objects.values_list('produto_id', 'outro_id', 'pedidos'))
+        recommendations.rebuild()
+        self.assertEqual(sorted(ProductPair.objects.values_list('produto_id', 'outro_id', 'pedidos')), pairs)
@@ -11,7 +11,17 @@ urlpatterns = [
     # URL para ver os detalhes de um cupcake específico
     # Também usado para US-10: Avaliar cupcakes
     path('produto/<int:pk>/', views.product_detail_view, name='product_detail'),
+
+    # US-10: Avaliações paginadas (fragmento HTML e JSON)
+    path('produto/<int:pk>/avaliacoes/', views.product_reviews_view, name='product_reviews'),
+    path('produto/<int:pk>/avaliacoes.json', views.product_reviews_json_view, name='product_reviews_json'),
     
     # US-15: Ação para adicionar/remover um favorito
     path('produto/<int:pk>/favoritar/', views.toggle_favorite_view, name='toggle_favorite'),
-]
\ No newline at end of file
+    path('produto/<int:pk>/favoritar.json', views.toggle_favorite_json_view, name='toggle_favorite_json'),
+    path('favoritos/', views.favorite_list_view, name='favorite_list'),
+
+    # API JSON do catálogo (somente leitura), com ETag/Last-Modified
+    path('api/produtos/', views.catalog_api_view, name='catalog_api'),
+    path('api/produtos/<int:pk>/', views.catalog_product_api_view, name='catalog_product_api'),
+]
@@ -1,7 +1,48 @@
+import hashlib
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Avg
-from .models import Product, Category, Review, Favorite
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_POST, require_safe
+from django.conf import settings
+from . import favorites, images, inventory, reference
+from .models import Product, Review
+from .pagination import InvalidCursor, paginate_keyset, cursor_querystring
+from .search import search_products
+
+# US-1 (RNF#1): Quantidade de cupcakes por página da vitrine
+PRODUCTS_PER_PAGE = getattr(settings, 'STORE_PRODUCTS_PER_PAGE', 12)
+MAX_PRODUCTS_PER_PAGE = 60
+
+# US-10: Quantidade de avaliações por bloco na página do produto
+REVIEWS_PER_PAGE = getattr(settings, 'STORE_REVIEWS_PER_PAGE', 10)
+MAX_REVIEWS_PER_PAGE = 50
+REVIEW_ORDERING = ('-criado_em', '-id')
+
+# "Quem comprou também levou": quantas recomendações mostrar no produto
+RECOMMENDATIONS_SHOWN = getattr(settings, 'STORE_RECOMMENDATIONS_SHOWN', 4)
+
+# API do catálogo: colunas lidas com .values() (sem instanciar o model)
+API_PRODUCT_FIELDS = (
+    'id', 'nome', 'sabor', 'valor', 'categoria_id', 'imagem', 'quantidade_estoque',
+    'avaliacoes_quantidade', 'avaliacoes_soma', 'atualizado_em',
+)
+API_PRODUCTS_PER_PAGE = getattr(settings, 'STORE_API_PRODUCTS_PER_PAGE', 24)
+MAX_API_PRODUCTS_PER_PAGE = 100
+# Mudar quando o formato do JSON mudar: invalida os ETags guardados pelos clientes
+API_FORMAT = '1'
+
+
+def _page_size(request, default, maximum):
+    # Permite ?por_pagina=N, limitado ao máximo para não voltar a carregar tudo
+    try:
+        size = int(request.GET.get('por_pagina', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
 
 def product_list_view(request):
     """
@@ -9,33 +50,45 @@ def product_list_view(request):
     """
     
     # US-1 (RN#1): Cupcakes fora de estoque não devem aparecer.
+    # O rótulo da categoria do card vem de store/reference.py (sem JOIN)
     queryset = Product.objects.filter(quantidade_estoque__gt=0)
     
     # US-2: Buscar cupcakes por sabor (ou nome)
     query = request.GET.get('q')
+    ordering = ('id',)
     if query:
-        # Busca por nome OU sabor que contenha o texto da busca
-        queryset = queryset.filter(
-            Q(nome__icontains=query) | Q(sabor__icontains=query)
-        )
+        # Busca no índice textual (sem acentos, por prefixo), mais relevantes primeiro
+        queryset = search_products(queryset, query)
+        ordering = ('relevancia', 'id')
     
     # US-3: Filtrar cupcakes por tipo
     category_id = request.GET.get('categoria')
     if category_id:
         queryset = queryset.filter(categoria__id=category_id)
         
-    # Pega todas as categorias para exibir no menu de filtro
-    categories = Category.objects.all()
-    
+    # Categorias do menu de filtro: cópia em memória, sem consulta por requisição
+    categories = reference.categories.options()
+
+    # Otimização para US-1 (RNF#1): O tempo de carregamento deve ser < 3s.
+    # Paginação por cursor ordenada pela chave primária (ou pela relevância
+    # na busca): cada página é uma única consulta, não importa o tamanho do catálogo.
+    page = paginate_keyset(
+        queryset,
+        ordering=ordering,
+        cursor=request.GET.get('cursor'),
+        page_size=_page_size(request, PRODUCTS_PER_PAGE, MAX_PRODUCTS_PER_PAGE),
+    )
+
     context = {
-        'products': queryset,
+        'products': page,
+        'page': page,
+        'next_querystring': page.next_cursor and cursor_querystring(request, page.next_cursor),
+        'previous_querystring': page.previous_cursor and cursor_querystring(request, page.previous_cursor),
         'categories': categories,
         'selected_category_id': category_id, # Para manter o filtro ativo na UI
+        # US-15: Corações preenchidos sem uma consulta por card
+        'favorite_ids': favorites.favorite_ids(request),
     }
-    # Otimização para US-1 (RNF#1): O tempo de carregamento
-    # deve ser < 3s. Isso pode ser melhorado com .select_related('categoria')
-    # e paginação, mas mantemos simples por enquanto.
-    
     return render(request, 'store/product_list.html', context)
 
 
@@ -43,11 +96,12 @@ def product_detail_view(request, pk):
     """
     Mostra os detalhes de um produto e permite avaliá-lo (US-10).
     """
-    product = get_object_or_404(Product, pk=pk)
-    reviews = product.reviews.all().order_by('-criado_em')
+    # Estoque mostrado: soma das partições para produtos fracionados
+    product = get_object_or_404(inventory.with_stock(Product.objects), pk=pk)
     
     # US-10 (CA#2): Média de avaliações visível no produto.
-    average_rating = reviews.aggregate(Avg('estrelas'))['estrelas__avg'] or 0
+    # Vem dos agregados mantidos no próprio produto (sem consulta extra).
+    average_rating = product.media_avaliacoes
 
     # Lógica para US-10: Avaliar cupcakes
     if request.method == 'POST' and request.user.is_authenticated:
@@ -56,8 +110,11 @@ def product_detail_view(request, pk):
         # (Essa verificação de "compra" é complexa e omitida aqui,
         # mas seria feita checando os Pedidos do usuário)
         
-        estrelas = request.POST.get('estrelas')
+        estrelas = request.POST.get('estrelas', '')
         comentario = request.POST.get('comentario')
+        # O formulário só oferece 1 a 5; os contadores do produto também
+        if estrelas not in {str(n) for n in range(1, 6)}:
+            return HttpResponseBadRequest('Avaliação inválida: escolha de 1 a 5 estrelas.')
         
         # Cria ou atualiza a avaliação do usuário
         Review.objects.update_or_create(
@@ -67,30 +124,237 @@ def product_detail_view(request, pk):
         )
         return redirect('store:product_detail', pk=product.pk)
 
+    # Só o primeiro bloco de avaliações; o resto vem de product_reviews_view
+    reviews = _review_page(request, product)
+
+    # Recomendações já materializadas (store/recommendations.py): uma consulta
+    recommended = [
+        recommendation.recomendado
+        for recommendation in product.recomendacoes.select_related('recomendado')
+        .filter(recomendado__quantidade_estoque__gt=0)[:RECOMMENDATIONS_SHOWN]
+    ]
+
     context = {
         'product': product,
         'reviews': reviews,
         'average_rating': average_rating,
+        'recommended': recommended,
     }
     return render(request, 'store/product_detail.html', context)
 
 
+def _review_page(request, product):
+    # Usa o índice (produto, criado_em) e traz o autor no mesmo JOIN
+    queryset = Review.objects.filter(produto=product).select_related('usuario')
+    return paginate_keyset(
+        queryset,
+        ordering=REVIEW_ORDERING,
+        cursor=request.GET.get('cursor'),
+        page_size=_page_size(request, REVIEWS_PER_PAGE, MAX_REVIEWS_PER_PAGE),
+    )
+
+
+def product_reviews_view(request, pk):
+    """
+    US-10: Próximo bloco de avaliações em HTML (carregado pela página do produto).
+    """
+    product = get_object_or_404(Product.objects.only('id'), pk=pk)
+    context = {
+        'product': product,
+        'reviews': _review_page(request, product),
+    }
+    return render(request, 'store/review_list.html', context)
+
+
+def product_reviews_json_view(request, pk):
+    """
+    US-10: Avaliações do produto em JSON, paginadas por cursor.
+    """
+    product = get_object_or_404(Product.objects.only('id'), pk=pk)
+    queryset = Review.objects.filter(produto=product).values(
+        'id', 'estrelas', 'comentario', 'criado_em', 'usuario__username',
+    )
+    try:
+        page = paginate_keyset(
+            queryset,
+            ordering=REVIEW_ORDERING,
+            cursor=request.GET.get('cursor'),
+            page_size=_page_size(request, REVIEWS_PER_PAGE, MAX_REVIEWS_PER_PAGE),
+            strict=True,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    return JsonResponse({
+        'results': [
+            {
+                'id': row['id'],
+                'usuario': row['usuario__username'],
+                'estrelas': row['estrelas'],
+                'comentario': row['comentario'],
+                'criado_em': row['criado_em'],
+            }
+            for row in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+
 @login_required # US-15 (RN#1): Apenas usuários logados podem favoritar.
 def toggle_favorite_view(request, pk):
     """
     Controla a US-15: Criar lista de favoritos.
+    (Sem JavaScript; a vitrine usa toggle_favorite_json_view.)
     """
     product = get_object_or_404(Product, pk=pk)
-    
-    # Tenta encontrar um favorito existente
-    favorite, created = Favorite.objects.get_or_create(
-        usuario=request.user,
-        produto=product
-    )
-    
-    if not created:
-        # Se já existia (não foi criado agora), delete.
-        favorite.delete()
-        
+    favorites.toggle(request, product)
+
     # Redireciona de volta para a página de onde o usuário veio
-    return redirect(request.META.get('HTTP_REFERER', 'store:product_list'))
\ No newline at end of file
+    return redirect(request.META.get('HTTP_REFERER', 'store:product_list'))
+
+
+@login_required
+@require_POST
+def toggle_favorite_json_view(request, pk):
+    """
+    US-15: Marca/desmarca o favorito e devolve o novo estado, sem recarregar a página.
+    """
+    product = get_object_or_404(Product, pk=pk)
+    is_favorite = favorites.toggle(request, product)
+    return JsonResponse({'produto': product.pk, 'favorito': is_favorite})
+
+
+@login_required
+def favorite_list_view(request):
+    """
+    US-15: Lista de favoritos do cliente, a partir do mesmo conjunto usado na vitrine.
+    """
+    favorite_ids = favorites.favorite_ids(request)
+    queryset = Product.objects.filter(id__in=favorite_ids)
+    page = paginate_keyset(
+        queryset,
+        ordering=('id',),
+        cursor=request.GET.get('cursor'),
+        page_size=_page_size(request, PRODUCTS_PER_PAGE, MAX_PRODUCTS_PER_PAGE),
+    )
+    context = {
+        'products': page,
+        'page': page,
+        'favorite_ids': favorite_ids,
+        'next_querystring': page.next_cursor and cursor_querystring(request, page.next_cursor),
+        'previous_querystring': page.previous_cursor and cursor_querystring(request, page.previous_cursor),
+    }
+    return render(request, 'store/favorite_list.html', context)
+
+
+# --- API do catálogo (somente leitura) ---
+# Cada resposta leva um ETag forte calculado só com a versão das linhas
+# (id, atualizado_em) e os cursores da página. Se o cliente já tem essa
+# versão (If-None-Match), a resposta é 304 e o JSON nem é montado.
+
+def _catalog_etag(rows, *extra):
+    digest = hashlib.sha256(API_FORMAT.encode())
+    # Os rótulos das categorias vão no JSON: a versão deles também conta
+    digest.update(repr(reference.categories.options()).encode())
+    for part in extra:
+        digest.update(repr(part).encode())
+    for row in rows:
+        digest.update(repr((row['id'], row['atualizado_em'])).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _catalog_response(request, etag, build, last_modified=None):
+    # 304 (ou 412) sem chamar `build`; senão o JSON montado por `build()`
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Caches podem guardar, mas revalidam sempre pelo ETag
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def _product_json(row, storage):
+    quantidade = row['avaliacoes_quantidade']
+    categoria_id = row['categoria_id']
+    return {
+        'id': row['id'],
+        'nome': row['nome'],
+        'sabor': row['sabor'],
+        'valor': row['valor'],
+        'categoria': categoria_id and {
+            'id': categoria_id,
+            'nome': reference.categories.label(categoria_id),
+        },
+        'imagem': row['imagem'] and storage.url(row['imagem']),
+        'em_estoque': row['quantidade_estoque'] > 0,
+        'avaliacoes': {
+            'quantidade': quantidade,
+            'media': round(row['avaliacoes_soma'] / quantidade, 2) if quantidade else 0,
+        },
+        'atualizado_em': row['atualizado_em'],
+    }
+
+
+@require_safe
+def catalog_api_view(request):
+    """
+    API do catálogo: a vitrine (US-1) em JSON, com a busca (US-2) e o
+    filtro por tipo (US-3), paginada por cursor.
+    """
+    # US-1 (RN#1): Cupcakes fora de estoque não devem aparecer.
+    queryset = Product.objects.filter(quantidade_estoque__gt=0)
+    fields = API_PRODUCT_FIELDS
+
+    query = request.GET.get('q')
+    ordering = ('id',)
+    if query:
+        queryset = search_products(queryset, query)
+        fields += ('relevancia',)  # chave do cursor
+        ordering = ('relevancia', 'id')
+
+    category_id = request.GET.get('categoria')
+    if category_id:
+        if not category_id.isdigit():
+            return JsonResponse({'error': 'Categoria inválida.'}, status=400)
+        queryset = queryset.filter(categoria__id=category_id)
+
+    try:
+        page = paginate_keyset(
+            queryset.values(*fields),
+            ordering=ordering,
+            cursor=request.GET.get('cursor'),
+            page_size=_page_size(request, API_PRODUCTS_PER_PAGE, MAX_API_PRODUCTS_PER_PAGE),
+            strict=True,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    next_cursor, previous_cursor = page.next_cursor, page.previous_cursor
+
+    def build():
+        storage = images.image_storage()
+        return {
+            'results': [_product_json(row, storage) for row in page],
+            'next_cursor': next_cursor,
+            'previous_cursor': previous_cursor,
+        }
+
+    etag = _catalog_etag(page, next_cursor, previous_cursor)
+    return _catalog_response(request, etag, build)
+
+
+@require_safe
+def catalog_product_api_view(request, pk):
+    """
+    API do catálogo: um cupcake em JSON (inclusive fora de estoque, com
+    `em_estoque` falso), com ETag e Last-Modified.
+    """
+    row = get_object_or_404(Product.objects.values(*API_PRODUCT_FIELDS), pk=pk)
+    return _catalog_response(
+        request, _catalog_etag([row]),
+        lambda: _product_json(row, images.image_storage()),
+        last_modified=row['atualizado_em'],
+    )